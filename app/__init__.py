@@ -1,10 +1,14 @@
 # cs492_bookstore_project/app/__init__.py
 import os
+import json # Fast path for the session serializer
 from decimal import Decimal # Not directly used here, but good if _get_cart_summary_for_context were more complex
 from datetime import datetime
 from flask_mail import Mail
 from flask_login import LoginManager
 from flask import Flask, jsonify, request, render_template, flash, redirect, url_for, session # Added session
+from flask.json.tag import TaggedJSONSerializer # Fallback session serializer for non-JSON values
+from flask.sessions import SecureCookieSessionInterface # Base for the static-aware session interface
+from jinja2 import TemplateNotFound
 
 # Assuming config.py is at the project root (cs492_bookstore_project/)
 from config import config 
@@ -12,6 +16,7 @@ from config import config
 # Import app-specific modules
 from .logger import setup_logger, get_logger # From app/logger.py
 from .models.user import load_user as app_load_user # Alias for clarity
+from .models import db # Pooled connections; init_app registers the teardown handler
 from .services.exceptions import AppException, NotFoundError, AuthorizationError, AuthenticationError
 from typing import Dict, Any # For type hinting
 
@@ -22,20 +27,81 @@ login_manager.login_message = "Please log in to access this page or complete thi
 login_manager.login_view = 'auth.login' # Endpoint for login page (blueprint_name.view_function_name)
 mail = Mail() # Flask Mail instance to send emails
 
+# High-traffic templates compiled once at startup so the first requests don't pay for parsing.
+TEMPLATES_TO_PRECOMPILE = ('login.html', 'register.html')
+
+class CompactSessionSerializer(TaggedJSONSerializer):
+    """
+    Session serializer that writes plain JSON when that round-trips exactly.
+
+    Most sessions hold only plain JSON values (the cart dict, the user snapshot, a few
+    strings and ints), and for those `dumps` skips the type tags of `TaggedJSONSerializer`.
+    Anything plain JSON would silently change goes through the tagged serializer instead:
+    tuples (Flask stores flashes as `(category, message)` tuples), `Markup`, datetimes,
+    bytes, non-string dict keys, and single-key dicts that tagged `loads` would mistake
+    for a tag. Tagged `loads` reads both forms, so no change is needed there.
+    """
+    def _is_plain_json(self, value: Any) -> bool:
+        value_type = type(value) # Exact types: str/dict/list subclasses (e.g. Markup) need tags
+
+        if value is None or value_type in (str, int, float, bool):
+            return True
+
+        if value_type is list:
+            return all(self._is_plain_json(item) for item in value)
+
+        if value_type is dict:
+            if len(value) == 1 and next(iter(value)) in self.tags:
+                return False
+
+            return all(type(key) is str and self._is_plain_json(item) for key, item in value.items())
+
+        return False
+
+    def dumps(self, value: Any) -> str:
+        if self._is_plain_json(value):
+            return json.dumps(value, separators=(",", ":"))
+
+        return super().dumps(value)
+
+class StaticRequestFilteringSessionInterface(SecureCookieSessionInterface):
+    """
+    Session interface that skips the session entirely for static file requests.
+
+    Requests under the app's static URL path (CSS, JS, images) get a null session, so
+    they don't decode, verify or re-save the session cookie. All other requests use
+    the normal signed-cookie session, serialized with `CompactSessionSerializer`.
+    """
+    serializer = CompactSessionSerializer()
+
+    def open_session(self, app: Flask, request):
+        static_url_path = app.static_url_path
+
+        if static_url_path and request.path.startswith(f"{static_url_path}/"):
+            return self.make_null_session(app)
+
+        return super().open_session(app, request)
+
 def _get_cart_summary_for_context() -> Dict[str, Any]:
     """
     Retrieves a summary of the user's shopping cart from the session.
     
-    This helper function calculates the total number of items (sum of quantities) 
+    This helper function returns the total number of items (sum of quantities) 
     in the cart. It's designed to be lightweight for use in a context processor 
-    that runs on every request. It assumes the cart is stored in the session as a 
-    dictionary where keys are item IDs (strings) and values are quantities (integers).
+    that runs on every request: the cart routes keep a running count in
+    session["cart_item_count"], and the cart dict (keys are item IDs as strings,
+    values are integer quantities) is only summed when that count is missing.
 
     Returns:
         Dict[str, Any]: A dictionary containing:
             - "cart_item_count" (int): Total number of items (sum of quantities) in the cart.
             - Potentially "cart_total_str" (str) if full calculation were added here.
     """
+    stored_item_count = session.get("cart_item_count") # Maintained by app/cart/routes.py
+
+    if isinstance(stored_item_count, int):
+        return {"cart_item_count": stored_item_count}
+
     cart_session = session.get("cart", {}) # Safely get cart from session, defaulting to empty dict
     item_count = 0
     # Calculate total items by summing up the quantities of each item in the cart.
@@ -92,6 +158,7 @@ def create_app(config_name: str = 'default') -> Flask:
         Flask: The configured Flask application instance.
     """
     app = Flask(__name__, instance_relative_config=False)
+    app.session_interface = StaticRequestFilteringSessionInterface() # No session work for /static/* hits
     mail.init_app(app)
 
     selected_config_obj = config.get(config_name, config['default'])
@@ -120,6 +187,8 @@ def create_app(config_name: str = 'default') -> Flask:
             "This key MUST be changed for security."
         )
 
+    db.init_app(app) # Return each request's reused DB connection to the pool at teardown
+
     login_manager.init_app(app)
     logger.info("Flask-Login extension initialized and configured for the application.")
     logger.info("Registering application blueprints...")
@@ -156,6 +225,14 @@ def create_app(config_name: str = 'default') -> Flask:
        
     logger.info("All blueprints registered.")
 
+    # Warm Jinja's template cache for the auth pages; render_template then reuses the compiled objects.
+    for template_name in TEMPLATES_TO_PRECOMPILE:
+        try:
+            app.jinja_env.get_template(template_name)
+        except TemplateNotFound:
+            logger.warning(f"Template '{template_name}' could not be precompiled: not found.")
+    logger.debug(f"Precompiled templates: {', '.join(TEMPLATES_TO_PRECOMPILE)} (auto-reload: {app.jinja_env.auto_reload}).")
+
     # Context Processors - make variables automatically available to all templates
     @app.context_processor
     def inject_common_template_variables(): # Merged the two context processors
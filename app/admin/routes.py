@@ -1,5 +1,5 @@
 # cs492_bookstore_project/app/admin/routes.py
-from flask import render_template, current_app, request, redirect, url_for, flash
+from flask import render_template, current_app, request, redirect, url_for, flash, session, make_response
 from flask_login import login_required, current_user
 from typing import Dict, Any, List # For type hinting
 from decimal import Decimal, InvalidOperation # For converting price
@@ -11,19 +11,30 @@ from app.services.exceptions import AppException, AuthorizationError, NotFoundEr
 # Import Book service and potentially the Book model for form handling
 from app.services import book_service # To call functions like book_service.get_all_books()
 from app.models.book import Book # For type hinting and potentially creating form objects
+from app.models.user import SESSION_USER_SNAPSHOT_KEY # To refresh the session snapshot on self-edits
 from app.utils import sanitize_form_data, normalize_whitespace # For form data
 
 logger = get_logger(__name__) 
 
+# How long an admin's browser may reuse its own copy of the dashboard (e.g. on back/forward navigation).
+ADMIN_DASHBOARD_PRIVATE_MAX_AGE_SECONDS = 30
+
 def _ensure_admin_privileges():
     """
     Helper function to check if the currently authenticated user has admin privileges.
+    Role and active status are re-read from the database rather than trusted from the
+    session snapshot, so a revoked admin loses access immediately.
     Raises AuthorizationError if the user is not an admin.
     """
-    if not (hasattr(current_user, 'is_admin') and callable(current_user.is_admin) and current_user.is_admin()):
-        user_email = getattr(current_user, 'email', 'Anonymous/Unauthenticated')
-        user_role = getattr(current_user, 'role', 'N/A') 
-        user_id = getattr(current_user, 'id', 'N/A')
+    user = current_user._get_current_object() # Resolve the LocalProxy once
+    is_admin = getattr(user, 'is_admin', None) # AnonymousUserMixin has no role helpers
+    refresh_authorization = getattr(user, 'refresh_authorization', None)
+    is_still_active = callable(refresh_authorization) and refresh_authorization()
+
+    if not (is_still_active and callable(is_admin) and is_admin()):
+        user_email = getattr(user, 'email', 'Anonymous/Unauthenticated')
+        user_role = getattr(user, 'role', 'N/A') 
+        user_id = getattr(user, 'id', 'N/A')
         logger.warning(
             f"Unauthorized access attempt to admin area by user '{user_email}' "
             f"(ID: {user_id}, Role: '{user_role}'). Admin privileges required."
@@ -38,7 +49,9 @@ def admin_dashboard_page():
     Serves as the entry point to various admin functionalities.
 
     Returns:
-        Response: Renders the `admin/dashboard.html` template.
+        Response: Renders the `admin/dashboard.html` template. The response is privately
+                  cacheable for `ADMIN_DASHBOARD_PRIVATE_MAX_AGE_SECONDS` and carries an ETag,
+                  so a revalidating browser gets a 304 when nothing changed.
     
     Raises:
         AuthorizationError: If the logged-in user is not an admin.
@@ -47,10 +60,17 @@ def admin_dashboard_page():
     admin_name = getattr(current_user, 'first_name', 'Admin').title()
     user_email_log = getattr(current_user, 'email', 'N/A')
     user_id_log = getattr(current_user, 'id', 'N/A')
-    logger.info(f"Admin dashboard accessed by administrator: {user_email_log} (ID: {user_id_log})")
+    logger.info("Admin dashboard accessed by administrator: %s (ID: %s)", user_email_log, user_id_log)
     
     dashboard_data = {"greeting": f"Welcome to the Admin Dashboard, {admin_name}!"}
-    return render_template('admin/dashboard.html', **dashboard_data) 
+    response = make_response(render_template('admin/dashboard.html', **dashboard_data))
+
+    # The page only varies by the admin's name, so the admin's own browser may reuse it briefly.
+    # `private` keeps shared caches from storing it.
+    response.cache_control.private = True
+    response.cache_control.max_age = ADMIN_DASHBOARD_PRIVATE_MAX_AGE_SECONDS
+    response.add_etag()
+    return response.make_conditional(request)
 
 # --- Admin Book Management Routes ---
 
@@ -123,7 +143,7 @@ def add_book_route():
             # Assumes book_service.add_book exists and takes a dictionary
             new_book = book_service.admin_add_book(book_payload) # This function needs to be created/confirmed in book_service.py
             
-            flash(f"Book '{new_book.title.title()}' added successfully!", "success")
+            flash(f"Book '{new_book.title_display}' added successfully!", "success")
             logger.info(f"Admin successfully added book ID {new_book.book_id} ('{new_book.title}').")
             return redirect(url_for('admin.list_books'))
         
@@ -193,6 +213,11 @@ def edit_book_route(book_id: int):
                 raise ValidationError("Price and Stock Quantity must be valid numbers.", 
                                       errors={'price_stock': "Invalid number format."})
 
+            try: # Stock shown when the form was loaded; lets the service reject stale edits
+                book_payload['original_stock_quantity'] = int(book_payload['original_stock_quantity'])
+            except (KeyError, ValueError, TypeError):
+                book_payload.pop('original_stock_quantity', None)
+
             if not book_payload.get('title') or not book_payload.get('author'):
                 raise ValidationError("Title and Author are required fields.", 
                                       errors={'title_author': "Title and Author cannot be empty."})
@@ -201,7 +226,7 @@ def edit_book_route(book_id: int):
             # Assumes book_service.update_book exists
             updated_book = book_service.admin_update_book(book_id, book_payload)
             
-            flash(f"Book '{updated_book.title.title()}' updated successfully!", "success")
+            flash(f"Book '{updated_book.title_display}' updated successfully!", "success")
             logger.info(f"Admin successfully updated book ID {book_id} ('{updated_book.title}').")
             return redirect(url_for('admin.list_books'))
 
@@ -223,13 +248,14 @@ def edit_book_route(book_id: int):
         # On POST error, re-render form with submitted data and errors
         # Pass the original book_to_edit for ID in action_url, but form_data for values
         current_data_for_form = {**book_to_edit.to_dict(), **form_data_for_template}
-        return render_template('admin/admin_book_form.html', form_title=f"Edit Book: {book_to_edit.title.title()}", 
+        current_data_for_form['original_stock_quantity'] = book_to_edit.stock_quantity # Stock as of this POST
+        return render_template('admin/admin_book_form.html', form_title=f"Edit Book: {book_to_edit.title_display}", 
                                book=current_data_for_form, 
                                action_url=url_for('admin.edit_book', book_id=book_id))
     
     # For GET request, populate form with existing book data
     logger.debug(f"Admin {admin_email} accessing edit form for book ID {book_id}.")
-    return render_template('admin/admin_book_form.html', form_title=f"Edit Book: {book_to_edit.title.title()}", 
+    return render_template('admin/admin_book_form.html', form_title=f"Edit Book: {book_to_edit.title_display}", 
                            book=book_to_edit.to_dict(), # Pass book data as dict
                            action_url=url_for('admin.edit_book', book_id=book_id))
 
@@ -528,6 +554,9 @@ def edit_user_by_admin_route(user_id_to_edit: int):
             payload_for_service['role'] = form_data_raw.get('role', user_to_edit.role) # Keep existing role if not submitted
 
             updated_user = user_service.admin_update_user_details(user_id_to_edit, payload_for_service, admin_performing_action_id) # type: ignore
+
+            if updated_user.id == admin_performing_action_id: # Admin edited their own account
+                session[SESSION_USER_SNAPSHOT_KEY] = updated_user.to_session_snapshot()
             flash(f"User '{updated_user.email}' (ID: {user_id_to_edit}) updated successfully!", "success")
             return redirect(url_for('admin.list_users'))
 
@@ -5,6 +5,7 @@ from typing import Dict, Any
 from app.services.auth_service import authenticate_user                             # For user authentication
 from app.utils import sanitize_form_data, sanitize_form_field_value                 # For input sanitization
 from app.logger import get_logger                                                   # Custom application logger
+from app.models.user import SESSION_USER_SNAPSHOT_KEY                               # Session key for the user snapshot
 from flask_login import login_user, logout_user, current_user, login_required       # For user seesion management
 from app.services.reg_service import register_user, validate_registration_data      # For registration & validation
 from flask import render_template, request, redirect, url_for, flash, current_app, session      # For Flask utilities
@@ -12,6 +13,13 @@ from app.services.exceptions import ValidationError, AuthenticationError, Databa
 
 logger = get_logger(__name__) # Logger instance for this module
 
+# Sanitization rules for the registration form, built once at import rather than per request.
+REGISTRATION_HTML_ESCAPE_FIELDS = frozenset({
+    'first_name', 'last_name', 'phone_number', 
+    'address_line1', 'address_line2', 'city', 'state', 'zip_code'
+})
+REGISTRATION_LOWERCASE_FIELDS = frozenset({'email'})
+
 @auth_bp.route('/')
 def index():
     """
@@ -39,7 +47,6 @@ def register():
     Returns:
         Response: Renders the registration template or redirects on success/existing session.
     """
-    print("***********************************************************************************************")
     if current_user.is_authenticated:
         logger.info(f"Authenticated user {current_user.id} attempted to access /register. Redirecting to home.")
 
@@ -56,20 +63,12 @@ def register():
             form_data_raw = request.form.to_dict()
             logger.debug(f"Registration attempt with raw form data: { {k:v for k,v in form_data_raw.items() if k != 'password' and k != 'confirm_password'} }") # Log without passwords
 
-            # Define fields for specific sanitization rules
-            fields_to_html_escape = {
-                'first_name', 'last_name', 'phone_number', 
-                'address_line1', 'address_line2', 'city', 'state', 'zip_code'
-            }
-
-            fields_to_lowercase = {'email'}
-
             # Sanitize text fields (excluding passwords which are handled separately)
             # This strips whitespace, lowercases email, and HTML-escapes specified fields.
             sanitized_text_fields = sanitize_form_data(
                 form_data_raw, 
-                lowercase_fields_set=fields_to_lowercase,
-                escape_html_fields=fields_to_html_escape 
+                lowercase_fields_set=REGISTRATION_LOWERCASE_FIELDS,
+                escape_html_fields=REGISTRATION_HTML_ESCAPE_FIELDS 
             )
 
             # Construct the final payload for the registration service
@@ -172,9 +171,11 @@ def login():
             email_sanitized = request.form.get('email', '').strip().lower()
             password_input = request.form.get('password', '').strip()
             logger.debug(f"Login attempt with sanitized email: {email_sanitized}")
-            i = 0
             user = authenticate_user(email_sanitized, password_input)
             login_user(user)
+            # Snapshot lets load_user rebuild current_user without a users-table query per request.
+            session[SESSION_USER_SNAPSHOT_KEY] = user.to_session_snapshot()
+            logger.debug("Logged in as: %s (ID: %s)", user.first_name, user.id)
 
             # ... (flash welcome message) ...
             
@@ -224,18 +225,18 @@ def logout():
     # Clear the shopping cart from the session
     if 'cart' in session:
         session.pop('cart', None)
+        session.pop('cart_total_cents', None)
+        session.pop('cart_item_count', None)
         logger.info(f"Shopping cart cleared for user '{user_email_for_log}' upon logout.")
     
     # Clear any guest-specific session flags that might persist if user was guest then logged in
     session.pop('guest_checkout_email_prefill', None)
     session.pop('just_placed_order_id', None) 
     session.pop('guest_order_email', None)    
+    session.pop(SESSION_USER_SNAPSHOT_KEY, None)
     
     logout_user() # Flask-Login function to log the user out
-    
-    # Explicitly mark session as modified if items were popped.
-    # logout_user() also modifies session, but this ensures our pops are saved.
-    session.modified = True 
+    # No session.modified needed: session.pop() of a present key already marks the session modified.
 
     flash("You have been successfully logged out. Your cart has been cleared.", "info") 
     logger.info(f"User (formerly '{user_email_for_log}') logged out successfully. Cart cleared. Redirecting to home page.")
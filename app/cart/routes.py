@@ -1,18 +1,23 @@
 # cs492_bookstore_project/app/cart/routes.py
 
 import re                                                                               # For EMAIL_REGEX validation
+import json                                                                             # For compact cart JSON responses
+import logging                                                                          # For the DEBUG level check on costly log arguments
+from functools import wraps                                                             # For the cart_json_endpoint decorator
 from . import cart_bp                                                                   # Import the BP instance
 from datetime import datetime
 from app.logger import get_logger                                                       # Custom application logger                                                    
 from app.models.order import Order                                                      # For type hinting
+from app.models.book import Book                                                        # For type hinting
 from flask_login import current_user                                                    # login_required is used selectively
-from decimal import Decimal, ROUND_HALF_UP                                              # For precise $$ calculations
+from decimal import Decimal                                                             # For precise $$ values at the template boundary
 from app.services.email_service import send_email
-from typing import Dict, Tuple, List, Any, Optional                                     # For type hinting
-from app.services.book_service import get_book_by_id                                    # Service to fetch book details
+from typing import Callable, Dict, NamedTuple, Tuple, List, Any, Optional               # For type hinting
+from app.services.book_loader import get_book_cached, get_books_cached                  # Request-cached book lookups
+from app.services.book_service import resolve_cart_stock                                # Single-query stock validation
 from app.services.order_service import create_order_from_cart, get_order_details                           # Service to create orders
 from app.utils import sanitize_form_data, sanitize_form_field_value, normalize_whitespace 
-from flask import request, session, jsonify, render_template, flash, redirect, url_for
+from flask import request, session, render_template, flash, redirect, url_for, current_app, Response, g
 from app.services.exceptions import (                                                   # Custom exceptions for error handling
     NotFoundError, 
     CartActionError, 
@@ -25,31 +30,190 @@ from app.services.exceptions import (
 logger = get_logger(__name__) # Logger instance for this module
 
 # Regular expression for validating email format, used for guest checkout.
-EMAIL_REGEX = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+# Longest address allowed (RFC 5321 path limit); longer input is rejected before the regex runs.
+EMAIL_MAX_LENGTH = 254
+
+# Shipping fields of the checkout form, and those that must be non-empty before an order is placed.
+SHIPPING_FIELDS = ('shipping_address_line1', 'shipping_address_line2', 'shipping_city', 'shipping_state', 'shipping_zip_code')
+REQUIRED_SHIPPING_FIELDS = ('shipping_address_line1', 'shipping_city', 'shipping_state', 'shipping_zip_code')
+
+# Session key holding the running cart total in integer cents (e.g. 4250 for $42.50),
+# kept next to session["cart"] so the AJAX cart endpoints don't re-price every line.
+SESSION_CART_TOTAL_KEY = "cart_total_cents"
+# Session key holding the running sum of cart quantities, updated by the same routes.
+SESSION_CART_ITEM_COUNT_KEY = "cart_item_count"
+
+# Expected errors of the AJAX cart endpoints: exception class -> (status_code, message).
+# None means "use the exception's own status_code and user_facing_message".
+CART_JSON_ERROR_MAP: Dict[type, Optional[Tuple[int, str]]] = {
+    NotFoundError: None,
+    CartActionError: None,
+    ValueError: (400, "Invalid book ID or quantity format."), # For int conversion errors
+}
+
+class _UserContextForLog:
+    """
+    Lazy, consistent string representation of the current user context (authenticated
+    user or guest) for log messages.
+
+    Creating one is free; the description is only built the first time the object is
+    formatted, e.g. "user 123 (user@example.com)" or "guest user". Pass it as a `%s`
+    argument (`logger.debug("... for %s", ctx)`) so filtered-out records never build it.
+    The built string is kept on `flask.g`, so it is formatted at most once per request.
+    """
+    __slots__ = ('_description', '_user')
+
+    def __init__(self, user: Any = None):
+        self._description: Optional[str] = None
+        self._user = user # The unwrapped current user, if the caller already resolved it
+
+    def __str__(self) -> str:
+        if self._description is None:
+            self._description = g.get('user_context_for_log')
+
+        if self._description is None:
+            user = self._user if self._user is not None else current_user._get_current_object()
+
+            if user.is_authenticated:
+                self._description = f"user {user.id} ({user.email})" # Authenticated users are always our User model
+
+            else:
+                self._description = "guest user"
+
+            g.user_context_for_log = self._description # Reused by every later log line in this request
+
+        return self._description
+
+def _is_valid_guest_email(email: str) -> bool:
+    """
+    Checks a normalized guest email address.
+    Obviously malformed input (empty, too long, not exactly one '@', or '..') is rejected
+    with plain string checks, so only plausible addresses reach `EMAIL_REGEX`.
+    """
+    if not email or len(email) > EMAIL_MAX_LENGTH or email.count('@') != 1 or '..' in email:
+        return False
+
+    return EMAIL_REGEX.match(email) is not None
+
+def cart_json_response(payload: Dict[str, Any], status_code: int = 200) -> Response:
+    """
+    Builds the JSON response for the AJAX cart endpoints.
+
+    Cart payloads are small, fixed-shape dicts of bools, strings and ints, so they are
+    encoded directly with compact `json.dumps` instead of going through `jsonify` and the
+    app's JSON provider (default-type hook, key sorting, debug pretty-printing).
 
-def _get_user_context_for_log() -> str:
+    Args:
+        payload (Dict[str, Any]): The response body; must contain only JSON-native values.
+        status_code (int): The HTTP status code. Defaults to 200.
+
+    Returns:
+        Response: An `application/json` response.
+    """
+    return current_app.response_class(json.dumps(payload, separators=(",", ":")), status=status_code, mimetype="application/json")
+
+def cart_json_endpoint(action_description: str) -> Callable:
     """
-    Helper function to generate a consistent string representation for logging 
-    the current user context (authenticated user or guest).
+    Decorator for the AJAX cart endpoints that turns exceptions into JSON error responses.
+
+    Exceptions listed in `CART_JSON_ERROR_MAP` (matched along the exception's MRO) are logged
+    as warnings and answered with their mapped status and message; anything else is logged
+    with a stack trace and answered with a 500. Routes only need to contain the happy path.
+
+    Args:
+        action_description (str): What the endpoint does, e.g. "add item to cart"; used in
+                                  log lines and in the generic server-error message.
 
     Returns:
-        str: A string identifying the user, e.g., "user 123 (user@example.com)" or "guest user".
+        Callable: The decorator.
     """
-    if current_user.is_authenticated:
-        user_id_log = getattr(current_user, 'id', 'UNKNOWN_ID')
-        user_email_log = getattr(current_user, 'email', 'UNKNOWN_EMAIL')
+    def decorator(view_func: Callable) -> Callable:
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            try:
+                return view_func(*args, **kwargs)
 
-        return f"user {user_id_log} ({user_email_log})"
-    
-    return "guest user"
+            except Exception as e:
+                user_context_for_log = _UserContextForLog()
+                error_class = next((cls for cls in type(e).__mro__ if cls in CART_JSON_ERROR_MAP), None)
+
+                if error_class is None:
+                    logger.error(f"Unexpected error trying to {action_description} for {user_context_for_log}: {e}", exc_info=True)
+
+                    return cart_json_response({"success": False, "error": f"Could not {action_description} due to a server error."}, 500)
+
+                status_code, error_message = CART_JSON_ERROR_MAP[error_class] or (e.status_code, e.user_facing_message)
+                logger.warning(
+                    f"Cart action '{action_description}' by {user_context_for_log} failed with {type(e).__name__}: {error_message} "
+                    f"(Data: {request.get_json(silent=True)})"
+                )
+
+                return cart_json_response({"success": False, "error": error_message}, status_code)
+
+        return wrapper
+
+    return decorator
+
+def _cents_to_decimal(cents: int) -> Decimal:
+    """
+    Converts an amount in integer cents to a two-decimal `Decimal` (e.g. 4250 -> Decimal('42.50')).
+    Only used at the display boundary; cart arithmetic itself is done in cents.
+    """
+    return Decimal(cents).scaleb(-2)
+
+def _format_cents(cents: int) -> str:
+    """
+    Formats a non-negative amount in integer cents as a price string (e.g. 4250 -> "42.50").
+    """
+    return f"{cents // 100}.{cents % 100:02d}"
+
+class CartLine(NamedTuple):
+    """
+    One priced cart line for the cart and checkout templates.
+    Jinja's `item.title` style lookups work on the fields directly.
+    """
+    book_id: int
+    title: str # Display title case
+    quantity: int
+    unit_price: Decimal
+    image_url: Optional[str]
+    total_price: Decimal # Decimal for templates
+    total_price_cents: int
+    stock_quantity: int
+
+def _build_cart_item(book: Book, quantity: int) -> CartLine:
+    """
+    Builds the display row for one cart line.
 
-def _calculate_current_cart_total_and_items(cart_session: Dict[str, int]) -> Tuple[List[Dict[str, Any]], Decimal, bool]:
+    Args:
+        book (Book): The book on this line.
+        quantity (int): The quantity of the book in the cart (positive).
+
+    Returns:
+        CartLine: The priced cart line.
+    """
+    line_total_cents = book.price_cents * quantity # Integer cents: exact, no rounding needed
+
+    return CartLine(
+        book.book_id,
+        book.title_display,
+        quantity,
+        book.price, # Book.__init__ always stores price as a Decimal
+        book.image_url,
+        _cents_to_decimal(line_total_cents),
+        line_total_cents,
+        book.stock_quantity
+    )
+
+def _calculate_current_cart_total_and_items(cart_session: Dict[str, int]) -> Tuple[List[CartLine], Decimal, bool]:
     """
     Calculates the detailed list of items in the cart, the grand total amount,
     and an emptiness flag based on the provided session cart data.
 
-    This helper iterates through the cart items, fetches current book details (price, stock)
-    using `book_service.get_book_by_id`, and performs calculations using `Decimal` for precision.
+    This helper parses the cart items, fetches current book details (price, stock) for all
+    of them with a single (request-cached) `book_loader.get_books_cached` call, and performs calculations
+    in integer cents (`Book.price_cents`), converting to `Decimal` only for the returned values.
     It prepares a list of dictionaries, each representing a cart item with details suitable
     for display in templates (e.g., `cart.html`, `checkout.html`).
 
@@ -58,8 +222,8 @@ def _calculate_current_cart_total_and_items(cart_session: Dict[str, int]) -> Tup
                                        book IDs (as strings) and values are quantities.
 
     Returns:
-        Tuple[List[Dict[str, Any]], Decimal, bool]: A tuple containing:
-            - `cart_items_detailed` (List[Dict[str, Any]]): A list of dictionaries,
+        Tuple[List[CartLine], Decimal, bool]: A tuple containing:
+            - `cart_items_detailed` (List[CartLine]): A list of `CartLine` rows,
               each detailing a cart item (book_id, title, quantity, unit_price, image_url,
               total_price, stock_quantity).
             - `grand_total` (Decimal): The calculated total amount for all items in the cart,
@@ -67,80 +231,299 @@ def _calculate_current_cart_total_and_items(cart_session: Dict[str, int]) -> Tup
             - `is_empty` (bool): True if the cart is effectively empty after validation 
               (no valid items), False otherwise.
     """
-    cart_items_detailed: List[Dict[str, Any]] = []
-    grand_total = Decimal('0.00')
-    user_context_for_log = _get_user_context_for_log() # For logging context
+    cart_items_detailed: List[CartLine] = []
+    grand_total_cents = 0
+    user_context_for_log = _UserContextForLog() # Built only if a log record is emitted
 
     if not cart_session:
-        logger.debug(f"_calculate_current_cart_total_and_items: Cart session is empty for {user_context_for_log}.")
+        logger.debug("_calculate_current_cart_total_and_items: Cart session is empty for %s.", user_context_for_log)
         
-        return cart_items_detailed, grand_total, True # True for is_empty
+        return cart_items_detailed, Decimal('0.00'), True # True for is_empty
 
-    processed_book_ids = set() # Avoid processing duplicates if session data were malformed
+    # One query for every parseable book ID in the cart instead of one query per cart line.
+    try:
+        books_by_id = get_books_cached(int(key) for key in cart_session if key.isdigit())
 
-    for book_id_str, quantity_in_cart in cart_session.items():
-        
-        if book_id_str in processed_book_ids: continue # Should not happen with dict keys
-        processed_book_ids.add(book_id_str)
-        
+    except DatabaseError as de:
+        logger.error(f"_calculate_cart: Could not load cart books for {user_context_for_log}: {de.log_message}", exc_info=True)
+        books_by_id = {}
+
+    # Single pass over the session cart: no intermediate list of parsed entries.
+    for book_id_str, quantity_in_cart in cart_session.items(): # Dict keys are unique, no de-duplication needed
         try:
             book_id_int = int(book_id_str)
             current_quantity = int(quantity_in_cart)
 
-            if current_quantity <= 0:
-                logger.info(f"_calculate_cart: Skipping item {book_id_str} (qty: {current_quantity}) for {user_context_for_log}.")
-                continue
-
-            book = get_book_by_id(book_id_int) # Service function raises NotFoundError if not found
-
-            if not book: # Should be caught by NotFoundError from service, but defensive
-                logger.warning(f"_calculate_cart: Book ID {book_id_str} not found for {user_context_for_log}. Skipping.")
-                continue 
-            
-            # Ensure book.price is a Decimal for calculations
-            book_price_decimal = book.price
+        except (ValueError, TypeError):
+            logger.warning(f"_calculate_cart: Invalid format for book_id '{book_id_str}' or quantity '{quantity_in_cart}' for {user_context_for_log}. Skipping.")
+            continue
 
-            if not isinstance(book_price_decimal, Decimal):
-                try:
-                    book_price_decimal = Decimal(str(book.price))
+        if current_quantity <= 0:
+            logger.info(f"_calculate_cart: Skipping item {book_id_str} (qty: {current_quantity}) for {user_context_for_log}.")
+            continue
 
-                except Exception: # Catch broad error for Decimal conversion
-                    logger.error(f"_calculate_cart: Invalid price type for book ID {book.book_id} ('{book.price}'). Skipping for {user_context_for_log}.")
+        try:
+            book = books_by_id.get(book_id_int)
 
-                    continue
-            
-            item_total = book_price_decimal * Decimal(current_quantity) # Decimal arithmetic
-            item_total_rounded = item_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if not book:
+                logger.warning(f"_calculate_cart: Book ID {book_id_str} from cart not found for {user_context_for_log}. Skipping.")
+                continue 
             
-            cart_items_detailed.append({
-                "book_id": book.book_id, 
-                "title": book.title.title(), # Display title case
-                "quantity": current_quantity, 
-                "unit_price": book_price_decimal, # Store as Decimal
-                "image_url": book.image_url, 
-                "total_price": item_total_rounded, # Store rounded Decimal
-                "stock_quantity": book.stock_quantity 
-            })
-            grand_total += item_total # Accumulate exact item_total
-
-        except ValueError:
-            logger.warning(f"_calculate_cart: Invalid format for book_id '{book_id_str}' or quantity '{quantity_in_cart}' for {user_context_for_log}. Skipping.")
-
-        except NotFoundError:
-             logger.warning(f"_calculate_cart: Book ID {book_id_str} from cart not found for {user_context_for_log}. Skipping.")
+            cart_item = _build_cart_item(book, current_quantity)
+            cart_items_detailed.append(cart_item)
+            grand_total_cents += cart_item.total_price_cents
 
         except Exception as e: # Catch-all for unexpected issues with a single item
             logger.error(f"_calculate_cart: Unexpected error processing cart item {book_id_str} for {user_context_for_log}: {e}", exc_info=True)
             
-    grand_total = grand_total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    grand_total = _cents_to_decimal(grand_total_cents)
     is_empty = not bool(cart_items_detailed) # True if list is empty
-    logger.debug(f"_calculate_cart for {user_context_for_log}: {len(cart_items_detailed)} items, Total: {grand_total}")
+    logger.debug("_calculate_cart for %s: %d items, Total: %s", user_context_for_log, len(cart_items_detailed), grand_total)
 
     return cart_items_detailed, grand_total, is_empty
 
+def _reconcile_cart_with_stock(cart_session: Dict[str, int]) -> Tuple[List[CartLine], Decimal, bool, Dict[str, int], bool]:
+    """
+    Prices the cart for display and validates it against current stock with a single query.
+
+    Entries with an invalid book ID or quantity, and books that no longer exist, are dropped;
+    quantities above current stock are capped (or dropped when the book is out of stock).
+    Each change is flashed to the user. The display rows always match the returned cleaned cart,
+    so callers only need to save that cart back to the session when `was_modified` is True.
+
+    Args:
+        cart_session (Dict[str, int]): The cart data from the session, where keys are 
+                                       book IDs (as strings) and values are quantities.
+
+    Returns:
+        Tuple[List[CartLine], Decimal, bool, Dict[str, int], bool]: A tuple containing:
+            - `cart_items_detailed` (List[CartLine]): Display rows, as built by `_build_cart_item`.
+            - `grand_total` (Decimal): The cart total, rounded to two decimal places.
+            - `is_empty` (bool): True if no valid items remain.
+            - `cleaned_cart` (Dict[str, int]): The validated cart to store in the session.
+            - `was_modified` (bool): True if `cleaned_cart` differs from `cart_session`.
+
+    Raises:
+        DatabaseError: If the cart's stock could not be checked. The session cart should be
+                       left untouched in that case, since nothing could be validated.
+    """
+    cart_items_detailed: List[CartLine] = []
+    grand_total_cents = 0
+    cleaned_cart: Dict[str, int] = {}
+    was_modified = False
+    user_context_for_log = _UserContextForLog() # Built only if a log record is emitted
+
+    if not cart_session:
+        return cart_items_detailed, Decimal('0.00'), True, cleaned_cart, was_modified
+
+    requested_quantities: Dict[int, int] = {}
+
+    for book_id_str, quantity_in_session_cart in cart_session.items():
+        try:
+            quantity = int(quantity_in_session_cart)
+
+        except (ValueError, TypeError):
+            quantity = 0
+
+        if quantity <= 0: # Item has invalid quantity in session
+            was_modified = True
+            logger.info(f"Removed book ID {book_id_str} from session (invalid quantity '{quantity_in_session_cart}') during cart validation for {user_context_for_log}")
+            flash(f"Item with ID {book_id_str} was removed from your cart due to invalid quantity.", "info")
+
+            continue
+
+        if not book_id_str.isdigit(): # Invalid ID
+            was_modified = True
+            logger.warning(f"Removed invalid book ID {book_id_str} from session for {user_context_for_log}")
+            flash(f"A book (ID: {book_id_str}) in your cart is no longer available and has been removed.", "warning")
+
+            continue
+
+        if quantity != quantity_in_session_cart: # e.g. a numeric string stored by older code
+            was_modified = True
+
+        requested_quantities[int(book_id_str)] = quantity
+
+    # One query caps every requested quantity at current stock (LEAST in SQL) and returns the rows.
+    resolved_stock = resolve_cart_stock(requested_quantities) if requested_quantities else {}
+
+    for book_id, quantity in requested_quantities.items():
+        resolved = resolved_stock.get(book_id)
+
+        if resolved is None: # Book no longer exists
+            was_modified = True
+            logger.warning(f"Removed non-existent book ID {book_id} from session for {user_context_for_log}")
+            flash(f"A book (ID: {book_id}) in your cart is no longer available and has been removed.", "warning")
+
+            continue
+
+        allowed_quantity, book = resolved
+
+        # Quantity in session exceeded current available stock
+        if allowed_quantity < quantity:
+            was_modified = True
+            logger.info(f"Adjusted/removed quantity in session for book ID {book_id} (stock: {book.stock_quantity}) for {user_context_for_log}")
+
+            if allowed_quantity <= 0: # Stock is now 0, drop the item
+                flash(f"'{book.title_display}' was removed from your cart as it's now out of stock.", "warning")
+
+                continue
+
+            flash(f"Quantity for '{book.title_display}' was automatically adjusted in your cart to available stock: {allowed_quantity}.", "warning")
+
+        cleaned_cart[str(book_id)] = allowed_quantity
+        cart_item = _build_cart_item(book, allowed_quantity)
+        cart_items_detailed.append(cart_item)
+        grand_total_cents += cart_item.total_price_cents
+
+    grand_total = _cents_to_decimal(grand_total_cents)
+    is_empty = not cart_items_detailed
+    logger.debug("_reconcile_cart for %s: %d items, Total: %s, Modified: %s", user_context_for_log, len(cart_items_detailed), grand_total, was_modified)
+
+    return cart_items_detailed, grand_total, is_empty, cleaned_cart, was_modified
+
+def _store_session_cart_total(cart_total_cents: int) -> str:
+    """
+    Saves the running cart total (in cents, never negative) to the session.
+
+    Args:
+        cart_total_cents (int): The new total for the whole cart, in cents.
+
+    Returns:
+        str: The stored total formatted as a price string (e.g. "42.50").
+    """
+    cart_total_cents = max(cart_total_cents, 0)
+    session[SESSION_CART_TOTAL_KEY] = cart_total_cents
+
+    return _format_cents(cart_total_cents)
+
+def _get_session_cart_total(cart_session: Dict[str, int]) -> int:
+    """
+    Returns the running cart total stored in the session, in cents.
+    If the session has no (valid) stored total yet, e.g. for carts built before the
+    total was tracked, it is computed once from `cart_session` and stored.
+
+    Args:
+        cart_session (Dict[str, int]): The cart the stored total should describe.
+
+    Returns:
+        int: The cart total in cents.
+    """
+    stored_total_cents = session.get(SESSION_CART_TOTAL_KEY)
+
+    if isinstance(stored_total_cents, int):
+        return stored_total_cents
+
+    cart_items_detailed, _, _ = _calculate_current_cart_total_and_items(cart_session)
+    cart_total_cents = sum(item.total_price_cents for item in cart_items_detailed)
+    _store_session_cart_total(cart_total_cents)
+
+    return cart_total_cents
+
+def _invalidate_session_cart_total() -> None:
+    """
+    Drops the stored cart total so the next `_get_session_cart_total` re-derives it.
+    Used when a line whose book no longer exists leaves the cart, since its price
+    can no longer be subtracted.
+    """
+    session.pop(SESSION_CART_TOTAL_KEY, None)
+
+def _resync_session_cart_total(cart_session: Dict[str, int]) -> str:
+    """
+    Re-derives the stored cart total from the cart at current prices.
+    Used after removing or re-quantifying a line: the session does not record the price
+    each unit was added at, so subtracting at today's price would drift if it changed.
+
+    Args:
+        cart_session (Dict[str, int]): The cart as currently stored in the session.
+
+    Returns:
+        str: The new total formatted as a string with two decimals.
+    """
+    _invalidate_session_cart_total()
+
+    return _format_cents(_get_session_cart_total(cart_session))
+
+def _as_cart_quantity(value: Any) -> int:
+    """
+    Returns a stored cart quantity as a non-negative int; malformed values count as 0.
+    """
+    return value if isinstance(value, int) and value > 0 else 0
+
+def _store_session_cart_item_count(item_count: int) -> int:
+    """
+    Saves the running cart item count (sum of quantities) to the session.
+
+    Args:
+        item_count (int): The new item count; negative values are stored as 0.
+
+    Returns:
+        int: The stored item count.
+    """
+    item_count = max(item_count, 0)
+    session[SESSION_CART_ITEM_COUNT_KEY] = item_count
+
+    return item_count
+
+def _get_session_cart_item_count(cart_session: Dict[str, int]) -> int:
+    """
+    Returns the running cart item count stored in the session.
+    Carts built before the count was tracked are counted once from `cart_session`.
+
+    Args:
+        cart_session (Dict[str, int]): The cart the stored count should describe.
+
+    Returns:
+        int: The number of items (sum of quantities) in the cart.
+    """
+    stored_count = session.get(SESSION_CART_ITEM_COUNT_KEY)
+
+    if isinstance(stored_count, int):
+        return stored_count
+
+    return _resync_session_cart_item_count(cart_session)
+
+def _resync_session_cart_item_count(cart_session: Dict[str, int]) -> int:
+    """
+    Recounts the cart's quantities and stores the result as the running item count.
+
+    Args:
+        cart_session (Dict[str, int]): The cart as currently stored in the session.
+
+    Returns:
+        int: The number of items (sum of quantities) in the cart.
+    """
+    return _store_session_cart_item_count(sum(q for q in cart_session.values() if isinstance(q, int) and q > 0))
+
+def _add_to_cart_message(book: Book, requested_quantity: int, added_quantity: int, final_quantity: int) -> str:
+    """
+    Chooses the user-facing message for an add-to-cart outcome.
+
+    Args:
+        book (Book): The book being added.
+        requested_quantity (int): How many the user asked to add.
+        added_quantity (int): How many were actually added (capped by stock).
+        final_quantity (int): The book's quantity in the cart afterwards.
+
+    Returns:
+        str: The message for the JSON response.
+    """
+    if added_quantity == requested_quantity:
+        return f"Successfully added {added_quantity} of '{book.title_display}' to your cart. Cart now has {final_quantity}."
+
+    if added_quantity > 0:
+        return (f"You requested to add {requested_quantity}, but only {added_quantity} more of '{book.title_display}' "
+                f"could be added due to stock limits. Cart now contains {final_quantity} (max available stock).")
+
+    if final_quantity == 0: # Book is out of stock and none were in the cart
+        return f"Sorry, '{book.title_display}' is currently out of stock. Cannot add to cart."
+
+    return f"Cannot add more of '{book.title_display}'. Your cart already contains the maximum available stock ({book.stock_quantity})."
+
 
 @cart_bp.route("/add_to_cart", methods=["POST"])
 # No @login_required decorator - allows guests to add items to their session cart.
+@cart_json_endpoint("add item to cart")
 def add_to_cart_route():
     """
     Handles AJAX requests to add a book to the shopping cart stored in the session.
@@ -158,113 +541,68 @@ def add_to_cart_route():
               current cart item count, total cart value, and the actual quantity
               of the item now in the cart.
     """
-    user_context_for_log = _get_user_context_for_log()
-    data = None 
-    
-    try:
-        data = request.get_json()
-
-        if not data: 
-            logger.warning(f"Add to cart attempt by {user_context_for_log} - Invalid request: No JSON data.")
-
-            raise CartActionError("Invalid request data: Expected JSON payload.")
-            
-        book_id_str = str(data.get("book_id"))
-        requested_quantity_to_add = int(data.get("quantity", 1)) # Default to adding 1 if not specified
-
-        if not book_id_str or requested_quantity_to_add < 1:
-            logger.warning(f"Add to cart by {user_context_for_log} - Invalid input: book_id='{book_id_str}', quantity='{requested_quantity_to_add}'.")
+    user_context_for_log = _UserContextForLog()
 
-            raise CartActionError("Book ID and a valid positive quantity are required.")
+    data = request.get_json()
 
-        book_id_int = int(book_id_str)
-        book = get_book_by_id(book_id_int) # Raises NotFoundError if book doesn't exist
-        
-        cart = session.get("cart", {}) # Retrieve current cart from session
-        current_quantity_in_cart_for_item = cart.get(book_id_str, 0)
-        
-        message = ""
-        final_quantity_for_item_in_cart = current_quantity_in_cart_for_item
-        quantity_actually_added_this_time = 0
-        operation_status_success = True # Tracks if user's primary intent (add quantity) was met
-
-        if book.stock_quantity == 0 and current_quantity_in_cart_for_item == 0 : # Book is out of stock
-            message = f"Sorry, '{book.title.title()}' is currently out of stock. Cannot add to cart."
-            operation_status_success = False # Nothing could be added
-
-        else:
-            # Calculate how many more can be added before hitting total stock limit
-            available_to_add_now = book.stock_quantity - current_quantity_in_cart_for_item
-            
-            if available_to_add_now <= 0: # Cart already has max stock or more (should be rare)
-                message = f"Cannot add more of '{book.title.title()}'. Your cart already contains the maximum available stock ({book.stock_quantity})."
-
-                if requested_quantity_to_add > 0 : operation_status_success = False # User tried to add but couldn't
-
-            elif requested_quantity_to_add <= available_to_add_now:
-                # Can add the full requested quantity without exceeding stock
-                final_quantity_for_item_in_cart = current_quantity_in_cart_for_item + requested_quantity_to_add
-                quantity_actually_added_this_time = requested_quantity_to_add
-                message = f"Successfully added {quantity_actually_added_this_time} of '{book.title.title()}' to your cart. Cart now has {final_quantity_for_item_in_cart}."
-
-            else: # requested_quantity_to_add > available_to_add_now (and available_to_add_now > 0)
-                # Can only add some (up to stock limit)
-                final_quantity_for_item_in_cart = book.stock_quantity # Cap at total stock
-                quantity_actually_added_this_time = available_to_add_now 
-                message = (f"You requested to add {requested_quantity_to_add}, but only {quantity_actually_added_this_time} more of '{book.title.title()}' "
-                           f"could be added due to stock limits. Cart now contains {final_quantity_for_item_in_cart} (max available stock).")
-        
-        # Update cart session only if the final quantity is positive
-        if final_quantity_for_item_in_cart > 0:
-            cart[book_id_str] = final_quantity_for_item_in_cart
-
-        elif book_id_str in cart: # If final quantity is 0 and item was in cart, remove it
-            del cart[book_id_str]
-        
-        session["cart"] = cart
-        session.modified = True
+    if not data: 
+        logger.warning(f"Add to cart attempt by {user_context_for_log} - Invalid request: No JSON data.")
 
-        _, current_cart_total, _ = _calculate_current_cart_total_and_items(cart)
-        logger.info(
-            f"Add to cart: Book {book_id_str}, by {user_context_for_log}. "
-            f"Req add: {requested_quantity_to_add}, Actually added: {quantity_actually_added_this_time}. "
-            f"Final cart item qty: {cart.get(book_id_str, 0)}. Message: {message}"
-        )
+        raise CartActionError("Invalid request data: Expected JSON payload.")
         
-        response_payload = {
-            "success": operation_status_success, 
-            "message": message,
-            "cart_item_count": sum(v for v in cart.values() if isinstance(v, int)),
-            "cart_total_str": f"{current_cart_total:.2f}",
-            "actual_quantity_in_cart_for_item": cart.get(book_id_str, 0) 
-        }
-        # If operation_status_success is False, JS might use 'error' key if present
-        if not operation_status_success:
-             response_payload["error"] = message 
+    book_id_str = str(data.get("book_id"))
+    requested_quantity_to_add = int(data.get("quantity", 1)) # Default to adding 1 if not specified
 
-        return jsonify(response_payload), 200
+    if not book_id_str or requested_quantity_to_add < 1:
+        logger.warning(f"Add to cart by {user_context_for_log} - Invalid input: book_id='{book_id_str}', quantity='{requested_quantity_to_add}'.")
 
-    except NotFoundError as nfe:
-        book_id_attempt = data.get('book_id') if data and isinstance(data,dict) else 'N/A'
-        logger.warning(f"Add to cart by {user_context_for_log} failed: {nfe.user_facing_message} (Book ID attempt: {book_id_attempt})")
+        raise CartActionError("Book ID and a valid positive quantity are required.")
 
-        return jsonify({"success": False, "error": nfe.user_facing_message}), nfe.status_code
+    book_id_int = int(book_id_str)
+    book = get_book_cached(book_id_int) # Raises NotFoundError if book doesn't exist
     
-    except CartActionError as cae:
-        logger.warning(f"Add to cart by {user_context_for_log} failed with CartActionError: {cae.user_facing_message}")
-
-        return jsonify({"success": False, "error": cae.user_facing_message}), cae.status_code
+    cart = session.get("cart", {}) # Retrieve current cart from session
+    current_cart_total_cents = _get_session_cart_total(cart) # Total before this change
+    current_cart_item_count = _get_session_cart_item_count(cart)
+    current_quantity_in_cart_for_item = cart.get(book_id_str, 0)
     
-    except ValueError: # For int conversion errors
-        data_log = data if data and isinstance(data, dict) else 'N/A'
-        logger.warning(f"Add to cart by {user_context_for_log} failed: Invalid book ID or quantity format. Data: {data_log}")
+    # Add as much as stock allows, never lowering what is already in the cart.
+    final_quantity_for_item_in_cart = max(current_quantity_in_cart_for_item,
+                                          min(current_quantity_in_cart_for_item + requested_quantity_to_add, book.stock_quantity))
+    quantity_actually_added_this_time = final_quantity_for_item_in_cart - current_quantity_in_cart_for_item
+    operation_status_success = quantity_actually_added_this_time > 0 # Tracks if user's primary intent (add quantity) was met
+    message = _add_to_cart_message(book, requested_quantity_to_add, quantity_actually_added_this_time, final_quantity_for_item_in_cart)
+    
+    # Update cart session only if the final quantity is positive
+    if final_quantity_for_item_in_cart > 0:
+        cart[book_id_str] = final_quantity_for_item_in_cart
 
-        return jsonify({"success": False, "error": "Invalid book ID or quantity format."}), 400
+    elif book_id_str in cart: # If final quantity is 0 and item was in cart, remove it
+        del cart[book_id_str]
     
-    except Exception as e:
-        logger.error(f"Unexpected error adding to cart for {user_context_for_log}: {e}", exc_info=True)
-        
-        return jsonify({"success": False, "error": "Could not add item to cart due to an internal server error."}), 500
+    session["cart"] = cart
+
+    # Only this book's line changed, so adjust the running total instead of re-pricing the whole cart
+    cart_total_str = _store_session_cart_total(current_cart_total_cents + book.price_cents * quantity_actually_added_this_time)
+    cart_item_count = _store_session_cart_item_count(current_cart_item_count + quantity_actually_added_this_time)
+    logger.info(
+        f"Add to cart: Book {book_id_str}, by {user_context_for_log}. "
+        f"Req add: {requested_quantity_to_add}, Actually added: {quantity_actually_added_this_time}. "
+        f"Final cart item qty: {cart.get(book_id_str, 0)}. Message: {message}"
+    )
+    
+    response_payload = {
+        "success": operation_status_success, 
+        "message": message,
+        "cart_item_count": cart_item_count,
+        "cart_total_str": cart_total_str,
+        "actual_quantity_in_cart_for_item": cart.get(book_id_str, 0) 
+    }
+    # If operation_status_success is False, JS might use 'error' key if present
+    if not operation_status_success:
+         response_payload["error"] = message 
+
+    return cart_json_response(response_payload)
 
 
 @cart_bp.route("/") 
@@ -280,87 +618,28 @@ def view_cart_route():
     Returns:
         Response: Renders the cart template with cart items and total.
     """
-    user_context_for_log = _get_user_context_for_log()
+    user_context_for_log = _UserContextForLog()
     cart_session = session.get("cart", {}) # Get current cart from session
     logger.info(f"Viewing cart for {user_context_for_log}. Initial session cart: {cart_session}")
-    
-    # Calculate detailed items and total based on the current session cart
-    # This helper does not modify the session itself but reflects current data.
-    cart_items_for_display, grand_total_for_display, cart_is_empty_for_display = \
-        _calculate_current_cart_total_and_items(cart_session)
-    
-    # Perform a session clean-up pass:
-    # Adjust quantities in the *session* if stock has changed or items are invalid.
-    # This ensures the session is accurate for subsequent actions (like checkout).
-    current_cart_in_session = session.get("cart", {}).copy() # Work on a copy for modifications
-    session_was_modified = False
-    
-    for book_id_str, quantity_in_session_cart in list(current_cart_in_session.items()):
-        try:
-            book_id_int = int(book_id_str)
-            current_session_quantity = int(quantity_in_session_cart)
-
-            if current_session_quantity <= 0: # Item has invalid quantity in session
-                del current_cart_in_session[book_id_str]
-                session_was_modified = True
-                logger.info(f"Removed book ID {book_id_str} from session (quantity <= 0) during cart view for {user_context_for_log}")
-                flash(f"Item with ID {book_id_str} was removed from your cart due to invalid quantity.", "info")
-
-                continue
 
-            book = get_book_by_id(book_id_int) # May raise NotFoundError
-            if not book: # Should be caught by NotFoundError, but defensive
-                del current_cart_in_session[book_id_str]
-                session_was_modified = True
-                logger.warning(f"Removed non-existent book ID {book_id_str} from session for {user_context_for_log}")
-                flash(f"A book (ID: {book_id_str}) in your cart is no longer available and has been removed.", "warning")
-
-                continue
-
-            # Check if quantity in session exceeds current available stock
-            if current_session_quantity > book.stock_quantity:
-                new_valid_quantity_for_session = book.stock_quantity
-
-                if new_valid_quantity_for_session > 0:
-                    current_cart_in_session[book_id_str] = new_valid_quantity_for_session
-                    flash(f"Quantity for '{book.title.title()}' was automatically adjusted in your cart to available stock: {new_valid_quantity_for_session}.", "warning")
-
-                else: # Stock is now 0, remove item from session cart
-                    del current_cart_in_session[book_id_str]
-                    flash(f"'{book.title.title()}' was removed from your cart as it's now out of stock.", "warning")
-
-                session_was_modified = True
-                logger.info(f"Adjusted/removed quantity in session for book ID {book_id_str} (stock: {book.stock_quantity}) for {user_context_for_log}")
-
-        except (ValueError, NotFoundError): # If book_id is bad or book no longer exists
-            if book_id_str in current_cart_in_session:
-                del current_cart_in_session[book_id_str]
-                session_was_modified = True
-
-            logger.warning(f"Removed invalid or non-existent book ID {book_id_str} from session during cart view validation for {user_context_for_log}")
-            flash(f"An item (ID: {book_id_str}) in your cart was invalid or no longer available and has been removed.", "warning")
+    try:
+        # One pass builds the display rows and the stock-validated cart together.
+        cart_items_for_template, grand_total_for_template, cart_is_empty, cleaned_cart, session_was_modified = \
+            _reconcile_cart_with_stock(cart_session)
 
-        except Exception as e: # Catch-all for other issues with an item during session clean
-            logger.error(f"Unexpected error during cart session clean for item {book_id_str} ({user_context_for_log}): {e}", exc_info=True)
+    except DatabaseError as de:
+        # Without current book data nothing can be validated; leave the session untouched.
+        logger.error(f"Could not load cart for {user_context_for_log}: {de.log_message}", exc_info=True)
+        flash("Your cart could not be loaded right now. Please try again shortly.", "danger")
 
-            if book_id_str in current_cart_in_session: # Attempt to remove problematic item
-                del current_cart_in_session[book_id_str]
-                session_was_modified = True
+        return render_template("cart.html", cart_items=[], cart_total=Decimal('0.00'), is_empty=True)
 
     if session_was_modified:
-        session["cart"] = current_cart_in_session # Save the cleaned cart back to session
-        session.modified = True
-        logger.info(f"Cart session updated for {user_context_for_log} after validation. Re-calculating display items based on cleaned session.")
-        # Re-calculate display items and total with the cleaned session data
-        cart_items_for_template, grand_total_for_template, cart_is_empty = \
-            _calculate_current_cart_total_and_items(current_cart_in_session)
-        
-    else:
-        # If session wasn't modified, the initial calculation is still valid
-        cart_items_for_template = cart_items_for_display
-        grand_total_for_template = grand_total_for_display
-        cart_is_empty = cart_is_empty_for_display
+        session["cart"] = cleaned_cart # Save the cleaned cart back to session
+        logger.info(f"Cart session updated for {user_context_for_log} after validation.")
 
+    _store_session_cart_total(sum(item.total_price_cents for item in cart_items_for_template)) # Re-sync with current prices
+    _resync_session_cart_item_count(cleaned_cart)
 
     logger.info(f"Rendering cart page for {user_context_for_log}. Items to display: {len(cart_items_for_template)}, Calculated Total: ${grand_total_for_template:.2f}, IsEmpty: {cart_is_empty}")
 
@@ -372,6 +651,7 @@ def view_cart_route():
 
 @cart_bp.route("/remove", methods=["POST"])
 # No @login_required - guests can modify their session cart
+@cart_json_endpoint("remove item from cart")
 def remove_from_cart_route():
     """
     Handles AJAX requests to remove a book item completely from the session cart.
@@ -383,61 +663,52 @@ def remove_from_cart_route():
         JSON: A JSON response indicating success or failure, with a message,
               updated cart item count, and new cart total.
     """
-    user_context_for_log = _get_user_context_for_log()
-    data = None
+    user_context_for_log = _UserContextForLog()
 
-    try:
-        data = request.get_json()
+    data = request.get_json()
 
-        if not data: raise CartActionError("Invalid request: Expected JSON payload.")
+    if not data: raise CartActionError("Invalid request: Expected JSON payload.")
 
-        book_id_str = str(data.get("book_id"))
+    book_id_str = str(data.get("book_id"))
 
-        if not book_id_str: raise CartActionError("Book ID is required for removal.")
+    if not book_id_str: raise CartActionError("Book ID is required for removal.")
 
-        cart = session.get("cart", {})
-        book_title_for_msg = "The item" # Default title for message
+    cart = session.get("cart", {})
+    book_title_for_msg = "The item" # Default title for message
 
-        if book_id_str in cart:
-            try: # Attempt to get book title for a nicer message
-                book = get_book_by_id(int(book_id_str))
+    if book_id_str in cart:
+        current_cart_item_count = _get_session_cart_item_count(cart)
 
-                if book: book_title_for_msg = f"'{book.title.title()}'"
+        try: # Attempt to get book title for a nicer message
+            book = get_book_cached(int(book_id_str))
 
-            except NotFoundError: pass # Book might be deleted, use default title
-            except ValueError: pass # book_id_str might be invalid format
+            if book: book_title_for_msg = f"'{book.title_display}'"
 
-            del cart[book_id_str]
-            session["cart"] = cart
-            session.modified = True
-            logger.info(f"Book ID {book_id_str} removed from cart for {user_context_for_log}.")
-            
-            _, new_total, _ = _calculate_current_cart_total_and_items(cart)
+        except NotFoundError: pass # Book might be deleted, use default title
+        except ValueError: pass # book_id_str might be invalid format
 
-            return jsonify({
-                "success": True, "message": f"{book_title_for_msg} has been removed from your cart.",
-                "cart_item_count": sum(v for v in cart.values() if isinstance(v, int)),
-                "new_cart_total_str": f"{new_total:.2f}" 
-            }), 200
-        
-        else:
-            logger.warning(f"Attempt to remove non-existent book ID {book_id_str} from cart by {user_context_for_log}.")
+        removed_quantity = cart.pop(book_id_str)
+        session["cart"] = cart
+        logger.info(f"Book ID {book_id_str} removed from cart for {user_context_for_log}.")
 
-            raise CartActionError("Item was not found in your cart to remove.", status_code=404) # 404 if item not in cart
-            
-    except CartActionError as cae:
-        logger.warning(f"Remove from cart by {user_context_for_log} failed: {cae.user_facing_message}")
+        new_cart_total_str = _resync_session_cart_total(cart) # The line's price may have changed since it was added
+        cart_item_count = _store_session_cart_item_count(current_cart_item_count - _as_cart_quantity(removed_quantity) if cart else 0)
 
-        return jsonify({"success": False, "error": cae.user_facing_message}), cae.status_code
+        return cart_json_response({
+            "success": True, "message": f"{book_title_for_msg} has been removed from your cart.",
+            "cart_item_count": cart_item_count,
+            "new_cart_total_str": new_cart_total_str
+        })
     
-    except Exception as e:
-        logger.error(f"Unexpected error removing item from cart for {user_context_for_log}: {e}", exc_info=True)
+    else:
+        logger.warning(f"Attempt to remove non-existent book ID {book_id_str} from cart by {user_context_for_log}.")
 
-        return jsonify({"success": False, "error": "Could not remove item from cart due to a server error."}), 500
+        raise CartActionError("Item was not found in your cart to remove.", status_code=404) # 404 if item not in cart
 
 
 @cart_bp.route("/update", methods=["POST"])
 # No @login_required - guests can modify their session cart
+@cart_json_endpoint("update cart quantity")
 def update_cart_quantity_route():
     """
     Handles AJAX requests to update the quantity of a specific book in the session cart.
@@ -455,87 +726,81 @@ def update_cart_quantity_route():
               updated cart item count, new cart total, actual quantity set for the item,
               and the new total price for that specific item.
     """
-    user_context_for_log = _get_user_context_for_log()
-    data = None
+    user_context_for_log = _UserContextForLog()
 
-    try:
-        data = request.get_json()
+    data = request.get_json()
 
-        if not data: raise CartActionError("Invalid request: Expected JSON payload.")
+    if not data: raise CartActionError("Invalid request: Expected JSON payload.")
 
-        book_id_str = str(data.get("book_id"))
-        requested_quantity = int(data.get("quantity", 0)) # Default to 0 if not provided
+    book_id_str = str(data.get("book_id"))
+    requested_quantity = int(data.get("quantity", 0)) # Default to 0 if not provided
 
-        if not book_id_str: raise CartActionError("Book ID is required for quantity update.")
+    if not book_id_str: raise CartActionError("Book ID is required for quantity update.")
 
-        cart = session.get("cart", {})
+    cart = session.get("cart", {})
 
-        # Handle case where item might not be in cart (e.g., if user tries to update non-existent item)
-        if book_id_str not in cart and requested_quantity > 0:
-            logger.warning(f"Attempt to update quantity for non-existent book ID {book_id_str} in cart by {user_context_for_log}.")
-            # This could be treated as an "add" action, or an error. For "update", it's an error.
-            raise CartActionError("Item not found in cart. Please add the item before updating quantity.", status_code=404)
-        
-        elif book_id_str not in cart and requested_quantity <=0:
-             return jsonify({"success": True, "message": "Item was not in cart, no action taken."}), 200 # Benign
-            
-        book = get_book_by_id(int(book_id_str)) # Raises NotFoundError if book is invalid/deleted
+    # Handle case where item might not be in cart (e.g., if user tries to update non-existent item)
+    if book_id_str not in cart and requested_quantity > 0:
+        logger.warning(f"Attempt to update quantity for non-existent book ID {book_id_str} in cart by {user_context_for_log}.")
+        # This could be treated as an "add" action, or an error. For "update", it's an error.
+        raise CartActionError("Item not found in cart. Please add the item before updating quantity.", status_code=404)
+    
+    elif book_id_str not in cart and requested_quantity <=0:
+         return cart_json_response({"success": True, "message": "Item was not in cart, no action taken."}) # Benign
         
-        message = ""
-        final_quantity_set_in_cart = requested_quantity
+    try:
+        book = get_book_cached(int(book_id_str))
+
+    except NotFoundError: # Book was deleted: prune the dead line instead of leaving it in the cart
+        cart.pop(book_id_str, None)
+        session["cart"] = cart
+        _invalidate_session_cart_total()
+        _resync_session_cart_item_count(cart)
+        logger.info(f"Pruned deleted book ID {book_id_str} from cart during update for {user_context_for_log}.")
 
-        if requested_quantity > 0:
-            if requested_quantity > book.stock_quantity:
-                final_quantity_set_in_cart = book.stock_quantity
-                message = f"Quantity for '{book.title.title()}' was automatically adjusted to the maximum available stock: {final_quantity_set_in_cart}."
+        raise
 
-            else:
-                message = f"Quantity for '{book.title.title()}' updated to {final_quantity_set_in_cart}."
+    current_cart_item_count = _get_session_cart_item_count(cart)
+    previous_quantity_in_cart = _as_cart_quantity(cart.get(book_id_str, 0))
+    
+    message = ""
+    final_quantity_set_in_cart = requested_quantity
 
-            cart[book_id_str] = final_quantity_set_in_cart
+    if requested_quantity > 0:
+        if requested_quantity > book.stock_quantity:
+            final_quantity_set_in_cart = book.stock_quantity
+            message = f"Quantity for '{book.title_display}' was automatically adjusted to the maximum available stock: {final_quantity_set_in_cart}."
 
-        else: # Quantity is 0 or less, so remove the item from cart
-            if book_id_str in cart: # Ensure it was actually in cart before deleting
-                del cart[book_id_str]
-                message = f"'{book.title.title()}' removed from cart as quantity was set to zero or less."
+        else:
+            message = f"Quantity for '{book.title_display}' updated to {final_quantity_set_in_cart}."
 
-            else: # Should not be reached due to earlier checks
-                message = f"'{book.title.title()}' was not in cart to begin with."
-        
-        session["cart"] = cart
-        session.modified = True
-        
-        _, new_cart_total, _ = _calculate_current_cart_total_and_items(cart)
-        # Calculate new total for this specific item based on final quantity
-        item_price = book.price if book else Decimal('0.00') # Ensure book object exists
-        new_item_line_total = (item_price * Decimal(final_quantity_set_in_cart if final_quantity_set_in_cart > 0 else 0)
-                              ).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        logger.info(f"Update cart by {user_context_for_log}: Book {book_id_str}. Final item qty in cart: {cart.get(book_id_str, 0)}. Message: {message}")
-        return jsonify({
-            "success": True, "message": message,
-            "cart_item_count": sum(v for v in cart.values() if isinstance(v, int)),
-            "new_cart_total_str": f"{new_cart_total:.2f}",
-            "actual_quantity_set_for_item": cart.get(book_id_str, 0), # Current quantity of this item in cart
-            "item_new_total_price_str": f"{new_item_line_total:.2f}"
-        }), 200
-        
-    except (NotFoundError, CartActionError) as user_error:
-        logger.warning(f"Update cart quantity by {user_context_for_log} failed: {user_error.user_facing_message}")
+        cart[book_id_str] = final_quantity_set_in_cart
 
-        return jsonify({"success": False, "error": user_error.user_facing_message}), user_error.status_code
-    
-    except ValueError: # For int conversion errors
-        data_log = data if data and isinstance(data, dict) else 'N/A'
-        logger.warning(f"Update cart quantity by {user_context_for_log} failed: Invalid book ID or quantity format. Data: {data_log}")
+    else: # Quantity is 0 or less, so remove the item from cart
+        if book_id_str in cart: # Ensure it was actually in cart before deleting
+            del cart[book_id_str]
+            message = f"'{book.title_display}' removed from cart as quantity was set to zero or less."
 
-        return jsonify({"success": False, "error": "Invalid book ID or quantity format."}), 400
+        else: # Should not be reached due to earlier checks
+            message = f"'{book.title_display}' was not in cart to begin with."
     
-    except Exception as e:
-        logger.error(f"Unexpected error updating cart quantity for {user_context_for_log}: {e}", exc_info=True)
+    session["cart"] = cart
 
-        return jsonify({"success": False, "error": "Could not update cart quantity due to a server error."}), 500
-    
+    new_cart_total_str = _resync_session_cart_total(cart) # The line's price may have changed since it was added
+    cart_item_count = _store_session_cart_item_count(
+        current_cart_item_count + cart.get(book_id_str, 0) - previous_quantity_in_cart if cart else 0
+    )
+    # Calculate new total for this specific item based on final quantity
+    new_item_line_total_cents = book.price_cents * max(final_quantity_set_in_cart, 0)
+
+    logger.info(f"Update cart by {user_context_for_log}: Book {book_id_str}. Final item qty in cart: {cart.get(book_id_str, 0)}. Message: {message}")
+    return cart_json_response({
+        "success": True, "message": message,
+        "cart_item_count": cart_item_count,
+        "new_cart_total_str": new_cart_total_str,
+        "actual_quantity_set_for_item": cart.get(book_id_str, 0), # Current quantity of this item in cart
+        "item_new_total_price_str": _format_cents(new_item_line_total_cents)
+    })
 
 
 @cart_bp.route("/checkout", methods=["GET"])
@@ -547,91 +812,59 @@ def checkout_page_route():
     back to the cart view with appropriate messages.
     Pre-fills shipping address for logged-in users and guest email if available in session.
     """
-    user_context_for_log = _get_user_context_for_log()
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+    user_context_for_log = _UserContextForLog(user)
     cart_session = session.get("cart", {})
 
     if not cart_session:
         flash("Your cart is empty. Please add some books before proceeding to checkout.", "info")
-        logger.info(f"{user_context_for_log} attempted to checkout with an empty cart session.")
+        logger.info("%s attempted to checkout with an empty cart session.", user_context_for_log)
 
         return redirect(url_for('main.home')) # Or 'cart.view_cart_route'
     
 
-    cart_items_detailed, grand_total, is_empty = _calculate_current_cart_total_and_items(cart_session)
-    
-    if is_empty:
-        flash("Your cart has become empty or contains only unavailable/invalid items. Please add books to your cart.", "info")
-        logger.info(f"{user_context_for_log} attempted to checkout, but cart calculated as empty.")
-
-        return redirect(url_for('cart.view_cart_route'))
-
-    # Perform a final stock check before rendering the checkout page.
-    # If stock issues are found, update the session cart and redirect back to cart view
-    # where messages will be displayed by view_cart_route's session cleaning pass.
-    session_updated_due_to_stock = False
-    for item_on_page in cart_items_detailed: # Iterate over what _calculate_... prepared for display
-        try:
-            book = get_book_by_id(item_on_page["book_id"]) # Re-fetch for latest stock
-
-            # Compare quantity intended for display with current actual stock
-            if item_on_page["quantity"] > book.stock_quantity:
-                flash(f"Unfortunately, stock for '{item_on_page['title']}' has changed. Only {book.stock_quantity} are available. Your cart has been updated. Please review before proceeding.", "warning")
-                # Update session cart to reflect this stock change before redirecting
-                book_id_session_key = str(book.book_id)
-
-                if book_id_session_key in cart_session:
-                    if book.stock_quantity > 0:
-                        cart_session[book_id_session_key] = book.stock_quantity
-
-                    else: # If stock is now 0, remove from cart
-                        del cart_session[book_id_session_key]
-
-                    session_updated_due_to_stock = True
-                # Force redirect to cart view to show updated quantities and messages
-                if session_updated_due_to_stock:
-                    session["cart"] = cart_session
-                    session.modified = True
+    # Final stock check before rendering the checkout page, fused with the price calculation.
+    try:
+        cart_items_detailed, grand_total, is_empty, cleaned_cart, session_was_modified = \
+            _reconcile_cart_with_stock(cart_session)
 
-                return redirect(url_for('cart.view_cart_route'))
-            
-        except NotFoundError:
-             flash(f"The book '{item_on_page['title']}' is no longer available and has been removed from your cart. Please review your cart.", "danger")
-             book_id_session_key = str(item_on_page["book_id"])
+    except DatabaseError as de:
+        logger.error(f"Could not verify cart for checkout for {user_context_for_log}: {de.log_message}", exc_info=True)
+        flash("We couldn't verify your cart right now. Please try again shortly.", "danger")
 
-             if book_id_session_key in cart_session:
-                 del cart_session[book_id_session_key]
-                 session["cart"] = cart_session # Update session
-                 session.modified = True
+        return redirect(url_for('cart.view_cart_route'))
 
-             return redirect(url_for('cart.view_cart_route'))
+    _store_session_cart_total(sum(item.total_price_cents for item in cart_items_detailed)) # Re-sync with current prices
+    _resync_session_cart_item_count(cleaned_cart)
 
-    # If session was updated, recalculate details for checkout display
-    if session_updated_due_to_stock:
-        cart_items_detailed, grand_total, is_empty = _calculate_current_cart_total_and_items(session.get("cart", {}))
+    if session_was_modified:
+        # Stock or availability changed: save the adjusted cart and let the user review it
+        # (the adjustments have already been flashed).
+        session["cart"] = cleaned_cart
+        logger.info("%s was sent back to the cart: items changed during the checkout stock check.", user_context_for_log)
 
-        if is_empty: # Should be caught above, but defensive
-            flash("Your cart is now empty after stock adjustments.", "info")
+        if not is_empty:
+            flash("Your cart has been updated to match current availability. Please review it before proceeding.", "warning")
 
-            return redirect(url_for('cart.view_cart_route'))
+        return redirect(url_for('cart.view_cart_route'))
+    
+    if is_empty:
+        flash("Your cart has become empty or contains only unavailable/invalid items. Please add books to your cart.", "info")
+        logger.info("%s attempted to checkout, but cart calculated as empty.", user_context_for_log)
 
+        return redirect(url_for('cart.view_cart_route'))
 
     shipping_address_to_prefill = {}
     guest_email_to_prefill = "" 
 
-    if current_user.is_authenticated:
+    if user.is_authenticated:
         # Pre-fill shipping address from user's profile if available
-        shipping_address_to_prefill = {
-            "shipping_address_line1": getattr(current_user, 'address_line1', '') or "",
-            "shipping_address_line2": getattr(current_user, 'address_line2', '') or "",
-            "shipping_city": getattr(current_user, 'city', '') or "",
-            "shipping_state": getattr(current_user, 'state', '') or "",
-            "shipping_zip_code": getattr(current_user, 'zip_code', '') or ""
-        }
+        shipping_address_to_prefill = user.shipping_details
 
     else: # For guest, prefill email if they started checkout before and entered it
         guest_email_to_prefill = session.get('guest_checkout_email_prefill', '')
 
-    logger.info(f"{user_context_for_log} is proceeding to the checkout page. Cart total: ${grand_total:.2f}")
+    logger.info("%s is proceeding to the checkout page. Cart total: $%.2f", user_context_for_log, grand_total)
 
     return render_template("checkout.html", 
                            cart_items=cart_items_detailed, 
@@ -639,6 +872,29 @@ def checkout_page_route():
                            shipping_address=shipping_address_to_prefill, # Use specific var name
                            guest_email=guest_email_to_prefill) # Use specific var name
 
+def _render_checkout_with_errors(cart_session: Dict[str, int], shipping_address: Dict[str, str],
+                                 guest_email: str, errors: Dict[str, str]) -> Tuple[str, int]:
+    """
+    Re-renders the checkout page after a failed order submission.
+    The cart is priced here, once, only on the failure path; a successful order
+    never needs the display rows.
+
+    Args:
+        cart_session (Dict[str, int]): The cart data from the session.
+        shipping_address (Dict[str, str]): The submitted (normalized) shipping details.
+        guest_email (str): The submitted guest email, passed back as entered.
+        errors (Dict[str, str]): Field name -> error message.
+
+    Returns:
+        Tuple[str, int]: The rendered checkout page and a 400 status code.
+    """
+    cart_items_detailed, grand_total, _ = _calculate_current_cart_total_and_items(cart_session)
+
+    return render_template("checkout.html",
+                           cart_items=cart_items_detailed, cart_total=grand_total,
+                           shipping_address=shipping_address,
+                           guest_email=guest_email,
+                           errors=errors), 400
 
 @cart_bp.route("/place_order", methods=["POST"])
 # No @login_required; this route handles both authenticated and guest checkouts.
@@ -654,8 +910,9 @@ def place_order_route():
         Response: Redirects to order confirmation on success, or back to checkout
                   page with error messages on failure.
     """
-    user_context_for_log = _get_user_context_for_log()
-    logger.info(f"Route: {user_context_for_log} attempting to place an order.")
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+    user_context_for_log = _UserContextForLog(user)
+    logger.info("Route: %s attempting to place an order.", user_context_for_log)
     
     cart_session = session.get("cart", {})
     if not cart_session:
@@ -663,6 +920,30 @@ def place_order_route():
         return redirect(url_for('cart.view_cart_route'))
 
     form_data_raw = request.form.to_dict()
+
+    guest_email_for_service: Optional[str] = None
+    user_id_for_service: Optional[int] = None
+    recipient_email_for_confirmation: Optional[str] = None
+    user_name_for_confirmation: str = "Valued Customer"
+
+    # Identify the buyer first: the guest email check is the cheapest validation and the
+    # most common rejection, so it runs before any shipping field is normalized.
+    if user.is_authenticated:
+        user_id_for_service = getattr(user, 'id', None)
+        recipient_email_for_confirmation = getattr(user, 'email', None)
+        user_name_for_confirmation = getattr(user, 'first_name', '').title() or "BookNook Customer"
+    else:
+        guest_email_raw = form_data_raw.get('guest_email', '')
+        # Normalize and validate guest email
+        guest_email_for_service = normalize_whitespace(guest_email_raw).lower()
+        
+        if not _is_valid_guest_email(guest_email_for_service):
+            flash("A valid email address is required for guest checkout.", "danger")
+            return _render_checkout_with_errors(cart_session,
+                                                {field_key: form_data_raw.get(field_key, '') for field_key in SHIPPING_FIELDS}, # Pass back as submitted
+                                                guest_email_raw, # Pass back the raw, possibly invalid email
+                                                {"guest_email": "A valid email is required."})
+
     # For shipping details, it's usually better to normalize whitespace and then pass to sanitize_form_data
     # if HTML escaping is needed for some fields. Addresses generally don't need HTML escaping.
     
@@ -675,44 +956,21 @@ def place_order_route():
         "shipping_zip_code": normalize_whitespace(form_data_raw.get('shipping_zip_code', ''))
     }
     # Basic validation for required shipping fields (can be expanded in service layer)
-    required_shipping_fields = ['shipping_address_line1', 'shipping_city', 'shipping_state', 'shipping_zip_code']
     form_validation_errors = {}
-    for field_key in required_shipping_fields:
+    missing_field_names = []
+    for field_key in REQUIRED_SHIPPING_FIELDS:
         if not shipping_details_for_service.get(field_key):
-            error_message = "This shipping field is required."
-            flash(f"The field '{field_key.replace('_',' ').title()}' is required.", "danger") # User-friendly field name
-            form_validation_errors[field_key] = error_message
+            form_validation_errors[field_key] = "This shipping field is required."
+            missing_field_names.append(field_key.replace('_',' ').title()) # User-friendly field name
             
     if form_validation_errors:
-        cart_items_detailed, grand_total, _ = _calculate_current_cart_total_and_items(cart_session)
-        return render_template("checkout.html", 
-                               cart_items=cart_items_detailed, cart_total=grand_total,
-                               shipping_address=shipping_details_for_service, # Pass back submitted (and normalized) details
-                               guest_email=form_data_raw.get('guest_email', ''), # Pass back raw guest email
-                               errors=form_validation_errors), 400
+        # One aggregated message (one session write); the template still shows the per-field errors.
+        flash(f"The following shipping fields are required: {', '.join(missing_field_names)}.", "danger")
+        return _render_checkout_with_errors(cart_session, shipping_details_for_service, # Pass back submitted (and normalized) details
+                                            form_data_raw.get('guest_email', ''), # Pass back raw guest email
+                                            form_validation_errors)
 
-    guest_email_for_service: Optional[str] = None
-    user_id_for_service: Optional[int] = None
-    recipient_email_for_confirmation: Optional[str] = None
-    user_name_for_confirmation: str = "Valued Customer"
-
-    if current_user.is_authenticated:
-        user_id_for_service = getattr(current_user, 'id', None)
-        recipient_email_for_confirmation = getattr(current_user, 'email', None)
-        user_name_for_confirmation = getattr(current_user, 'first_name', '').title() or "BookNook Customer"
-    else:
-        guest_email_raw = form_data_raw.get('guest_email', '')
-        # Normalize and validate guest email
-        guest_email_for_service = normalize_whitespace(guest_email_raw).lower()
-        
-        if not guest_email_for_service or not re.match(EMAIL_REGEX, guest_email_for_service):
-            flash("A valid email address is required for guest checkout.", "danger")
-            cart_items_detailed, grand_total, _ = _calculate_current_cart_total_and_items(cart_session)
-            return render_template("checkout.html", 
-                                   cart_items=cart_items_detailed, cart_total=grand_total,
-                                   shipping_address=shipping_details_for_service, 
-                                   guest_email=guest_email_raw, # Pass back the raw, possibly invalid email
-                                   errors={"guest_email": "A valid email is required."}), 400
+    if guest_email_for_service: # Valid guest email: remember it for prefill
         recipient_email_for_confirmation = guest_email_for_service
         session['guest_checkout_email_prefill'] = guest_email_for_service # Store valid, normalized email for prefill
 
@@ -721,7 +979,7 @@ def place_order_route():
         return redirect(url_for('cart.checkout_page_route'))
             
     try:
-        logger.info(f"Attempting to create order for {user_context_for_log}. Shipping: {shipping_details_for_service}")
+        logger.info("Attempting to create order for %s. Shipping: %s", user_context_for_log, shipping_details_for_service)
         
         order = create_order_from_cart(
             user_id=user_id_for_service,
@@ -734,7 +992,7 @@ def place_order_route():
             logger.error(f"Order creation failed to return a valid order object for {user_context_for_log}.")
             raise DatabaseError("Order processing failed: Could not get order details after creation.")
 
-        logger.info(f"Order {order.order_id} placed successfully for {user_context_for_log}.")
+        logger.info("Order %s placed successfully for %s.", order.order_id, user_context_for_log)
 
         # Send order confirmation email using the template
         if recipient_email_for_confirmation:
@@ -755,7 +1013,7 @@ def place_order_route():
                     template_path='email/order_confirmation_email.html', 
                     **email_context
                 )
-                logger.info(f"Order confirmation email initiated for order {order.order_id} to '{recipient_email_for_confirmation}'.")
+                logger.info("Order confirmation email initiated for order %s to '%s'.", order.order_id, recipient_email_for_confirmation)
                 flash(f"Thank you! Your order (ID: {order.order_id}) has been placed. A confirmation email has been sent.", "success")
             except AppException as email_exc: 
                 logger.error(
@@ -771,18 +1029,20 @@ def place_order_route():
                 )
                  flash(f"Your order (ID: {order.order_id}) was placed successfully, but there was an unexpected error sending the confirmation email.", "warning")
         else:
-            logger.warning(f"No recipient email found for order {order.order_id}. Cannot send confirmation email.")
+            logger.warning("No recipient email found for order %s. Cannot send confirmation email.", order.order_id)
             flash(f"Thank you! Your order (ID: {order.order_id}) has been placed successfully!", "success") # Still inform order success
 
         session.pop("cart", None) 
-        if not current_user.is_authenticated:
+        session.pop(SESSION_CART_TOTAL_KEY, None)
+        session.pop(SESSION_CART_ITEM_COUNT_KEY, None)
+        if not user.is_authenticated:
             session.pop("guest_checkout_email_prefill", None) # Clear prefill after successful order
             session['just_placed_order_id'] = order.order_id
             session['guest_order_email'] = guest_email_for_service # Store the validated guest email
-            logger.debug(f"GUEST ORDER: Set session 'just_placed_order_id' to {order.order_id} and 'guest_order_email' for confirmation page.")
-        session.modified = True
+            logger.debug("GUEST ORDER: Set session 'just_placed_order_id' to %s and 'guest_order_email' for confirmation page.", order.order_id)
         
-        logger.debug(f"Redirecting to order confirmation page for order_id: {order.order_id}. Current session: {dict(session)}")
+        if logger.isEnabledFor(logging.DEBUG): # Skip building the key list when DEBUG is filtered out
+            logger.debug("Redirecting to order confirmation page for order_id: %s. Session keys: %s", order.order_id, list(session.keys()))
         return redirect(url_for('order.order_confirmation_route', order_id=order.order_id))
 
     except (ValidationError, OrderProcessingError, NotFoundError, DatabaseError, AppException) as e:
@@ -2,16 +2,57 @@
 
 import os
 import sys
+import queue # Hands log records to the background listener
+import atexit # Flushes queued records on interpreter exit
 import logging 
 from flask import current_app
-from logging.handlers import RotatingFileHandler # For file logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener # File logging off the request thread
 
 _MAIN_APP_LOGGER_NAME = 'bookstore_project_app' # Default name, updated by setup_logger
+_queue_listener = None # QueueListener writing app.logger records to the real handlers
+
+def _start_queue_listener(app, handlers: list, log_level: int) -> None:
+    """
+    Routes app.logger through a QueueHandler and starts a background QueueListener
+    that owns the real (console/file) handlers. Request threads only enqueue records;
+    the disk writes and file rollovers happen on the listener's thread.
+    Any listener from an earlier setup_logger call is stopped (and flushed) first.
+
+    Args:
+        app (Flask): The Flask application instance.
+        handlers (list): The handlers that should receive the records.
+        log_level (int): Level for the queue handler itself.
+    """
+    global _queue_listener
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+
+    log_queue = queue.Queue(-1) # Unbounded: logging must never block or drop on the request path
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setLevel(log_level)
+    app.logger.addHandler(queue_handler)
+
+    _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+def _stop_queue_listener() -> None:
+    """
+    Stops the background listener, writing out any records still queued.
+    """
+    global _queue_listener
+
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+atexit.register(_stop_queue_listener)
 
 def setup_logger(app):
     """
     Configures the primary logger for the Flask application (app.logger).
-    Sets logging level, format, and handlers (console and file).
+    Sets logging level, format, and handlers (console and file). The handlers run
+    behind a QueueHandler/QueueListener pair, so request threads never wait on disk I/O.
     Removes pre-existing handlers to avoid duplication.
 
     Args:
@@ -39,12 +80,16 @@ def setup_logger(app):
     console_handler = logging.StreamHandler(sys.stderr)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    app.logger.addHandler(console_handler)
+    handlers = [console_handler]
 
     # File Handler - Ensure instance folder exists
     # Logs will go to a file like 'instance/app.log'
     # The 'instance' folder is a good place for logs that are instance-specific and not part of version control.
     # You might need to add 'instance/' to your .gitignore.
+    log_dir = None
+    log_file_path = None
+    log_dir_error = None
+
     if not app.config.get('TESTING'): # Don't create log files during testing by default
         log_dir = os.path.join(app.instance_path, 'logs') # Using instance_path for logs
         
@@ -53,7 +98,7 @@ def setup_logger(app):
                 os.makedirs(log_dir)
 
             except OSError as e:
-                app.logger.error(f"Could not create log directory {log_dir}: {e}", exc_info=True)
+                log_dir_error = e # Logged once the handlers are in place
         
         if os.path.exists(log_dir):
             log_file_path = os.path.join(log_dir, 'app.log')
@@ -66,11 +111,19 @@ def setup_logger(app):
 
             file_handler.setLevel(log_level)
             file_handler.setFormatter(formatter)
-            app.logger.addHandler(file_handler)
-            app.logger.info(f"File logging enabled. Log file: {log_file_path}")
+            handlers.append(file_handler)
+
+    # app.logger only enqueues; the console/file handlers run on the listener thread.
+    _start_queue_listener(app, handlers, log_level)
+
+    if log_dir_error is not None:
+        app.logger.error(f"Could not create log directory {log_dir}: {log_dir_error}", exc_info=log_dir_error)
+
+    if log_file_path:
+        app.logger.info(f"File logging enabled. Log file: {log_file_path}")
 
-        else:
-            app.logger.warning(f"File logging disabled as log directory could not be created: {log_dir}")
+    elif log_dir:
+        app.logger.warning(f"File logging disabled as log directory could not be created: {log_dir}")
 
 
     app.logger.propagate = False 
@@ -1,52 +1,170 @@
 # cs492_bookstore_project/app/main/routes.py
-from flask import render_template, redirect, url_for, flash, current_app, request
+from flask import render_template, url_for, flash, current_app, request, session, make_response, g, Response
 import math
+from contextlib import contextmanager # For the shared route error handler
+from functools import wraps # For the static_page_cache decorator
 from flask_login import login_required, current_user
-from typing import List, Dict, Any # For type hinting
+from typing import Callable, Iterator, List, Dict, Any # For type hinting
 
 from . import main_bp # Import the blueprint instance from app/main/__init__.py
-from app.services.book_service import get_all_books, get_all_distinct_genres
+from app.services.book_loader import get_catalog_page_cached, get_all_distinct_genres_cached # Short-TTL cached catalog pages and genres
+from app.services.book_cache import get_cached_rendered_page, cache_rendered_page # Rendered pages for anonymous visitors
 from app.services.order_service import get_orders_by_user 
 from app.services.review_service import get_reviews_by_user_id 
-from app.services.exceptions import AuthorizationError, DatabaseError # Custom exceptions
+from app.services.exceptions import DatabaseError # Custom exceptions
 from app.logger import get_logger # Custom application logger
 
 logger = get_logger(__name__) # Logger instance for this module
 
-def _get_user_context_for_log_main() -> str:
+# How long browsers/shared caches may reuse the home page for anonymous visitors without session state.
+HOME_PAGE_PUBLIC_MAX_AGE_SECONDS = 60
+# Same, for the informational pages (about, FAQ, contact, policies), whose content never changes per request.
+STATIC_PAGE_PUBLIC_MAX_AGE_SECONDS = 3600
+
+# Accepted listing sort options; anything else falls back to the default (title, ascending).
+_VALID_SORT_BY_OPTIONS = frozenset(('title', 'author', 'price', 'newest'))
+_VALID_SORT_ORDERS = frozenset(('asc', 'desc'))
+
+def _get_user_context_for_log_main(user: Any = None) -> str:
     """
     Helper function to generate a consistent string representation for logging 
     the current user context (authenticated user or guest) within the main blueprint.
+    The string is built once per request and kept on `flask.g`.
+
+    Args:
+        user (Any, optional): The already-resolved current user. Defaults to `current_user`.
 
     Returns:
         str: A string identifying the user, e.g., "user 123 (user@example.com)" or "guest user".
     """
-    if current_user.is_authenticated:
-        user_id_log = getattr(current_user, 'id', 'UNKNOWN_ID')
-        user_email_log = getattr(current_user, 'email', 'UNKNOWN_EMAIL')
-        return f"user {user_id_log} ({user_email_log})"
-    
-    return "guest user"
+    user_context_log = g.get('user_context_for_log')
+    if user_context_log is not None:
+        return user_context_log
+
+    if user is None:
+        user = current_user._get_current_object() # Resolve the LocalProxy once
+
+    if user.is_authenticated:
+        user_context_log = f"user {user.id} ({user.email})" # Authenticated users are always our User model
+
+    else:
+        user_context_log = "guest user"
+
+    g.user_context_for_log = user_context_log
+    return user_context_log
+
+class _LazyUserContextForLogMain:
+    """
+    Defers `_get_user_context_for_log_main` until a log record is actually emitted.
+    Pass it as a `%s` argument; filtered-out records never build the description.
+    """
+    __slots__ = ('_user',)
+
+    def __init__(self, user: Any = None):
+        self._user = user # The unwrapped current user, if the caller already resolved it
+
+    def __str__(self) -> str:
+        return _get_user_context_for_log_main(self._user)
+
+def _apply_page_cache_headers(response: Response, max_age: int, user: Any = None) -> Response:
+    """
+    Adds caching headers to a rendered page and answers conditional requests.
+
+    An anonymous visitor with an empty, untouched session (no cart, no flashed messages) gets
+    the same page as everyone else, and no Set-Cookie is sent for an empty session, so that
+    response is marked public for `max_age` seconds. Flask already adds `Vary: Cookie` because
+    the session was read. Everyone else sees per-user navbar state, so their copy is private and
+    must be revalidated. Either way an ETag is added, so an unchanged page is answered with 304.
+
+    Args:
+        response (Response): The rendered page.
+        max_age (int): Seconds a shared cache may reuse the anonymous version.
+        user (Any, optional): The already-resolved current user. Defaults to `current_user`.
+
+    Returns:
+        Response: The same response, or a 304 if the client's copy is still current.
+    """
+    if user is None:
+        user = current_user._get_current_object()
+
+    if not user.is_authenticated and not session and not session.modified:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+    response.add_etag()
+    return response.make_conditional(request)
+
+def static_page_cache(max_age: int = STATIC_PAGE_PUBLIC_MAX_AGE_SECONDS) -> Callable:
+    """
+    Decorator for informational pages: renders the view, then applies
+    `_apply_page_cache_headers` with `max_age`.
+    The pages extend `base.html` (navbar user, cart badge, flashes), so they can't be rendered
+    once at startup; instead, the HTML rendered for anonymous visitors without session state is
+    kept in the rendered page cache and reused for the next such visitor. The cache entry is
+    keyed on the endpoint alone, so only use this on views that take no query parameters.
+
+    Args:
+        max_age (int): Seconds a shared cache may reuse the anonymous version.
+    """
+    def decorator(view_func: Callable) -> Callable:
+        @wraps(view_func)
+        def wrapper(*args: Any, **kwargs: Any) -> Response:
+            user = current_user._get_current_object() # Resolve the LocalProxy once
+            shared_page_key = None
+
+            if not user.is_authenticated and not session:
+                # Endpoint only: these pages ignore query parameters, and keying on the raw query
+                # string would let `?x=1`, `?x=2`, ... evict the catalog pages from the shared cache.
+                shared_page_key = (request.endpoint,)
+                cached_html = get_cached_rendered_page(shared_page_key)
+
+                if cached_html is not None:
+                    return _apply_page_cache_headers(make_response(cached_html), max_age, user)
+
+            response = make_response(view_func(*args, **kwargs))
+
+            if shared_page_key is not None and not session.modified:
+                cache_rendered_page(shared_page_key, response.get_data(as_text=True))
+
+            return _apply_page_cache_headers(response, max_age, user)
+
+        return wrapper
+
+    return decorator
 
 def _get_book_display_params_from_request() -> Dict[str, Any]:
     """
     Helper to extract and normalize book display parameters (filter, search, sort)
     from the current request's query arguments.
 
+    The result is kept on `flask.g`, so repeated calls within a request parse the query once.
+
     Returns:
         Dict[str, Any]: A dictionary containing 'genre_filter', 'search_term',
                         'sort_by', and 'sort_order'.
     """
-    genre_filter = request.args.get('genre', 'all', type=str).strip().lower()
-    search_term = request.args.get('search', '', type=str).strip()
-    sort_by = request.args.get('sort_by', 'title', type=str).strip().lower() # Default sort by title
-    sort_order = request.args.get('sort_order', 'asc', type=str).strip().lower()
-    if sort_order not in ['asc', 'desc']:
+    display_params = g.get('book_display_params')
+    if display_params is not None:
+        return display_params
+
+    args = request.args # Resolve the request proxy once
+    genre_filter = args.get('genre', 'all', type=str).strip().lower()
+    search_term = args.get('search', '', type=str).strip()
+    sort_by = args.get('sort_by', 'title', type=str).strip().lower() # Default sort by title
+    if sort_by not in _VALID_SORT_BY_OPTIONS:
+        sort_by = 'title' # Default to title if invalid value
+
+    sort_order = args.get('sort_order', 'asc', type=str).strip().lower()
+    if sort_order not in _VALID_SORT_ORDERS:
         sort_order = 'asc' # Default to ascending if invalid value
 
-    per_page = request.args.get('per_page', 25, type=int)
+    per_page = args.get('per_page', 25, type=int)
 
-    return {
+    g.book_display_params = display_params = {
         "genre_filter": genre_filter if genre_filter != 'all' else None, # Pass None if 'all'
         "search_term": search_term,
         "sort_by": sort_by,
@@ -58,39 +176,60 @@ def _get_book_display_params_from_request() -> Dict[str, Any]:
         "current_sort_order": sort_order,
         "current_per_page": per_page
     }
+    return display_params
 
-@main_bp.route("/")
-def home():
+@contextmanager
+def _flash_on_load_errors(data_description: str, log_context: Any, unexpected_advice: str = "Please try again.") -> Iterator[None]:
     """
-    Renders the home page of the bookstore (`home.html`).
-    Fetches books based on optional query parameters for filtering by genre,
-    searching by title/author, and sorting. Also fetches a list of distinct genres
-    for the filter dropdown.
+    Shared error handling for pages that load data before rendering: a `DatabaseError` or
+    any other exception raised in the block is logged and flashed, and the route goes on to
+    render whatever was loaded (typically empty defaults).
+
+    Args:
+        data_description (str): What was being loaded, as shown to the user, e.g. "book data".
+        log_context (Any): Identifies the page/user in the log message (formatted lazily).
+        unexpected_advice (str): Sentence appended to the flash for unexpected errors.
+    """
+    try:
+        yield
 
-    Query Parameters:
-        - `genre` (str, optional): Filter books by this genre.
-        - `search` (str, optional): Search term for book titles or authors.
-        - `sort_by` (str, optional): Column to sort books by ('title', 'author', 'price', 'newest').
-                                     Defaults to 'title'.
-        - `sort_order` (str, optional): Sort direction ('asc' or 'desc'). Defaults to 'asc'.
+    except DatabaseError as de:
+        logger.error("Route: Database error fetching %s for %s: %s", data_description, log_context, de.log_message, exc_info=True)
+        flash(f"Could not load {data_description} due to a database issue. Please try again later.", "danger")
+
+    except Exception as e:
+        logger.error("Route: Unexpected error fetching %s for %s: %s", data_description, log_context, e, exc_info=True)
+        flash(f"An unexpected error occurred while loading {data_description}. {unexpected_advice}", "danger")
+
+def _render_book_listing(template_name: str, action_endpoint: str, page_label: str, user: Any) -> Response:
+    """
+    Shared body of the catalog pages (`home` and `customer`): reads the filter/sort/page
+    parameters, loads the (cached) catalog page and genre list, and renders `template_name`.
+    Database failures are flashed and the page is rendered with an empty listing.
+
+    Args:
+        template_name (str): The template to render, e.g. 'home.html'.
+        action_endpoint (str): Endpoint the filter form submits to, e.g. 'main.home'.
+        page_label (str): Name of the page in log messages, e.g. 'home page'.
+        user (Any): The already-resolved current user.
 
     Returns:
-        Response: Renders `home.html` with the list of books, available genres,
-                  and current filter/sort parameters.
+        Response: The rendered page.
     """
-    requester_context = _get_user_context_for_log_main()
+    user_context_log = _LazyUserContextForLogMain(user) # Built only if a log record is emitted
     display_params = _get_book_display_params_from_request()
-    logger.info(f"Route: Home page requested by {requester_context} with params: {display_params}")
+    logger.info("Route: %s requested by %s with params: %s", page_label, user_context_log, display_params)
 
     page = request.args.get('page', 1, type=int)
     per_page = display_params.get("current_per_page", 25)
 
     books_for_template: List[Dict[str, Any]] = [] # List of dictionaries for JSON
     genres: List[str] = []
+    total_count = 0
     total_pages = 1
 
-    try:
-        pagination_data = get_all_books(
+    with _flash_on_load_errors("book data", page_label):
+        pagination_data = get_catalog_page_cached(
             genre_filter=display_params["genre_filter"],
             search_term=display_params["search_term"],
             sort_by=display_params["sort_by"],
@@ -98,35 +237,62 @@ def home():
             page=page,
             per_page=per_page
         )
-        books_objects = pagination_data.get('books', [])
+        books_for_template = pagination_data.get('books', []) # Already converted (and cached) as dicts
         total_count = pagination_data.get('total_count', 0)
         total_pages = math.ceil(total_count / per_page) if total_count > 0 else 1
 
-        # Convert Book objects to dictionaries for the template/JSON
-        for book_obj in books_objects:
-            if hasattr(book_obj, 'to_dict') and callable(book_obj.to_dict):
-                books_for_template.append(book_obj.to_dict()) 
-            else:
-                logger.warning(f"Book object missing to_dict method.")
-
-        genres = get_all_distinct_genres()
-        logger.debug(f"Route: Retrieved {len(books_for_template)} books (Page {page}/{total_pages}) and {len(genres)} genres for home page.")
-    except DatabaseError as de:
-        logger.error(f"Route: Database error fetching data for home page: {de.log_message}", exc_info=True)
-        flash("Could not load book data due to a database issue. Please try again later.", "danger")
-    except Exception as e:
-        logger.error(f"Route: Unexpected error fetching data for home page: {e}", exc_info=True)
-        flash("An unexpected error occurred while loading book data. Please try again.", "danger")
+        genres = get_all_distinct_genres_cached()
+        logger.debug("Route: Retrieved %s books (Page %s/%s) and %s genres for %s (%s).", len(books_for_template), page, total_pages, len(genres), page_label, user_context_log)
 
-    return render_template("home.html", 
+    return make_response(render_template(template_name, 
                            books=books_for_template, # Pass the list of dictionaries
                            genres=genres,
                            current_filters=display_params,
-                           action_url=url_for('main.home'),
+                           action_url=url_for(action_endpoint),
                            page=page,
                            total_pages=total_pages,
                            total_count=total_count
-                           )
+                           ))
+
+@main_bp.route("/")
+def home():
+    """
+    Renders the home page of the bookstore (`home.html`).
+    Fetches books based on optional query parameters for filtering by genre,
+    searching by title/author, and sorting. Also fetches a list of distinct genres
+    for the filter dropdown.
+
+    Query Parameters:
+        - `genre` (str, optional): Filter books by this genre.
+        - `search` (str, optional): Search term for book titles or authors.
+        - `sort_by` (str, optional): Column to sort books by ('title', 'author', 'price', 'newest').
+                                     Defaults to 'title'.
+        - `sort_order` (str, optional): Sort direction ('asc' or 'desc'). Defaults to 'asc'.
+
+    Returns:
+        Response: Renders `home.html` with the list of books, available genres,
+                  and current filter/sort parameters. Publicly cacheable for
+                  `HOME_PAGE_PUBLIC_MAX_AGE_SECONDS` when the visitor has no session state;
+                  for those visitors the rendered HTML is also reused server-side, per query string.
+    """
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+
+    # Anonymous visitors without session state all get identical HTML, so serve it from memory.
+    shared_page_key = None
+    if not user.is_authenticated and not session:
+        shared_page_key = ('main.home', request.query_string)
+        cached_html = get_cached_rendered_page(shared_page_key)
+
+        if cached_html is not None:
+            logger.debug("Route: Home page served from the rendered page cache for %s.", request.query_string)
+            return _apply_page_cache_headers(make_response(cached_html), HOME_PAGE_PUBLIC_MAX_AGE_SECONDS, user)
+
+    response = _render_book_listing("home.html", 'main.home', "Home page", user)
+
+    if shared_page_key is not None and not session.modified: # A flashed error means the page is not shareable
+        cache_rendered_page(shared_page_key, response.get_data(as_text=True))
+
+    return _apply_page_cache_headers(response, HOME_PAGE_PUBLIC_MAX_AGE_SECONDS, user)
 
 @main_bp.route('/customer')
 @login_required 
@@ -143,54 +309,7 @@ def customer():
     Returns:
         Response: Renders `customer.html` with books, genres, and filter/sort parameters.
     """
-    user_context_log = _get_user_context_for_log_main() 
-    display_params = _get_book_display_params_from_request()
-    logger.info(f"Route: Customer dashboard requested by {user_context_log} with params: {display_params}")
-
-    page = request.args.get('page', 1, type=int)
-    per_page = display_params.get("current_per_page", 25)
-
-    books_for_template: List[Dict[str, Any]] = []
-    genres: List[str] = []
-    total_pages = 1
-
-    try:
-        pagination_data = get_all_books(
-            genre_filter=display_params["genre_filter"],
-            search_term=display_params["search_term"],
-            sort_by=display_params["sort_by"],
-            sort_order=display_params["sort_order"],
-            page=page,
-            per_page=per_page
-        )
-        books_objects = pagination_data.get('books', [])
-        total_count = pagination_data.get('total_count', 0)
-        total_pages = math.ceil(total_count / per_page) if total_count > 0 else 1
-
-        for book_obj in books_objects:
-            if hasattr(book_obj, 'to_dict') and callable(book_obj.to_dict):
-                books_for_template.append(book_obj.to_dict())
-            else:
-                logger.warning(f"Book object missing to_dict method.")
-
-        genres = get_all_distinct_genres()
-        logger.debug(f"Route: Retrieved {len(books_for_template)} books (Page {page}/{total_pages}) and {len(genres)} for customer dashboard ({user_context_log}).")
-    except DatabaseError as de:
-        logger.error(f"Route: Database error fetching data for home page: {de.log_message}", exc_info=True)
-        flash("Could not load book data due to a database issue. Please try again later.", "danger")
-    except Exception as e:
-        logger.error(f"Route: Unexpected error fetching data for home page: {e}", exc_info=True)
-        flash("An unexpected error occurred while loading book data. Please try again.", "danger")
-
-    return render_template('customer.html', 
-                           books=books_for_template, # Pass the list of dictionaries
-                           genres=genres,
-                           current_filters=display_params,
-                           action_url=url_for('main.customer'),
-                           page=page,
-                           total_pages=total_pages,
-                           total_count=total_count
-                           ) 
+    return _render_book_listing('customer.html', 'main.customer', "Customer dashboard", current_user._get_current_object())
 
 @main_bp.route('/profile')
 @login_required 
@@ -205,59 +324,56 @@ def profile_page():
         Response: Renders `profile.html` with user's orders and reviews.
                   Flashes an error if data retrieval fails.
     """
-    user_context_log = _get_user_context_for_log_main() 
-    logger.info(f"Route: Profile page requested for {user_context_log}")
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+    user_context_log = _LazyUserContextForLogMain(user) # Built only if a log record is emitted
+    logger.info("Route: Profile page requested for %s", user_context_log)
     
     user_orders: List[Any] = []
     user_reviews_list: List[Dict[str, Any]] = [] 
     
-    try:
-        logger.debug(f"Route: Fetching order history for {user_context_log}.")
-        user_orders = get_orders_by_user(current_user.id) # type: ignore
-        logger.info(f"Route: Found {len(user_orders)} orders for {user_context_log}.")
+    with _flash_on_load_errors("your profile data", user_context_log, "Please contact support."):
+        logger.debug("Route: Fetching order and review history for %s.", user_context_log)
+        user_orders = get_orders_by_user(user.id)
+        logger.info("Route: Found %s orders for %s.", len(user_orders), user_context_log)
         
-        logger.debug(f"Route: Fetching review history for {user_context_log}.")
-        user_reviews_list = get_reviews_by_user_id(current_user.id) # type: ignore
-        logger.info(f"Route: Found {len(user_reviews_list)} reviews for {user_context_log}.")
-        
-    except DatabaseError as de:
-        logger.error(f"Route: Database error fetching profile data for {user_context_log}: {de.log_message}", exc_info=True)
-        flash("Could not load your profile data due to a database issue. Please try again later.", "danger")
+        user_reviews_list = get_reviews_by_user_id(user.id)
+        logger.info("Route: Found %s reviews for %s.", len(user_reviews_list), user_context_log)
 
-    except Exception as e: 
-        logger.error(f"Route: Unexpected error fetching profile data for {user_context_log}: {e}", exc_info=True)
-        flash("An unexpected error occurred while loading your profile data. Please contact support.", "danger")
-        
     return render_template('profile.html', 
                            orders=user_orders,
                            reviews=user_reviews_list 
                            )
 
 @main_bp.route('/about')
+@static_page_cache()
 def about_page():
     """Renders the About Us page."""
     logger.info("Route: About Us page requested.")
     return render_template('about.html')
 
 @main_bp.route('/faq')
+@static_page_cache()
 def faq_page():
     """Renders the FAQ page."""
     logger.info("Route: FAQ page requested.")
     return render_template('faq.html')
 
 @main_bp.route('/contact')
+@static_page_cache()
 def contact_page():
     """Renders the Contact Us page."""
     logger.info("Route: Contact Us page requested.")
     return render_template('contact.html')
 
 @main_bp.route('/privacy-policy')
+@static_page_cache()
 def privacy_policy_page():
     """Renders the Privacy Policy page."""
     logger.info("Route: Privacy Policy page requested.")
     return render_template('privacy_policy.html')
 
 @main_bp.route('/terms-of-service')
+@static_page_cache()
 def terms_of_service_page():
     """Renders the Terms of Service page."""
     logger.info("Route: Terms of Service page requested.")
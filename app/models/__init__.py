@@ -15,12 +15,8 @@ from .review import Review
 from .order import Order
 from .order_item import OrderItem
 
-# The following (Admin, Customer, Employee) are currently stubs.
-# They will be fully utilized or refined as role-specific functionalities are built out.
+# Admin, Customer and Employee (in their own modules) are stubs and are not exported.
 # For now, the User model with its 'role' attribute is the primary way to differentiate users.
-# from .admin import Admin
-# from .customer import Customer
-# from .employee import Employee
 
 # __all__ defines the public interface of this package when using 'from app.models import *'
 # It's good practice to explicitly list what is intended to be exported.
@@ -30,5 +26,4 @@ __all__ = [
     'Review',
     'Order',
     'OrderItem',
-    # 'Admin', 'Customer', 'Employee' # Commented out until they have distinct functionality
 ]
\ No newline at end of file
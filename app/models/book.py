@@ -1,12 +1,21 @@
 # app/models/book.py
 
 from app.logger import get_logger # Use the custom application logger
-from decimal import Decimal, InvalidOperation # For handling price conversion
-from app.models.db import get_db_connection # For database connection management
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP # For handling price conversion
+from app.models.db import get_db_connection, release_db_connection # For database connection management
 from app.services.exceptions import DatabaseError # Custom exception for database errors
+from typing import Optional # For type hinting
 
 logger = get_logger(__name__)
 
+# The columns a Book (or `Book.dict_from_row`) is built from; queries select only these, not `*`.
+BOOK_COLUMNS = ('book_id', 'title', 'author', 'genre', 'price', 'stock_quantity', 'image_url', 'description')
+_BOOK_COLUMNS_SQL = ", ".join(BOOK_COLUMNS) # Select list for single-table Book queries
+_BOOK_COLUMNS_SQL_B = ", ".join(f"b.{column}" for column in BOOK_COLUMNS) # Same, for queries aliasing books as `b`
+
+_DECIMAL_ZERO = Decimal('0.00') # Default price
+_DECIMAL_CENT = Decimal('0.01') # Quantum for displayed prices
+
 class Book:
     """
     Represents a book in the bookstore.
@@ -17,15 +26,27 @@ class Book:
     Attributes:
         book_id (int, optional): The unique identifier for the book.
         title (str): The title of the book. Stored in lowercase but displayed in title case.
+        title_display (str): The title in title case, kept in sync whenever `title` is set.
         author (str): The author(s) of the book.
         genre (str): The genre of the book.
         price (Decimal): The price of the book. Stored and handled as Decimal for precision.
+        price_cents (int): The price in whole cents, kept in sync whenever `price` is set.
+                           Used for integer arithmetic on cart lines and totals.
         stock_quantity (int): The current number of copies in stock.
         image_url (str): URL for the book's cover image. Defaults to a placeholder.
         description (str): A description of the book. Defaults to a generic message.
         created_at (datetime, optional): Timestamp of when the book record was created in the DB.
         updated_at (datetime, optional): Timestamp of when the book record was last updated in the DB.
     """
+    # Fixed attribute layout: no per-instance __dict__ (catalog pages and caches hold many Books).
+    # `_title`/`_price` back the `title`/`price` properties.
+    __slots__ = ('book_id', '_title', 'title_display', 'author', 'genre', '_price', 'price_cents',
+                 'stock_quantity', 'image_url', 'description')
+
+    DEFAULT_IMAGE_URL = 'https://via.placeholder.com/150x220.png?text=No+Image+Available'
+    DEFAULT_DESCRIPTION = "No description available for this book."
+    COLUMNS = BOOK_COLUMNS
+
     def __init__(self, title: str, author: str, genre: str, price, stock_quantity: int, 
                  image_url: str = None, description: str = None, book_id: int = None):
         """
@@ -53,15 +74,19 @@ class Book:
         self.genre = genre
 
         try:
-            self.price = Decimal(str(price)) if price is not None else Decimal('0.00')
+            if isinstance(price, Decimal): # psycopg2 already returns NUMERIC columns as Decimal
+                self.price = price
+
+            else:
+                self.price = Decimal(str(price)) if price is not None else _DECIMAL_ZERO
 
         except InvalidOperation:
-            logger.warning(f"Invalid price value '{price}' for book '{title}'. Defaulting to 0.00.")
-            self.price = Decimal('0.00')
+            logger.warning("Invalid price value '%s' for book '%s'. Defaulting to 0.00.", price, title)
+            self.price = _DECIMAL_ZERO
 
         self.stock_quantity = int(stock_quantity) if stock_quantity is not None else 0
-        self.image_url = image_url or 'https://via.placeholder.com/150x220.png?text=No+Image+Available'
-        self.description = description or "No description available for this book."
+        self.image_url = image_url or self.DEFAULT_IMAGE_URL
+        self.description = description or self.DEFAULT_DESCRIPTION
 
     def to_dict(self, include_timestamps: bool = False) -> dict:
         """
@@ -78,10 +103,10 @@ class Book:
         data = {
             'book_id': self.book_id,
             'id': self.book_id, # Common alias
-            'title': self.title.title() if self.title else "Untitled", # Display in Title Case
+            'title': self.title_display, # Display in Title Case
             'author': self.author,
             'genre': self.genre,
-            'price': self.price.quantize(Decimal('0.01')), # Serialize Decimal as string
+            'price': self.price.quantize(_DECIMAL_CENT), # Serialize Decimal as string
             'stock_quantity': self.stock_quantity,
             'image_url': self.image_url,
             'description': self.description
@@ -89,6 +114,27 @@ class Book:
 
         return data
 
+    @property
+    def title(self) -> str:
+        """The stored (lowercase) title of the book."""
+        return self._title
+
+    @title.setter
+    def title(self, value: str):
+        # Title-case once per assignment; messages and templates read `title_display` repeatedly.
+        self._title = value
+        self.title_display = value.title() if value else "Untitled"
+
+    @property
+    def price(self) -> Decimal:
+        """The price of the book as a Decimal."""
+        return self._price
+
+    @price.setter
+    def price(self, value: Decimal):
+        self._price = value
+        self.price_cents = int((value * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
     @classmethod
     def from_row(cls, row_dict: dict):
         """
@@ -98,7 +144,8 @@ class Book:
 
         Args:
             row_dict (dict): A dictionary representing a row from the 'books' table,
-                             typically obtained using RealDictCursor.
+                             typically obtained using RealDictCursor. Must contain every
+                             column in `COLUMNS`, as all Book queries select them.
         Returns:
             Book | None: A Book object if row_dict is valid, otherwise None.
         """
@@ -106,31 +153,67 @@ class Book:
             logger.debug("from_row received empty or None row_dict, returning None.")
             return None
         
-        # Ensure keys match __init__ parameters or handle missing keys gracefully.
+        # Positional call with direct lookups: this runs once per row in catalog-sized loops.
         # The __init__ method itself handles defaults for image_url and description.
-        return cls(
-            book_id=row_dict.get('book_id'),
-            title=row_dict.get('title'),
-            author=row_dict.get('author'),
-            genre=row_dict.get('genre'),
-            price=row_dict.get('price'), # Handled as Decimal in __init__
-            stock_quantity=row_dict.get('stock_quantity'),
-            image_url=row_dict.get('image_url'),
-            description=row_dict.get('description'),
-        )
-
-    def save(self):
+        return cls(row_dict['title'], row_dict['author'], row_dict['genre'],
+                   row_dict['price'], row_dict['stock_quantity'], # Price handled as Decimal in __init__
+                   row_dict['image_url'], row_dict['description'], row_dict['book_id'])
+
+    @classmethod
+    def dict_from_row(cls, row_dict: dict) -> dict:
+        """
+        Builds the same dictionary as `from_row(row_dict).to_dict()` without creating a Book,
+        for read-only listings that only need the dictionary form.
+
+        Args:
+            row_dict (dict): A row from the 'books' table with (at least) the `COLUMNS`.
+
+        Returns:
+            dict: A dictionary shaped like `to_dict()`'s output.
+        """
+        title = row_dict.get('title')
+        price = row_dict.get('price')
+        if price is None:
+            price = _DECIMAL_ZERO
+
+        elif not isinstance(price, Decimal): # psycopg2 already returns NUMERIC columns as Decimal
+            price = Decimal(str(price))
+
+        stock_quantity = row_dict.get('stock_quantity')
+
+        return {
+            'book_id': row_dict.get('book_id'),
+            'id': row_dict.get('book_id'), # Common alias
+            'title': str(title).title() if title else "Untitled", # Same as `title_display`; title() re-cases every letter, so no lower() first
+            'author': row_dict.get('author'),
+            'genre': row_dict.get('genre'),
+            'price': price.quantize(_DECIMAL_CENT),
+            'stock_quantity': int(stock_quantity) if stock_quantity is not None else 0,
+            'image_url': row_dict.get('image_url') or cls.DEFAULT_IMAGE_URL,
+            'description': row_dict.get('description') or cls.DEFAULT_DESCRIPTION
+        }
+
+    def save(self, expected_stock_quantity: Optional[int] = None) -> bool:
         """
         Saves a new book to the database or updates an existing book if book_id is set.
         Manages its own database connection and transaction.
 
+        Args:
+            expected_stock_quantity (Optional[int]): For updates, the stock the caller last read.
+                If given, the row is only written while its stock still has that value, so a
+                stale edit can't overwrite stock that orders have changed in the meantime.
+
+        Returns:
+            bool: True if a row was inserted or updated; False if an update matched no row
+                  (the book is gone, or its stock no longer equals `expected_stock_quantity`).
+
         Raises:
             DatabaseError: If any database operation fails.
         """
         conn = None
         action = "update" if self.book_id else "insert"
         log_identifier = f"book ID {self.book_id}" if self.book_id else f"new book '{self.title}'"
-        logger.debug(f"Attempting to {action} {log_identifier}.")
+        logger.debug("Attempting to %s %s.", action, log_identifier)
 
         try:
             conn = get_db_connection()
@@ -141,16 +224,23 @@ class Book:
                         UPDATE books
                         SET title = %s, author = %s, genre = %s, price = %s, 
                             stock_quantity = %s, image_url = %s, description = %s
-                        WHERE book_id = %s;
+                        WHERE book_id = %s
                     """
 
                     values = (self.title, self.author, self.genre, self.price,
                               self.stock_quantity, self.image_url, self.description, self.book_id)
-                    cur.execute(query, values)
+
+                    if expected_stock_quantity is not None: # Compare-and-set on the stock the caller saw
+                        query += " AND stock_quantity = %s"
+                        values += (expected_stock_quantity,)
+
+                    cur.execute(query + ";", values)
 
                     if cur.rowcount == 0:
-                        logger.warning(f"No rows updated for book ID {self.book_id}. Book may not exist.")
-                        # Consider raising an error if update affected 0 rows for existing ID
+                        logger.warning("No rows updated for book ID %s. Book may not exist or its stock changed.", self.book_id)
+                        conn.rollback()
+
+                        return False
 
                 else: # Insert new book
                     # Assuming 'created_at' and 'updated_at' are handled by DB defaults (e.g., CURRENT_TIMESTAMP)
@@ -171,19 +261,21 @@ class Book:
                         logger.error("Failed to retrieve book_id and timestamps after insert.")
                         raise DatabaseError("Book insert failed to return generated ID and timestamps.")
                 conn.commit()
-                logger.info(f"Book '{self.title}' (ID: {self.book_id}) saved successfully (action: {action}).")
+                logger.info("Book '%s' (ID: %s) saved successfully (action: %s).", self.title, self.book_id, action)
+
+                return True
 
         except Exception as e:
             if conn:
                 conn.rollback()
 
-            logger.error(f"Error saving book (ID: {self.book_id}, Title: {self.title}): {e}", exc_info=True)
+            logger.error("Error saving book (ID: %s, Title: %s): %s", self.book_id, self.title, e, exc_info=True)
 
             raise DatabaseError(f"Could not save book '{self.title}'.", original_exception=e)
         
         finally:
             if conn:
-                conn.close()
+                release_db_connection(conn)
 
     # decrease_stock method would be better in book_service.py to handle transactions
     # with other operations like order creation. If kept here, it must manage its own transaction carefully.
@@ -204,32 +296,34 @@ class Book:
             DatabaseError: If any database operation fails.
         """
         conn = None
-        logger.debug(f"Attempting to delete book with ID: {book_id}.")
+        logger.debug("Attempting to delete book with ID: %s.", book_id)
 
         try:
             conn = get_db_connection()
+            # A single statement needs no explicit transaction: in autocommit the DELETE commits
+            # itself, saving the separate COMMIT round-trip. release_db_connection resets this.
+            conn.autocommit = True
 
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM books WHERE book_id = %s;", (book_id,))
-                conn.commit()
 
-                if cur.rowcount == 0:
-                    logger.warning(f"Attempted to delete book ID {book_id}, but it was not found or not deleted.")
+                if cur.rowcount == 0: # The command status carries the count; no extra query
+                    logger.warning("Attempted to delete book ID %s, but it was not found or not deleted.", book_id)
                     return False 
                 
-                logger.info(f"Book with ID {book_id} deleted successfully.")
+                logger.info("Book with ID %s deleted successfully.", book_id)
                 return True
             
         except Exception as e:
             if conn:
                 conn.rollback()
 
-            logger.error(f"Error deleting book ID {book_id}: {e}", exc_info=True)
+            logger.error("Error deleting book ID %s: %s", book_id, e, exc_info=True)
             raise DatabaseError(f"Could not delete book with ID {book_id}.", original_exception=e)
         
         finally:
             if conn:
-                conn.close()
+                release_db_connection(conn)
 
     @staticmethod
     def get_by_id(book_id: int): # -> Book | None: (Python 3.10+)
@@ -245,8 +339,8 @@ class Book:
         Raises:
             DatabaseError: If any database operation fails.
         """
-        logger.debug(f"Fetching book by ID: {book_id}.")
-        query = "SELECT * FROM books WHERE book_id = %s;"
+        logger.debug("Fetching book by ID: %s.", book_id)
+        query = f"SELECT {_BOOK_COLUMNS_SQL} FROM books WHERE book_id = %s;"
         conn = None
 
         try:
@@ -256,20 +350,106 @@ class Book:
                 result_dict = cur.fetchone() 
             
             if result_dict:
-                logger.debug(f"Book found for ID {book_id}: '{result_dict.get('title')}'")
+                logger.debug("Book found for ID %s: '%s'", book_id, result_dict.get('title'))
                 return Book.from_row(result_dict)
             
             else:
-                logger.info(f"No book found with ID {book_id}.")
+                logger.info("No book found with ID %s.", book_id)
                 return None
             
         except Exception as e:
-            logger.error(f"Error retrieving book by ID {book_id}: {e}", exc_info=True)
+            logger.error("Error retrieving book by ID %s: %s", book_id, e, exc_info=True)
             raise DatabaseError(f"Could not retrieve book with ID {book_id}.", original_exception=e)
         
         finally:
             if conn:
-                conn.close()
+                release_db_connection(conn)
+
+    @staticmethod
+    def get_by_ids(book_ids: list) -> dict: # dict[int, Book]
+        """
+        Retrieves several books in a single query.
+
+        Args:
+            book_ids (list[int]): The IDs of the books to retrieve. Duplicates are ignored.
+
+        Returns:
+            dict[int, Book]: Found books keyed by book_id. IDs with no matching row are absent.
+
+        Raises:
+            DatabaseError: If any database operation fails.
+        """
+        unique_ids = list(set(book_ids))
+        if not unique_ids:
+            return {}
+
+        logger.debug("Fetching %d books by ID in one query.", len(unique_ids))
+        query = f"SELECT {_BOOK_COLUMNS_SQL} FROM books WHERE book_id = ANY(%s);"
+        conn = None
+
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur: # RealDictCursor is default from get_db_connection
+                cur.execute(query, (unique_ids,)) # psycopg2 adapts the list to a PostgreSQL array
+                rows = cur.fetchall()
+
+            books_by_id = {row['book_id']: Book.from_row(row) for row in rows}
+            logger.debug("Found %d of %d requested books.", len(books_by_id), len(unique_ids))
+            return books_by_id
+
+        except Exception as e:
+            logger.error("Error retrieving books by IDs %s: %s", unique_ids, e, exc_info=True)
+            raise DatabaseError("Could not retrieve the requested books.", original_exception=e)
+
+        finally:
+            if conn:
+                release_db_connection(conn)
+
+    @staticmethod
+    def resolve_cart_stock(requested_quantities: dict) -> dict: # dict[int, tuple[int, Book]]
+        """
+        Caps requested cart quantities at current stock in a single query.
+        The requested (book_id, quantity) pairs are unnested into a derived table and
+        joined to `books`, so PostgreSQL computes `LEAST(requested, stock_quantity)`.
+
+        Args:
+            requested_quantities (dict[int, int]): Requested quantity per book_id.
+
+        Returns:
+            dict[int, tuple[int, Book]]: For each existing book, the allowed quantity and the
+                                         Book itself. IDs with no matching row are absent.
+
+        Raises:
+            DatabaseError: If any database operation fails.
+        """
+        if not requested_quantities:
+            return {}
+
+        book_ids = list(requested_quantities.keys())
+        quantities = [requested_quantities[book_id] for book_id in book_ids]
+        query = f"""
+            SELECT {_BOOK_COLUMNS_SQL_B}, LEAST(req.quantity, b.stock_quantity) AS allowed_quantity
+            FROM unnest(%s::int[], %s::int[]) AS req(book_id, quantity)
+            JOIN books b ON b.book_id = req.book_id;
+        """
+        conn = None
+
+        try:
+            conn = get_db_connection()
+            with conn.cursor() as cur: # RealDictCursor is default from get_db_connection
+                cur.execute(query, (book_ids, quantities))
+                rows = cur.fetchall()
+
+            logger.debug("Resolved stock for %d of %d cart books in one query.", len(rows), len(book_ids))
+            return {row['book_id']: (row['allowed_quantity'], Book.from_row(row)) for row in rows}
+
+        except Exception as e:
+            logger.error("Error resolving cart stock for book IDs %s: %s", book_ids, e, exc_info=True)
+            raise DatabaseError("Could not check stock for the books in the cart.", original_exception=e)
+
+        finally:
+            if conn:
+                release_db_connection(conn)
 
     @staticmethod
     def get_all() -> list: # list[Book] for Python 3.9+
@@ -284,8 +464,8 @@ class Book:
         Raises:
             DatabaseError: If any database operation fails.
         """
-        logger.info("Fetching all books.")
-        query = "SELECT * FROM books ORDER BY title ASC;"
+        logger.debug("Fetching all books.") # Full-catalog path: DEBUG, not INFO
+        query = f"SELECT {_BOOK_COLUMNS_SQL} FROM books ORDER BY title ASC;"
         conn = None
         book_objects = []
 
@@ -298,15 +478,15 @@ class Book:
             for row_dict in results_as_dicts:
                 book_objects.append(Book.from_row(row_dict))
 
-            logger.info(f"Retrieved {len(book_objects)} books from database.")
+            logger.debug("Retrieved %d books from database.", len(book_objects))
             return book_objects
         
         except Exception as e:
-            logger.error(f"Error fetching all books: {e}", exc_info=True)
+            logger.error("Error fetching all books: %s", e, exc_info=True)
             # Return empty list as a fallback, service layer can decide to raise further.
             # This matches the user's specialized prompt: "return empty list on error or if no books" for service.
             raise DatabaseError("Could not retrieve all books.", original_exception=e)
         
         finally:
             if conn:
-                conn.close()
\ No newline at end of file
+                release_db_connection(conn)
\ No newline at end of file
@@ -2,31 +2,55 @@
 
 import os
 import logging
+import threading # Guards lazy pool creation across Gunicorn threads
 import psycopg2
+from contextlib import contextmanager # For the db_conn() helper
 from urllib.parse import urlparse # For parsing DATABASE_URL
+from psycopg2.pool import ThreadedConnectionPool # Reuses connections across requests
 from psycopg2.extras import RealDictCursor # For returning rows as dictionaries
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE # To detect a transaction left open on release
 # Use the app's configured logger once available, or a module-specific one.
 # For this low-level connection module, standard logging before app logger is set is fine.
 
 logger = logging.getLogger(__name__) # Standard logger for this module
 
-def get_db_connection():
+# Used when no app context is available or DB_POOL_MIN / DB_POOL_MAX are not configured.
+DEFAULT_DB_POOL_MIN = 1
+DEFAULT_DB_POOL_MAX = 10
+
+_pool_lock = threading.Lock()
+_pool = None # ThreadedConnectionPool, created on first use in each process
+_pool_pid = None # PID that created _pool; a forked worker must not reuse its parent's sockets
+
+# Attributes on flask.g: the connection parked for reuse within the current app context, and
+# a flag set once it has been returned to the pool at teardown.
+_PARKED_CONNECTION_ATTR = 'db_parked_connection'
+_PARKING_CLOSED_ATTR = 'db_parking_closed'
+
+def _get_pool_size() -> tuple:
+    """
+    Returns the configured (min, max) pool size, read from the Flask config when available.
     """
-    Establishes and returns a new database connection using credentials 
-    from the DATABASE_URL environment variable.
-    
-    This function configures the connection to use `RealDictCursor` by default,
-    so database rows are returned as dictionary-like objects (RealDictRow) 
-    instead of tuples. This allows accessing columns by their names.
+    try:
+        from flask import current_app, has_app_context # Local import: this module must load without an app
 
-    Returns:
-        psycopg2.connection: A new PostgreSQL database connection object.
-                             The caller is responsible for closing this connection.
+        if has_app_context():
+            return (int(current_app.config.get('DB_POOL_MIN', DEFAULT_DB_POOL_MIN)),
+                    int(current_app.config.get('DB_POOL_MAX', DEFAULT_DB_POOL_MAX)))
+
+    except ImportError:
+        pass
+
+    return (int(os.environ.get('DB_POOL_MIN', DEFAULT_DB_POOL_MIN)),
+            int(os.environ.get('DB_POOL_MAX', DEFAULT_DB_POOL_MAX)))
+
+def _create_pool() -> ThreadedConnectionPool:
+    """
+    Parses DATABASE_URL once and creates the connection pool.
 
     Raises:
         ValueError: If the DATABASE_URL environment variable is not set or is invalid.
-        psycopg2.Error: For underlying database connection errors (e.g., bad credentials,
-                        server not reachable).
+        psycopg2.Error: For underlying database connection errors.
     """
     db_url = os.environ.get("DATABASE_URL")
 
@@ -44,18 +68,182 @@ def get_db_connection():
             'host': result.hostname,
             'port': result.port or 5432 # Default PostgreSQL port if not specified
         }
-        
-        # Establish the connection, setting RealDictCursor as the default for cursors from this connection.
-        conn = psycopg2.connect(**conn_params, cursor_factory=RealDictCursor)
-        logger.debug(f"Database connection successfully established to host: {conn_params['host']}, database: {conn_params['dbname']}")
-        return conn
-    
+        min_connections, max_connections = _get_pool_size()
+
+        # Every pooled connection uses RealDictCursor as the default for its cursors.
+        pool = ThreadedConnectionPool(min_connections, max_connections, **conn_params, cursor_factory=RealDictCursor)
+        logger.info(f"Database connection pool ({min_connections}-{max_connections}) created for host: {conn_params['host']}, database: {conn_params['dbname']}")
+        return pool
+
     except psycopg2.Error as e: # Catch specific psycopg2 operational or programming errors
         logger.error(f"PostgreSQL database connection error: {e}", exc_info=True)
-        # Re-raise the specific psycopg2 error to allow for more granular error handling by the caller,
-        # or wrap it in a custom DatabaseError if preferred for abstraction.
-        raise 
-    
+        raise
+
     except Exception as e: # Catch other potential errors (e.g., from urlparse if URL is malformed)
         logger.error(f"Failed to parse DATABASE_URL or establish connection: {e}", exc_info=True)
-        raise ValueError(f"Invalid DATABASE_URL or other connection failure: {e}")
\ No newline at end of file
+        raise ValueError(f"Invalid DATABASE_URL or other connection failure: {e}")
+
+def _get_pool() -> ThreadedConnectionPool:
+    """
+    Returns this process's connection pool, creating it on first use.
+    """
+    global _pool, _pool_pid
+
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = _create_pool()
+            _pool_pid = os.getpid()
+
+    return _pool
+
+def _get_app_g():
+    """
+    Returns `flask.g` when an app context is active, otherwise None (e.g. plain scripts).
+    """
+    from flask import g, has_app_context # Local import: this module must load without an app
+
+    return g if has_app_context() else None
+
+def get_db_connection():
+    """
+    Returns a database connection from the process-wide connection pool.
+    The pool is created from the DATABASE_URL environment variable on first use, so
+    the TCP/authentication handshake is paid once per pooled connection rather than
+    once per query. Within an app context (a request), a connection released earlier
+    in the same context is reused instead of going back through the pool.
+
+    Connections use `RealDictCursor` by default, so database rows are returned as
+    dictionary-like objects (RealDictRow) instead of tuples. This allows accessing
+    columns by their names.
+
+    Returns:
+        psycopg2.connection: A PostgreSQL database connection object.
+                             The caller must hand it back with `release_db_connection`
+                             (or use `db_conn()`), never `conn.close()`.
+
+    Raises:
+        ValueError: If the DATABASE_URL environment variable is not set or is invalid.
+        psycopg2.Error: For underlying database connection errors (e.g., bad credentials,
+                        server not reachable).
+        psycopg2.pool.PoolError: If all DB_POOL_MAX connections are in use.
+    """
+    app_g = _get_app_g()
+
+    if app_g is not None:
+        conn = app_g.pop(_PARKED_CONNECTION_ATTR, None)
+
+        if conn is not None:
+            if not conn.closed:
+                logger.debug("Reusing the database connection parked in this app context.")
+                return conn
+
+            _get_pool().putconn(conn, close=True) # Broken while parked; let the pool discard it
+
+    try:
+        conn = _get_pool().getconn()
+        logger.debug("Database connection checked out of the pool.")
+        return conn
+
+    except psycopg2.Error as e:
+        logger.error(f"Could not get a database connection from the pool: {e}", exc_info=True)
+        raise
+
+def release_db_connection(conn) -> None:
+    """
+    Returns a connection obtained from `get_db_connection` to the pool.
+    Any open transaction is rolled back, and autocommit is reset to the
+    psycopg2 default so the next borrower starts from a clean connection. Broken
+    (closed) connections are discarded.
+
+    Within an app context, the first released connection is parked on `flask.g`
+    instead, so the request's next `get_db_connection` skips the pool; it goes back
+    to the pool at app context teardown (see `init_app`). Connections checked out
+    while another one is in use (nested calls) still come from and return to the pool.
+
+    Args:
+        conn (psycopg2.connection): The connection to return. `None` is ignored.
+    """
+    if conn is None:
+        return
+
+    try:
+        if not conn.closed and conn.autocommit: # Only legal outside a transaction, which autocommit implies
+            conn.autocommit = False
+
+    except psycopg2.Error as e:
+        logger.debug(f"Could not reset autocommit before returning connection to the pool: {e}")
+
+    app_g = _get_app_g()
+
+    if (app_g is not None and not conn.closed and _PARKED_CONNECTION_ATTR not in app_g
+            and not app_g.get(_PARKING_CLOSED_ATTR)):
+        try:
+            if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback() # Same clean state putconn would leave
+
+            setattr(app_g, _PARKED_CONNECTION_ATTR, conn)
+            return
+
+        except psycopg2.Error as e:
+            logger.debug(f"Could not park connection for reuse, returning it to the pool: {e}")
+
+    try:
+        _get_pool().putconn(conn)
+
+    except Exception as e:
+        logger.error(f"Failed to return database connection to the pool: {e}", exc_info=True)
+
+        if not conn.closed:
+            conn.close()
+
+@contextmanager
+def db_conn():
+    """
+    Context manager around `get_db_connection` / `release_db_connection`.
+    The connection is always returned to the pool on exit, including on exceptions.
+
+    Yields:
+        psycopg2.connection: A pooled PostgreSQL database connection.
+    """
+    conn = get_db_connection()
+
+    try:
+        yield conn
+
+    finally:
+        release_db_connection(conn)
+
+def _return_parked_connection(exception=None) -> None:
+    """
+    App context teardown handler: hands the connection parked by `release_db_connection`
+    back to the pool. Releases after this point go straight to the pool.
+    """
+    app_g = _get_app_g()
+
+    if app_g is None:
+        return
+
+    setattr(app_g, _PARKING_CLOSED_ATTR, True)
+    conn = app_g.pop(_PARKED_CONNECTION_ATTR, None)
+
+    if conn is None:
+        return
+
+    try:
+        _get_pool().putconn(conn, close=conn.closed)
+
+    except Exception as e:
+        logger.error(f"Failed to return parked database connection to the pool: {e}", exc_info=True)
+
+def init_app(app) -> None:
+    """
+    Registers the teardown handler that returns each app context's parked connection
+    to the pool. Call once from the application factory.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    app.teardown_appcontext(_return_parked_connection)
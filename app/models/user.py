@@ -1,14 +1,38 @@
 # app/models/user.py
 
+import time                                         # Timestamps the session snapshot
 from datetime import datetime                       # For type hinting
+from functools import cached_property               # Per-instance (per-request) memoization
 from app.logger import get_logger                   # Use the app's configured logger
 from flask_login import UserMixin                   # Provides default implementations for Flask-Login User methods
+from flask import session, has_request_context, current_app # For the per-login user snapshot
 from typing import Dict, Any, Optional
-from app.models.db import get_db_connection
+from app.models.db import get_db_connection, release_db_connection
 
 # Use the app's configured logger
 logger = get_logger(__name__)
 
+# Session key holding the lightweight user snapshot written at login (see User.to_session_snapshot).
+SESSION_USER_SNAPSHOT_KEY = '_user_snapshot'
+# Used when USER_SNAPSHOT_TTL_SECONDS is not configured. After this long the snapshot is rebuilt from
+# the users table, so a disabled account or revoked role takes effect within this window.
+DEFAULT_USER_SNAPSHOT_TTL_SECONDS = 60
+
+# Attributes NOT kept in the session snapshot. They are loaded from the database on first access
+# for users rebuilt from the snapshot (e.g., the profile page's address block).
+_LAZY_PROFILE_FIELDS = frozenset({
+    'password_hash', 'phone_number', 'created_at',
+    'address_line1', 'address_line2', 'city', 'state', 'zip_code'
+})
+
+_USER_SELECT_BY_ID_QUERY = """
+    SELECT user_id, email, phone_number, password, created_at,
+           first_name, last_name, address_line1, address_line2,
+           city, state, zip_code, role, is_active
+    FROM users
+    WHERE user_id = %s
+"""
+
 class User(UserMixin):
     """
     Represents a user in the bookstore system.
@@ -109,11 +133,124 @@ class User(UserMixin):
     def is_customer(self) -> bool:
         """Checks if the user has the 'customer' role."""
         return self.role == 'customer'
+
+    @cached_property
+    def shipping_details(self) -> Dict[str, str]:
+        """
+        The user's saved address, keyed like the checkout form's shipping fields
+        ('shipping_address_line1', ...), with missing values as empty strings.
+        Computed once per User instance; `load_user` builds a fresh instance per request.
+        """
+        return {
+            "shipping_address_line1": getattr(self, 'address_line1', '') or "",
+            "shipping_address_line2": getattr(self, 'address_line2', '') or "",
+            "shipping_city": getattr(self, 'city', '') or "",
+            "shipping_state": getattr(self, 'state', '') or "",
+            "shipping_zip_code": getattr(self, 'zip_code', '') or ""
+        }
     
     def __repr__(self) -> str:
         """String representation of the User object, useful for debugging."""
         return f"<User id={self.id} email='{self.email}' role='{self.role}'>"
 
+    def __getattr__(self, name: str):
+        """
+        Called only when normal attribute lookup fails. For users rebuilt from the session
+        snapshot, the profile fields listed in `_LAZY_PROFILE_FIELDS` are not set; the first
+        access to any of them loads the full row from the database once.
+
+        Raises:
+            AttributeError: If the attribute is not a lazily-loaded profile field, or the
+                            user's row could not be loaded.
+        """
+        if name not in _LAZY_PROFILE_FIELDS or self.__dict__.get('_profile_loaded', True):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        self._profile_loaded = True # Set first so a failed load does not retry on every access
+        row_dict = _fetch_user_row(self.user_id)
+
+        if not row_dict:
+            raise AttributeError(f"Profile data for user {self.user_id} could not be loaded (attribute '{name}').")
+
+        full_user = User.from_db_row(row_dict)
+        for field_name in _LAZY_PROFILE_FIELDS:
+            setattr(self, field_name, getattr(full_user, field_name))
+
+        logger.debug(f"Lazily loaded profile fields for user {self.user_id} (triggered by '{name}').")
+        return getattr(self, name)
+
+    def to_session_snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the small set of attributes stored in the signed session at login so that
+        `load_user` can rebuild `current_user` without querying the database on every request.
+        Only non-sensitive fields needed by role checks, the navbar and logging are included.
+        `snapshot_at` lets `load_user` re-read the row once the snapshot is older than
+        USER_SNAPSHOT_TTL_SECONDS.
+
+        Returns:
+            Dict[str, Any]: JSON-serializable snapshot of the user.
+        """
+        return {
+            'user_id': self.user_id,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'role': self.role,
+            'is_active': self.is_active,
+            'snapshot_at': int(time.time())
+        }
+
+    def refresh_authorization(self) -> bool:
+        """
+        Re-reads `role` and `is_active` from the users table, for checks that must not trust
+        a session snapshot (e.g. admin-only routes). The session snapshot is refreshed too.
+        Fails closed: if the row is missing or cannot be read, the user is marked inactive.
+
+        Returns:
+            bool: True if the row was read and the user is still active, False otherwise.
+        """
+        try:
+            row_dict = _fetch_user_row(self.user_id)
+
+        except Exception as e:
+            logger.error(f"Could not re-check authorization for user {self.user_id}: {e}", exc_info=True)
+            row_dict = None
+
+        if not row_dict:
+            self._is_active = False
+            return False
+
+        self.role = str(row_dict['role']).lower() if row_dict.get('role') else 'customer'
+        self._is_active = bool(row_dict.get('is_active', True))
+
+        if has_request_context():
+            session[SESSION_USER_SNAPSHOT_KEY] = self.to_session_snapshot()
+
+        return self._is_active
+
+    @classmethod
+    def from_session_snapshot(cls, snapshot: Dict[str, Any]):
+        """
+        Rebuilds a User from a snapshot created by `to_session_snapshot`, without a database
+        round-trip. Fields outside the snapshot are loaded lazily (see `__getattr__`).
+
+        Args:
+            snapshot (Dict[str, Any]): The snapshot dictionary read from the session.
+
+        Returns:
+            User: A User whose profile fields will be fetched on first access.
+        """
+        user = cls.__new__(cls) # Bypass __init__; the snapshot values were normalized at login
+        user.id = int(snapshot['user_id'])
+        user.user_id = user.id
+        user.email = snapshot.get('email') or ""
+        user.first_name = snapshot.get('first_name')
+        user.last_name = snapshot.get('last_name')
+        user.role = snapshot.get('role') or 'customer'
+        user._is_active = bool(snapshot.get('is_active', True))
+        user._profile_loaded = False
+        return user
+
     @classmethod
     def from_db_row(cls, row_dict: dict):
         """
@@ -188,11 +325,59 @@ class User(UserMixin):
         logger.debug(f"User.to_dict() called for user ID {self.id}. Safe data: {log_data_safe}")
         return data
 
+def _fetch_user_row(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Fetches a single row from the 'users' table by ID.
+
+    Args:
+        user_id (int): The ID of the user to fetch.
+
+    Returns:
+        Optional[Dict[str, Any]]: The row as a dict-like RealDictRow, or None if not found.
+
+    Raises:
+        psycopg2.Error: For underlying database errors (callers decide how to handle them).
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        # RealDictCursor is the default for cursors from get_db_connection
+        with conn.cursor() as cur:
+            cur.execute(_USER_SELECT_BY_ID_QUERY, (user_id,))
+            return cur.fetchone() # Returns a RealDictRow (dict-like) or None
+    finally:
+        if conn:
+            release_db_connection(conn)
+
+def _get_snapshot_ttl_seconds() -> float:
+    """
+    Returns the configured USER_SNAPSHOT_TTL_SECONDS. A value of 0 (or less) disables the snapshot.
+    """
+    return float(current_app.config.get('USER_SNAPSHOT_TTL_SECONDS', DEFAULT_USER_SNAPSHOT_TTL_SECONDS))
+
+def _is_snapshot_fresh(snapshot: Dict[str, Any]) -> bool:
+    """
+    Returns True while the session snapshot is younger than USER_SNAPSHOT_TTL_SECONDS.
+    Snapshots without a timestamp (written before it existed) are treated as stale.
+    """
+    ttl_seconds = _get_snapshot_ttl_seconds()
+    snapshot_at = snapshot.get('snapshot_at')
+
+    if ttl_seconds <= 0 or not isinstance(snapshot_at, (int, float)):
+        return False
+
+    return 0 <= time.time() - snapshot_at < ttl_seconds
+
 def load_user(user_id_str: str): # Renamed in app/__init__ to _flask_login_user_loader for clarity
     """
-    Loads a user from the database by user_id.
+    Loads a user by user_id, preferring the snapshot stored in the session at login.
     This function is typically registered with Flask-Login's `user_loader` decorator.
 
+    When the session holds a snapshot for the same user ID that is younger than
+    USER_SNAPSHOT_TTL_SECONDS, the User is rebuilt from it without touching the database;
+    otherwise the full row is fetched (so role and is_active changes apply within the TTL)
+    and the snapshot is re-stamped.
+
     Args:
         user_id_str (str): The ID of the user to load (as a string from the session).
     
@@ -205,30 +390,29 @@ def load_user(user_id_str: str): # Renamed in app/__init__ to _flask_login_user_
     if not user_id_str:
         return None
     
-    conn = None
     try:
         user_id_int = int(user_id_str) # User IDs are integers in the database
     except ValueError:
         logger.warning(f"load_user called with non-integer user_id_str: '{user_id_str}'")
         return None
 
+    if has_request_context():
+        snapshot = session.get(SESSION_USER_SNAPSHOT_KEY)
+
+        if snapshot and snapshot.get('user_id') == user_id_int and _is_snapshot_fresh(snapshot):
+            return User.from_session_snapshot(snapshot)
+
     try:
-        conn = get_db_connection()
-        # RealDictCursor is the default for cursors from get_db_connection
-        with conn.cursor() as cur:
-            # Select all fields needed by User.from_db_row
-            cur.execute("""
-                SELECT user_id, email, phone_number, password, created_at,
-                       first_name, last_name, address_line1, address_line2,
-                       city, state, zip_code, role, is_active
-                FROM users
-                WHERE user_id = %s
-            """, (user_id_int,))
-            user_data_dict = cur.fetchone() # Returns a RealDictRow (dict-like) or None
+        user_data_dict = _fetch_user_row(user_id_int)
         
         if user_data_dict:
             logger.debug(f"Data for user_id {user_id_int} found in DB: {dict(user_data_dict)}") # Log as dict
-            return User.from_db_row(user_data_dict)
+            user = User.from_db_row(user_data_dict)
+
+            if has_request_context() and _get_snapshot_ttl_seconds() > 0: # Re-stamp so the next requests can skip the query
+                session[SESSION_USER_SNAPSHOT_KEY] = user.to_session_snapshot()
+
+            return user
         else:
             logger.info(f"No user found in DB with user_id: {user_id_int}")
             return None
@@ -241,7 +425,4 @@ def load_user(user_id_str: str): # Renamed in app/__init__ to _flask_login_user_
         # which might not be what Flask-Login expects for user loading failures.
         # However, if you want to signal a critical DB issue, raising is an option.
         # For now, adhering to Flask-Login's expectation of None on failure.
-        return None 
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+        return None
\ No newline at end of file
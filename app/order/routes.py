@@ -18,10 +18,12 @@ def _get_user_or_guest_context_for_log_order() -> str:
     Returns:
         str: A string identifying the user, e.g., "user 123 (user@example.com)" or "guest user".
     """
-    if current_user.is_authenticated:
+    user = current_user._get_current_object() # Resolve the LocalProxy once
+
+    if user.is_authenticated:
         # Safely access attributes that might not exist on all user-like objects
-        user_id_log = getattr(current_user, 'id', 'UNKNOWN_ID')
-        user_email_log = getattr(current_user, 'email', 'UNKNOWN_EMAIL')
+        user_id_log = getattr(user, 'id', 'UNKNOWN_ID')
+        user_email_log = getattr(user, 'email', 'UNKNOWN_EMAIL')
 
         return f"user {user_id_log} ({user_email_log})"
     
@@ -76,8 +78,7 @@ def order_confirmation_route(order_id: int):
                 
                 # Critical: Clear session flags after successful retrieval for one-time access.
                 session.pop('just_placed_order_id', None)
-                session.pop('guest_order_email', None)
-                session.modified = True
+                session.pop('guest_order_email', None) # pop() marks the session modified
                 logger.info(f"Guest order {order_id} confirmation successfully displayed and session flags cleared.")
 
             else:
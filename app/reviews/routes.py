@@ -44,9 +44,11 @@ def api_get_reviews_for_book_route(book_id: int):
     user_id_for_ownership_check: int | None = None
     log_user_context = "guest user"
 
-    if current_user.is_authenticated:
-        user_id_for_ownership_check = getattr(current_user, 'id', None)
-        user_email_log = getattr(current_user, 'email', 'N/A')
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+
+    if user.is_authenticated:
+        user_id_for_ownership_check = getattr(user, 'id', None)
+        user_email_log = getattr(user, 'email', 'N/A')
         log_user_context = f"user {user_id_for_ownership_check} ({user_email_log})"
         
     logger.info(f"API: Request for reviews for book_id: {book_id} by {log_user_context}.")
@@ -82,8 +84,9 @@ def api_submit_or_update_review_route():
         JSON: A JSON response indicating success or failure, with a message.
     """
     # current_user is guaranteed to be authenticated due to @login_required
-    user_id_log = getattr(current_user, 'id', 'UNKNOWN_ID')
-    user_email_log = getattr(current_user, 'email', 'UNKNOWN_EMAIL')
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+    user_id_log = getattr(user, 'id', 'UNKNOWN_ID')
+    user_email_log = getattr(user, 'email', 'UNKNOWN_EMAIL')
     log_user_context = f"user {user_id_log} ({user_email_log})"
 
     book_id_str = request.form.get('book_id')
@@ -121,17 +124,17 @@ def api_submit_or_update_review_route():
         logger.debug(f"API Review Submit/Update by {log_user_context}: Sanitized comment length: {len(sanitized_comment if sanitized_comment else '')}")
 
         # Service layer handles checking for existing review and decides to add or update
-        existing_review = get_user_review_for_book(book_id_int, current_user.id)
+        existing_review = get_user_review_for_book(book_id_int, user.id)
 
         if existing_review and existing_review.get('review_id') is not None:
             review_id_to_update = existing_review['review_id']
             logger.info(f"API: {log_user_context} attempting to update existing review_id: {review_id_to_update} for book_id: {book_id_int}")
-            update_review(review_id_to_update, rating_int, sanitized_comment, current_user.id)
+            update_review(review_id_to_update, rating_int, sanitized_comment, user.id)
             message = "Your review has been updated successfully."
             
         else:
             logger.info(f"API: {log_user_context} attempting to add new review for book_id: {book_id_int}")
-            add_review(book_id_int, current_user.id, rating_int, sanitized_comment)
+            add_review(book_id_int, user.id, rating_int, sanitized_comment)
             message = "Your review has been added successfully."
         
         return jsonify({"success": True, "message": message}), 200
@@ -164,14 +167,15 @@ def api_delete_review_route(review_id: int):
         JSON: A JSON response indicating success or failure, with a message.
     """
     # current_user is guaranteed to be authenticated due to @login_required
-    user_id_log = getattr(current_user, 'id', 'UNKNOWN_ID')
-    user_email_log = getattr(current_user, 'email', 'UNKNOWN_EMAIL')
+    user = current_user._get_current_object() # Resolve the LocalProxy once for this handler
+    user_id_log = getattr(user, 'id', 'UNKNOWN_ID')
+    user_email_log = getattr(user, 'email', 'UNKNOWN_EMAIL')
     log_user_context = f"user {user_id_log} ({user_email_log})"
     logger.info(f"API: Request from {log_user_context} to delete review_id: {review_id}")
 
     try:
         # delete_review_if_owner service function handles ownership check and deletion
-        delete_review_if_owner(review_id, current_user.id) 
+        delete_review_if_owner(review_id, user.id) 
         logger.info(f"API: Review {review_id} successfully deleted by {log_user_context}.")
 
         return jsonify({"success": True, "message": "Review deleted successfully."}), 200
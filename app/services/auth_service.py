@@ -1,15 +1,65 @@
 # app/services/auth_service.py
 
+from functools import lru_cache                                         # For caching the current hash method
 from typing import Optional                                             # For type hinting
 from app.models.user import User                                        # User model for creating User objects
 from app.logger import get_logger                                       # Custom application logger
-from app.models.db import get_db_connection                             # For database connections
-from werkzeug.security import check_password_hash                       # For verifying passwords
+from app.models.db import get_db_connection, release_db_connection      # For database connections
+from werkzeug.security import check_password_hash, generate_password_hash  # For verifying/upgrading passwords
 from app.services.exceptions import AuthenticationError, DatabaseError  # Custom exceptions
 
 # Logger instance for this module, configured by app/logger.py
 logger = get_logger(__name__) 
 
+@lru_cache(maxsize=1)
+def _current_password_hash_method() -> str:
+    """
+    Returns the method prefix (e.g., 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000') that
+    `generate_password_hash` currently produces with the installed Werkzeug defaults.
+    Computed once per process, since it requires hashing a throwaway value.
+
+    Returns:
+        str: The method/parameters segment of a freshly generated Werkzeug hash.
+    """
+    return generate_password_hash("method-probe").split("$", 1)[0]
+
+def _password_hash_needs_upgrade(stored_hash: str) -> bool:
+    """
+    Checks whether a stored password hash was generated with weaker or older parameters
+    than the current Werkzeug default (e.g., a lower PBKDF2 iteration count).
+
+    Args:
+        stored_hash (str): The hash string stored in the 'users.password' column.
+
+    Returns:
+        bool: True if the hash should be regenerated with the current parameters.
+    """
+    if not stored_hash or "$" not in stored_hash:
+        return False # Unknown format; leave it untouched
+    return stored_hash.split("$", 1)[0] != _current_password_hash_method()
+
+def _upgrade_password_hash(conn, user_id: int, password_input: str) -> None:
+    """
+    Re-hashes a user's password with the current Werkzeug parameters and stores it.
+    Called right after a successful password check, which is the only time the plain-text
+    password is available. Failures are logged and never block the login itself.
+
+    Args:
+        conn (psycopg2.connection): The open connection used for authentication.
+        user_id (int): The ID of the user whose hash is being upgraded.
+        password_input (str): The plain-text password that was just verified.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE users SET password = %s WHERE user_id = %s;",
+                        (generate_password_hash(password_input), user_id))
+        conn.commit()
+        logger.info(f"Service: Upgraded password hash parameters for user ID {user_id}.")
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Service: Could not upgrade password hash for user ID {user_id}: {e}", exc_info=True)
+
 def authenticate_user(email: str, password_input: str) -> Optional[User]:
     """
     Authenticates a user based on their provided email and password.
@@ -66,6 +116,10 @@ def authenticate_user(email: str, password_input: str) -> Optional[User]:
                 
                 logger.info(f"Service: User '{email}' authenticated successfully. Role: {user_data_dict.get('role')}, Active: True")
 
+                # Transparently migrate hashes created with older/weaker parameters.
+                if _password_hash_needs_upgrade(user_data_dict["password"]):
+                    _upgrade_password_hash(conn, user_data_dict["user_id"], password_input)
+
                 # Create and return a User object using data from the database.
                 return User.from_db_row(user_data_dict)
             
@@ -95,7 +149,7 @@ def authenticate_user(email: str, password_input: str) -> Optional[User]:
     
     finally:
         if conn:
-            conn.close() 
+            release_db_connection(conn) 
             logger.debug(f"Service: Database connection closed after authentication attempt for email '{email}'.")
 
 # Note: The `sanitize_form_input` function, previously associated with auth/reg services,
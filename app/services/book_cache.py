@@ -0,0 +1,284 @@
+# app/services/book_cache.py
+
+import copy                                                                  # Hand out copies, never shared instances
+import time                                                                  # Monotonic clock for TTL checks
+import threading                                                             # Gunicorn runs multiple threads per worker
+from flask import current_app, has_app_context                               # For reading the configured TTL
+from app.models.book import Book                                             # Book model class
+from app.logger import get_logger                                            # Custom application logger
+from typing import Any, Dict, Iterable, List, Optional, Tuple                # For type hinting
+
+logger = get_logger(__name__) # Logger instance for this module
+
+# Used when no app context is available or BOOK_CACHE_TTL_SECONDS is not configured.
+DEFAULT_BOOK_CACHE_TTL_SECONDS = 30
+# Used when no app context is available or CATALOG_CACHE_TTL_SECONDS is not configured.
+DEFAULT_CATALOG_CACHE_TTL_SECONDS = 60
+# Upper bound on cached catalog pages; every search term is its own key.
+CATALOG_CACHE_MAX_ENTRIES = 256
+# Used when no app context is available or GENRE_CACHE_TTL_SECONDS is not configured.
+DEFAULT_GENRE_CACHE_TTL_SECONDS = 300
+
+_cache_lock = threading.Lock()
+_cached_books: Dict[int, Tuple[float, Book]] = {} # book_id -> (expires_at, Book)
+_cached_catalog_pages: Dict[tuple, Tuple[float, Dict[str, Any]]] = {} # listing params -> (expires_at, page of book dicts)
+_cached_genres: Optional[Tuple[float, List[str]]] = None # (expires_at, genres)
+_cached_rendered_pages: Dict[tuple, Tuple[float, str]] = {} # (endpoint, query string) -> (expires_at, html)
+
+def _get_ttl_seconds(config_key: str = 'BOOK_CACHE_TTL_SECONDS', default: int = DEFAULT_BOOK_CACHE_TTL_SECONDS) -> float:
+    """
+    Returns the configured time-to-live for a cache.
+    A value of 0 (or less) disables that cache entirely.
+    """
+    if has_app_context():
+        return float(current_app.config.get(config_key, default))
+
+    return float(default)
+
+def _make_room_for(cache: Dict[tuple, Tuple[float, Any]], key: tuple, now: float) -> None:
+    """
+    Keeps a keyed page cache under `CATALOG_CACHE_MAX_ENTRIES` before `key` is inserted:
+    expired entries are dropped first, then the oldest entry. Call with `_cache_lock` held.
+    """
+    if key in cache or len(cache) < CATALOG_CACHE_MAX_ENTRIES:
+        return
+
+    for expired_key in [cached_key for cached_key, (expires_at, _) in cache.items() if expires_at <= now]:
+        del cache[expired_key]
+
+    if len(cache) >= CATALOG_CACHE_MAX_ENTRIES:
+        del cache[next(iter(cache))] # Oldest insertion
+
+def get_cached_books(book_ids: Iterable[int]) -> Dict[int, Book]:
+    """
+    Returns the non-expired cached books among `book_ids`.
+    Each returned Book is a shallow copy, so callers may modify it freely.
+
+    Args:
+        book_ids (Iterable[int]): The IDs to look up.
+
+    Returns:
+        Dict[int, Book]: Cache hits keyed by book_id. Misses and expired entries are absent.
+    """
+    if _get_ttl_seconds() <= 0:
+        return {}
+
+    now = time.monotonic()
+    hits: Dict[int, Book] = {}
+
+    with _cache_lock:
+        for book_id in book_ids:
+            entry = _cached_books.get(book_id)
+
+            if entry is None:
+                continue
+
+            expires_at, book = entry
+
+            if expires_at <= now:
+                del _cached_books[book_id]
+                continue
+
+            hits[book_id] = copy.copy(book)
+
+    return hits
+
+def cache_books(books: Iterable[Book]) -> None:
+    """
+    Stores freshly loaded books in the cache with the configured TTL.
+
+    Args:
+        books (Iterable[Book]): Books just read from the database.
+    """
+    ttl_seconds = _get_ttl_seconds()
+
+    if ttl_seconds <= 0:
+        return
+
+    expires_at = time.monotonic() + ttl_seconds
+
+    with _cache_lock:
+        for book in books:
+            if book is not None and book.book_id is not None:
+                _cached_books[book.book_id] = (expires_at, copy.copy(book))
+
+def invalidate_cached_books(book_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Drops cached entries after a write (stock change, edit, delete).
+    Passing `None` clears the whole cache. Cached catalog pages (and their rendered HTML)
+    are always cleared.
+
+    Note: the cache is per process; other Gunicorn workers only see the change
+    once their own entries expire (bounded by the TTL).
+
+    Args:
+        book_ids (Optional[Iterable[int]]): The IDs to drop, or None for all.
+    """
+    with _cache_lock:
+        _cached_catalog_pages.clear() # Any changed book may appear on any listing page
+        _cached_rendered_pages.clear()
+
+        if book_ids is None:
+            _cached_books.clear()
+            logger.debug("Book cache cleared.")
+            return
+
+        for book_id in book_ids:
+            _cached_books.pop(book_id, None)
+
+def get_cached_catalog_page(page_key: tuple) -> Optional[Dict[str, Any]]:
+    """
+    Returns a cached catalog page (book rows as `Book.to_dict()` dicts), if present and not expired.
+    The returned dict and its rows are copies, so callers may modify them freely.
+
+    Args:
+        page_key (tuple): The listing parameters the page was cached under.
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached page, or None on a miss.
+    """
+    if _get_ttl_seconds('CATALOG_CACHE_TTL_SECONDS', DEFAULT_CATALOG_CACHE_TTL_SECONDS) <= 0:
+        return None
+
+    with _cache_lock:
+        entry = _cached_catalog_pages.get(page_key)
+
+        if entry is None:
+            return None
+
+        expires_at, page = entry
+
+        if expires_at <= time.monotonic():
+            del _cached_catalog_pages[page_key]
+            return None
+
+    return dict(page, books=[copy.copy(book) for book in page.get('books', [])])
+
+def cache_catalog_page(page_key: tuple, page: Dict[str, Any]) -> None:
+    """
+    Stores a freshly queried catalog page (book rows as `Book.to_dict()` dicts) with the configured TTL.
+    When the cache is full, expired pages are dropped first, then the oldest page.
+
+    Args:
+        page_key (tuple): The listing parameters the page was queried with.
+        page (Dict[str, Any]): The page just read from the database.
+    """
+    ttl_seconds = _get_ttl_seconds('CATALOG_CACHE_TTL_SECONDS', DEFAULT_CATALOG_CACHE_TTL_SECONDS)
+
+    if ttl_seconds <= 0:
+        return
+
+    now = time.monotonic()
+    stored_page = dict(page, books=[copy.copy(book) for book in page.get('books', [])])
+
+    with _cache_lock:
+        _make_room_for(_cached_catalog_pages, page_key, now)
+        _cached_catalog_pages[page_key] = (now + ttl_seconds, stored_page)
+
+def invalidate_cached_catalog_pages() -> None:
+    """
+    Drops every cached catalog page and rendered page, e.g. after a new book is added.
+    `invalidate_cached_books` already does this for edits, deletes and stock changes.
+    """
+    with _cache_lock:
+        _cached_catalog_pages.clear()
+        _cached_rendered_pages.clear()
+
+def get_cached_rendered_page(page_key: tuple) -> Optional[str]:
+    """
+    Returns the cached HTML of a catalog page rendered for anonymous visitors, if present
+    and not expired. Uses the catalog page TTL, and is cleared along with the catalog pages.
+
+    Args:
+        page_key (tuple): The endpoint and query string the page was rendered for.
+
+    Returns:
+        Optional[str]: The cached HTML, or None on a miss.
+    """
+    if _get_ttl_seconds('CATALOG_CACHE_TTL_SECONDS', DEFAULT_CATALOG_CACHE_TTL_SECONDS) <= 0:
+        return None
+
+    with _cache_lock:
+        entry = _cached_rendered_pages.get(page_key)
+
+        if entry is None:
+            return None
+
+        expires_at, html = entry
+
+        if expires_at <= time.monotonic():
+            del _cached_rendered_pages[page_key]
+            return None
+
+    return html
+
+def cache_rendered_page(page_key: tuple, html: str) -> None:
+    """
+    Stores the HTML of a catalog page rendered for anonymous visitors with the catalog page TTL.
+    Only cache output that is identical for every such visitor (no session state, no flashes).
+
+    Args:
+        page_key (tuple): The endpoint and query string the page was rendered for.
+        html (str): The rendered page.
+    """
+    ttl_seconds = _get_ttl_seconds('CATALOG_CACHE_TTL_SECONDS', DEFAULT_CATALOG_CACHE_TTL_SECONDS)
+
+    if ttl_seconds <= 0:
+        return
+
+    now = time.monotonic()
+
+    with _cache_lock:
+        _make_room_for(_cached_rendered_pages, page_key, now)
+        _cached_rendered_pages[page_key] = (now + ttl_seconds, html)
+
+def get_cached_genres() -> Optional[List[str]]:
+    """
+    Returns a copy of the cached distinct genre list, if present and not expired.
+
+    Returns:
+        Optional[List[str]]: The cached genres, or None on a miss.
+    """
+    global _cached_genres
+
+    if _get_ttl_seconds('GENRE_CACHE_TTL_SECONDS', DEFAULT_GENRE_CACHE_TTL_SECONDS) <= 0:
+        return None
+
+    with _cache_lock:
+        if _cached_genres is None:
+            return None
+
+        expires_at, genres = _cached_genres
+
+        if expires_at <= time.monotonic():
+            _cached_genres = None
+            return None
+
+    return list(genres)
+
+def cache_genres(genres: Iterable[str]) -> None:
+    """
+    Stores a freshly queried distinct genre list with the configured TTL.
+
+    Args:
+        genres (Iterable[str]): The genres just read from the database.
+    """
+    global _cached_genres
+
+    ttl_seconds = _get_ttl_seconds('GENRE_CACHE_TTL_SECONDS', DEFAULT_GENRE_CACHE_TTL_SECONDS)
+
+    if ttl_seconds <= 0:
+        return
+
+    with _cache_lock:
+        _cached_genres = (time.monotonic() + ttl_seconds, list(genres))
+
+def invalidate_cached_genres() -> None:
+    """
+    Drops the cached genre list after a book is added, edited or deleted.
+    Stock changes do not affect genres and need not call this.
+    """
+    global _cached_genres
+
+    with _cache_lock:
+        _cached_genres = None
@@ -0,0 +1,187 @@
+# app/services/book_loader.py
+
+from flask import g, has_app_context                                         # Request-scoped storage
+from app.models.book import Book                                             # Book model class
+from app.logger import get_logger                                            # Custom application logger
+from typing import Any, Dict, Iterable, List, Optional                       # For type hinting
+from app.services.exceptions import NotFoundError                            # Custom exceptions
+from app.services.book_service import get_all_books, get_all_distinct_genres, get_book_by_id, get_books_by_ids # Uncached book lookups
+from app.services.book_cache import (                                        # Short-TTL cross-request caches
+    get_cached_books,
+    cache_books,
+    get_cached_catalog_page,
+    cache_catalog_page,
+    get_cached_genres,
+    cache_genres
+)
+
+logger = get_logger(__name__) # Logger instance for this module
+
+# Attribute on `flask.g` holding the per-request cache: book_id -> Book, or None for "known missing".
+_REQUEST_BOOK_CACHE_ATTR = '_book_cache'
+
+def _get_request_book_cache() -> Optional[Dict[int, Optional[Book]]]:
+    """
+    Returns the book cache for the current request, creating it on first use.
+    `flask.g` lives for one application context (one request), so cached rows never
+    outlive the request that loaded them.
+
+    Returns:
+        Optional[Dict[int, Optional[Book]]]: The cache dict, or None outside an app context.
+    """
+    if not has_app_context():
+        return None
+
+    cache = g.get(_REQUEST_BOOK_CACHE_ATTR)
+
+    if cache is None:
+        cache = {}
+        setattr(g, _REQUEST_BOOK_CACHE_ATTR, cache)
+
+    return cache
+
+def get_book_cached(book_id: int) -> Book:
+    """
+    Request-scoped, memoized version of `book_service.get_book_by_id`.
+    Repeated lookups of the same book within one request are served from memory; the
+    first lookup is served from the short-TTL process cache (`book_cache`) when possible.
+
+    Args:
+        book_id (int): The ID of the book to retrieve.
+
+    Returns:
+        Book: The `Book` object if found.
+
+    Raises:
+        NotFoundError: If no book with the given ID exists (also remembered for the request).
+        DatabaseError: If an unexpected error occurs during database interaction.
+    """
+    cache = _get_request_book_cache()
+
+    if cache is None:
+        return get_book_by_id(book_id)
+
+    if book_id not in cache:
+        shared_hit = get_cached_books((book_id,)).get(book_id)
+
+        if shared_hit is not None:
+            cache[book_id] = shared_hit
+
+    if book_id in cache:
+        cached_book = cache[book_id]
+
+        if cached_book is None:
+            raise NotFoundError(resource_name="Book", resource_id=book_id)
+
+        return cached_book
+
+    try:
+        book = get_book_by_id(book_id)
+
+    except NotFoundError:
+        cache[book_id] = None
+        raise
+
+    cache[book_id] = book
+    cache_books((book,))
+    return book
+
+def get_books_cached(book_ids: Iterable[int]) -> Dict[int, Book]:
+    """
+    Request-scoped, memoized version of `book_service.get_books_by_ids`.
+    IDs not already cached for this request are first looked up in the short-TTL process
+    cache (`book_cache`); the rest are fetched in a single query. The results (including
+    misses) then prime the request cache for later `get_book_cached` calls.
+
+    Args:
+        book_ids (Iterable[int]): The IDs of the books to retrieve.
+
+    Returns:
+        Dict[int, Book]: Found books keyed by `book_id`. Missing IDs are absent.
+
+    Raises:
+        DatabaseError: If an error occurs during database interaction.
+    """
+    book_ids_list = list(book_ids)
+    cache = _get_request_book_cache()
+
+    if cache is None:
+        return get_books_by_ids(book_ids_list)
+
+    ids_to_fetch = [book_id for book_id in book_ids_list if book_id not in cache]
+
+    ids_to_query = []
+
+    if ids_to_fetch:
+        shared_hits = get_cached_books(ids_to_fetch)
+        ids_to_query = [book_id for book_id in ids_to_fetch if book_id not in shared_hits]
+        fetched_books = get_books_by_ids(ids_to_query) if ids_to_query else {}
+        cache_books(fetched_books.values())
+
+        for book_id in ids_to_fetch:
+            cache[book_id] = shared_hits.get(book_id) or fetched_books.get(book_id)
+
+    logger.debug(f"Book loader: {len(book_ids_list) - len(ids_to_query)} cached, {len(ids_to_query)} queried.")
+    return {book_id: cache[book_id] for book_id in book_ids_list if cache[book_id] is not None}
+
+def get_catalog_page_cached(
+    genre_filter: Optional[str] = None,
+    search_term: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    sort_order: Optional[str] = 'asc',
+    page: int = 1,
+    per_page: int = 12
+) -> Dict[str, Any]:
+    """
+    Cached, template-ready version of `book_service.get_all_books` for the catalog pages.
+    Rows are fetched straight into `Book.to_dict()`-shaped dictionaries (`as_dicts=True`), so
+    no Book objects are built, and a cache hit skips the query altogether. Entries live in the short-TTL process
+    cache (`book_cache`), keyed on the listing parameters, and are dropped whenever a book is
+    added, edited, deleted or sold.
+
+    Returns:
+        Dict[str, Any]: The same page dict as `get_all_books` ('books', 'total_count', 'page', 'per_page'),
+                        except that 'books' is a list of `Book.to_dict()` dictionaries.
+
+    Raises:
+        DatabaseError: If an error occurs during database interaction.
+    """
+    page_key = (genre_filter, search_term, sort_by, sort_order, page, per_page)
+    cached_page = get_cached_catalog_page(page_key)
+
+    if cached_page is not None:
+        logger.debug(f"Book loader: catalog page {page_key} served from cache.")
+        return cached_page
+
+    catalog_page = get_all_books(
+        genre_filter=genre_filter,
+        search_term=search_term,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        page=page,
+        per_page=per_page,
+        as_dicts=True
+    )
+    cache_catalog_page(page_key, catalog_page)
+    return catalog_page
+
+def get_all_distinct_genres_cached() -> List[str]:
+    """
+    Cached version of `book_service.get_all_distinct_genres` for the catalog filter dropdowns.
+    The list is kept in the process cache (`book_cache`) and dropped whenever a book is
+    added, edited or deleted.
+
+    Returns:
+        List[str]: The distinct genres, alphabetically ordered.
+
+    Raises:
+        DatabaseError: If an error occurs during database interaction.
+    """
+    genres = get_cached_genres()
+
+    if genres is not None:
+        return genres
+
+    genres = get_all_distinct_genres()
+    cache_genres(genres)
+    return genres
@@ -4,8 +4,9 @@ import psycopg2                                                       # For data
 from decimal import Decimal, InvalidOperation                                                         # For type hinting
 from app.models.book import Book                                                    # Book model class
 from app.logger import get_logger                                                   # Custom application logger
-from typing import List, Optional                                                   # For type hinting
-from app.models.db import get_db_connection                                         # For database connections
+from typing import Dict, Iterable, List, Optional, Tuple                            # For type hinting
+from app.models.db import get_db_connection, release_db_connection                  # For database connections
+from app.services.book_cache import invalidate_cached_books, invalidate_cached_catalog_pages, invalidate_cached_genres # Drop cached rows after writes
 from app.services.exceptions import DatabaseError, NotFoundError, ValidationError   # Custom exceptions
  
 logger = get_logger(__name__) # Logger instance for this module
@@ -16,14 +17,19 @@ def get_all_books(
     sort_by: Optional[str] = None,
     sort_order: Optional[str] = 'asc',
     page: int = 1,
-    per_page: int = 12
+    per_page: int = 12,
+    as_dicts: bool = False
 ) -> dict:
     """
     Retrieves a paginated list of books from the database.
 
+    Args:
+        as_dicts (bool): If True, each row is returned as a `Book.to_dict()`-shaped dictionary
+                         (via `Book.dict_from_row`) instead of a Book object. Defaults to False.
+
     Returns:
         dict: A dictionary containing:
-              - 'books': List[Book]
+              - 'books': List[Book] (or List[dict] when `as_dicts` is True)
               - 'total_count': int
               - 'page': int
               - 'per_page': int
@@ -40,7 +46,8 @@ def get_all_books(
         params_for_where_clause.append(genre_filter)
 
     if search_term:
-        where_clauses_list.append("(LOWER(title) ILIKE %s OR LOWER(author) ILIKE %s)")
+        # ILIKE is already case-insensitive; bare columns keep the predicate usable by a trigram index.
+        where_clauses_list.append("(title ILIKE %s OR author ILIKE %s)")
         params_for_where_clause.extend([f"%{search_term.lower()}%", f"%{search_term.lower()}%"])
 
     where_sql = ""
@@ -48,7 +55,7 @@ def get_all_books(
         where_sql = " WHERE " + " AND ".join(where_clauses_list)
     
     count_query = "SELECT COUNT(*) FROM books" + where_sql
-    full_query = "SELECT * FROM books" + where_sql
+    full_query = f"SELECT {', '.join(Book.COLUMNS)} FROM books" + where_sql
     
     # --- Sorting Logic ---
     allowed_sort_options = {
@@ -97,10 +104,14 @@ def get_all_books(
             cur.execute(full_query, tuple(params_for_fetch))
             results_as_dicts = cur.fetchall()
         
-        for row_dict in results_as_dicts:
-            book_obj = Book.from_row(row_dict)
-            if book_obj:
-                book_objects.append(book_obj)
+        if as_dicts:
+            book_objects = [Book.dict_from_row(row_dict) for row_dict in results_as_dicts]
+
+        else:
+            for row_dict in results_as_dicts:
+                book_obj = Book.from_row(row_dict)
+                if book_obj:
+                    book_objects.append(book_obj)
         
         logger.info(f"Service: Successfully retrieved {len(book_objects)} books (Page {page}). Total: {total_count}")
         return {
@@ -114,7 +125,7 @@ def get_all_books(
         raise DatabaseError("Could not retrieve book list due to a database problem.", original_exception=e)
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 def get_all_distinct_genres() -> List[str]:
     """
@@ -146,7 +157,7 @@ def get_all_distinct_genres() -> List[str]:
         raise DatabaseError("Could not retrieve genre list due to a database problem.", original_exception=e)
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 def get_book_by_id(book_id: int) -> Book: 
     """
@@ -202,6 +213,70 @@ def get_book_by_id(book_id: int) -> Book:
 
         raise DatabaseError(message=f"Could not retrieve book with ID {book_id} due to a server error.", original_exception=e)
 
+def get_books_by_ids(book_ids: Iterable[int]) -> Dict[int, Book]:
+    """
+    Retrieves several books with one database query (instead of one `get_book_by_id`
+    call per ID). Intended for cart-style lookups where many IDs are known up front.
+
+    Unlike `get_book_by_id`, missing books do not raise `NotFoundError`; callers check
+    for absent keys and handle them per item.
+
+    Args:
+        book_ids (Iterable[int]): The IDs of the books to retrieve.
+
+    Returns:
+        Dict[int, Book]: Found books keyed by `book_id`.
+
+    Raises:
+        DatabaseError: If an error occurs during database interaction.
+    """
+    book_ids_list = list(book_ids)
+    logger.debug(f"Service: Batch-fetching {len(book_ids_list)} books by ID.")
+
+    try:
+        return Book.get_by_ids(book_ids_list)
+
+    except DatabaseError as de:
+        logger.error(f"Service: A database error occurred while batch-fetching books: {de.log_message}", exc_info=True)
+
+        raise
+
+    except Exception as e:
+        logger.error(f"Service: An unexpected error occurred while batch-fetching books: {e}", exc_info=True)
+
+        raise DatabaseError(message="Could not retrieve the requested books due to a server error.", original_exception=e)
+
+def resolve_cart_stock(requested_quantities: Dict[int, int]) -> Dict[int, Tuple[int, Book]]:
+    """
+    Validates requested cart quantities against current stock with one database query.
+    The database caps each quantity (`LEAST(requested, stock_quantity)`) and returns the
+    matching book rows in the same round trip.
+
+    Args:
+        requested_quantities (Dict[int, int]): Requested quantity per book ID.
+
+    Returns:
+        Dict[int, Tuple[int, Book]]: Allowed quantity and current `Book` per existing book ID.
+                                     Books that no longer exist are absent.
+
+    Raises:
+        DatabaseError: If an error occurs during database interaction.
+    """
+    logger.debug(f"Service: Resolving stock for {len(requested_quantities)} cart books.")
+
+    try:
+        return Book.resolve_cart_stock(requested_quantities)
+
+    except DatabaseError as de:
+        logger.error(f"Service: A database error occurred while resolving cart stock: {de.log_message}", exc_info=True)
+
+        raise
+
+    except Exception as e:
+        logger.error(f"Service: An unexpected error occurred while resolving cart stock: {e}", exc_info=True)
+
+        raise DatabaseError(message="Could not check stock for your cart due to a server error.", original_exception=e)
+
 def decrease_book_stock(book_id: int, quantity_to_decrease: int, db_conn=None) -> bool:
     """
     Decreases the stock quantity for a given book ID by the specified amount.
@@ -222,7 +297,8 @@ def decrease_book_stock(book_id: int, quantity_to_decrease: int, db_conn=None) -
             is created, and the transaction (commit/rollback) is managed locally 
             within this function. If a connection is provided, this function will use 
             it and will NOT commit, rollback, or close it, assuming it's part of a 
-            larger, externally managed transaction (e.g., order creation).
+            larger, externally managed transaction (e.g., order creation). The caller
+            must then call `invalidate_cached_books` for the book after committing.
 
     Returns:
         bool: True if the stock was successfully updated in the database (this indicates
@@ -302,6 +378,8 @@ def decrease_book_stock(book_id: int, quantity_to_decrease: int, db_conn=None) -
 
             if manage_conn_locally:
                 conn_to_use.commit()
+                # Only after the commit: invalidating earlier lets a concurrent reader re-cache the old stock.
+                invalidate_cached_books((book_id,))
                 logger.info(f"Stock for book_id {book_id} successfully decreased to {new_stock_quantity}. Local transaction committed.")
 
             else:
@@ -336,16 +414,9 @@ def decrease_book_stock(book_id: int, quantity_to_decrease: int, db_conn=None) -
         raise DatabaseError("Could not update book stock due to an unexpected database issue.", original_exception=e)
     
     finally:
-        if manage_conn_locally and conn_to_use and not conn_to_use.closed:
-
-            try: conn_to_use.autocommit = True # Reset autocommit if it was changed
-
-            except psycopg2.Error as conn_err: logger.debug(f"Error resetting autocommit for book_id {book_id} during close: {conn_err}")
-
-            except Exception as e: logger.error(f"Unexpected error resetting autocommit for book_id {book_id}: {e}", exc_info=True)
-
-            conn_to_use.close()
-            logger.debug(f"Locally managed database connection closed after stock decrease attempt for book_id {book_id}.")
+        if manage_conn_locally and conn_to_use:
+            release_db_connection(conn_to_use) # Resets autocommit; discards the connection if it is broken
+            logger.debug(f"Locally managed database connection returned to the pool after stock decrease attempt for book_id {book_id}.")
 
 # --- Admin Specific Book Management Functions ---
 
@@ -396,7 +467,9 @@ def admin_add_book(book_data: dict[str, any]) -> Book:
     
     try:
         new_book.save() # The Book model's save method handles DB insertion and sets book_id
-        logger.info(f"Service (Admin): Book '{new_book.title.title()}' (ID: {new_book.book_id}) added successfully.")
+        invalidate_cached_catalog_pages() # The new book must show up on the catalog pages
+        invalidate_cached_genres() # It may introduce a new genre
+        logger.info(f"Service (Admin): Book '{new_book.title_display}' (ID: {new_book.book_id}) added successfully.")
         return new_book
     except DatabaseError as de: # Catch specific DB errors from book.save()
         logger.error(f"Service (Admin): Database error adding book '{new_book.title}': {de.log_message}", exc_info=True)
@@ -421,8 +494,15 @@ def admin_update_book(book_id: int, book_data: dict[str, any]) -> Book:
 
     Raises:
         NotFoundError: If the book with the given `book_id` is not found.
-        ValidationError: If required fields are missing or data types are invalid for update.
+        ValidationError: If required fields are missing or data types are invalid for update,
+                         or if the stock changed since the form was loaded (see
+                         'original_stock_quantity' below).
         DatabaseError: If an error occurs during the database save operation.
+
+    Note:
+        If `book_data` carries 'original_stock_quantity' (the stock shown on the edit form),
+        the update only applies while the stored stock still equals it. This keeps an edit
+        from silently undoing stock that orders decremented while the form was open.
     """
     logger.info(f"Service (Admin): Attempting to update book with ID: {book_id}")
     
@@ -444,8 +524,8 @@ def admin_update_book(book_id: int, book_data: dict[str, any]) -> Book:
         raise ValidationError("Price and Stock Quantity must be valid numbers for update.", original_exception=e)
 
     # Optional fields: only update if provided in book_data to avoid overwriting with None
-    if 'image_url' in book_data: book_to_update.image_url = book_data.get('image_url') or Book._default_image_url # Assuming Book has a default
-    if 'description' in book_data: book_to_update.description = book_data.get('description') or Book._default_description # Assuming Book has a default
+    if 'image_url' in book_data: book_to_update.image_url = book_data.get('image_url') or Book.DEFAULT_IMAGE_URL
+    if 'description' in book_data: book_to_update.description = book_data.get('description') or Book.DEFAULT_DESCRIPTION
     
     # Basic validation after attempting updates
     if not book_to_update.title or not book_to_update.author:
@@ -453,10 +533,26 @@ def admin_update_book(book_id: int, book_data: dict[str, any]) -> Book:
         raise ValidationError("Title and Author cannot be empty for book update.",
                               errors={'title_author': "Title and Author are required."})
 
+    # The stock the admin's form was loaded with; orders may have sold copies since.
+    expected_stock_quantity = book_data.get('original_stock_quantity') if 'stock_quantity' in book_data else None
+
     try:
-        book_to_update.save() # Book model's save method handles DB update
-        logger.info(f"Service (Admin): Book '{book_to_update.title.title()}' (ID: {book_id}) updated successfully.")
+        if not book_to_update.save(expected_stock_quantity=expected_stock_quantity): # Book model's save method handles DB update
+            current_book = get_book_by_id(book_id) # Raises NotFoundError if the book was deleted meanwhile
+            logger.warning(f"Service (Admin): Stale update for book ID {book_id} rejected. Stock changed from {expected_stock_quantity} to {current_book.stock_quantity}.")
+
+            raise ValidationError(
+                f"The stock for '{current_book.title_display}' changed to {current_book.stock_quantity} while you were editing. "
+                "Please review the stock quantity and save again.",
+                errors={'stock_quantity': f"Current stock is {current_book.stock_quantity}."}
+            )
+
+        invalidate_cached_books((book_id,))
+        invalidate_cached_genres() # The genre may have changed
+        logger.info(f"Service (Admin): Book '{book_to_update.title_display}' (ID: {book_id}) updated successfully.")
         return book_to_update
+    except (ValidationError, NotFoundError): # Stale edit, or book deleted during the edit
+        raise
     except DatabaseError as de:
         logger.error(f"Service (Admin): Database error updating book ID {book_id}: {de.log_message}", exc_info=True)
         raise
@@ -488,6 +584,8 @@ def admin_delete_book(book_id: int) -> bool:
     try:
         # Delegate to the Book model's static delete method
         if Book.delete(book_id):
+            invalidate_cached_books((book_id,))
+            invalidate_cached_genres() # It may have been the last book of its genre
             logger.info(f"Service (Admin): Book ID {book_id} deleted successfully.")
             return True
         else:
@@ -5,9 +5,11 @@ from datetime import datetime                                               # Fo
 from app.models.order import Order                                          # Order model class
 from app.logger import get_logger                                           # Custom application logger
 from app.services.email_service import send_simple_email
-from decimal import Decimal, ROUND_HALF_UP                                  # For precise financial calculations
+from decimal import Decimal                                                 # For precise financial calculations
 from app.models.order_item import OrderItem                                 # OrderItem model class
-from app.models.db import get_db_connection                                 # For database connections
+from app.models.db import get_db_connection, release_db_connection          # For database connections
+from psycopg2.extras import execute_values                                  # Multi-row INSERT for order items
+from app.services.book_cache import invalidate_cached_books                 # Drop cached stock after the order commits
 from typing import List, Dict, Any, Optional                                # For type hinting
 from app.services.book_service import get_book_by_id, decrease_book_stock   # To interact with book data and stock
 from app.services.exceptions import (                                       # Custom exceptions for error handling
@@ -67,7 +69,7 @@ def create_order_from_cart(user_id: Optional[int],
     
     conn = None
     order_items_to_process_for_db: List[Dict[str, Any]] = []
-    calculated_total_amount = Decimal('0.00')
+    calculated_total_cents = 0 # Summed in integer cents (Book.price_cents), like the cart totals
 
     try:
         logger.debug(f"Service: Pre-validating cart items and calculating total for {log_user_context}...")
@@ -86,14 +88,14 @@ def create_order_from_cart(user_id: Optional[int],
                     logger.warning(f"Order Processing (Pre-check): Insufficient stock for '{book.title}' (ID: {book_id}). Req: {quantity}, Avail: {book.stock_quantity}.")
 
                     raise OrderProcessingError(
-                        f"Not enough stock for '{book.title.title()}'. Only {book.stock_quantity} available. Please update your cart.",
-                        errors={'cart_item_stock': f"Insufficient stock for {book.title.title()}"}
+                        f"Not enough stock for '{book.title_display}'. Only {book.stock_quantity} available. Please update your cart.",
+                        errors={'cart_item_stock': f"Insufficient stock for {book.title_display}"}
                     )
                 
                 
                 if((book.stock_quantity - quantity) < 10):
-                    subject = f"ALERT: Stock quantity for '{book.title.title()}'is LOW!"
-                    message = f"The stock quantity for '{book.title.title()}', is at {book.stock_quantity-quantity} available books and is under our threshold. Please order new inventory and/or update inventory"
+                    subject = f"ALERT: Stock quantity for '{book.title_display}'is LOW!"
+                    message = f"The stock quantity for '{book.title_display}', is at {book.stock_quantity-quantity} available books and is under our threshold. Please order new inventory and/or update inventory"
 
                     try:
                         admin_emails = get_admin_emails_dict()
@@ -112,8 +114,7 @@ def create_order_from_cart(user_id: Optional[int],
 
                 
                 price_at_purchase = book.price 
-                item_total = price_at_purchase * Decimal(quantity)
-                calculated_total_amount += item_total
+                calculated_total_cents += book.price_cents * quantity
                 order_items_to_process_for_db.append({
                     'book_id': book_id, 
                     'quantity': quantity, 
@@ -132,7 +133,7 @@ def create_order_from_cart(user_id: Optional[int],
         if not order_items_to_process_for_db:
              raise ValidationError("No valid items to order after validation.")
         
-        calculated_total_amount = calculated_total_amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        calculated_total_amount = Decimal(calculated_total_cents).scaleb(-2) # Exact; already whole cents
         logger.info(f"Order pre-calculation for {log_user_context}: Total amount ${calculated_total_amount:.2f}, Items: {len(order_items_to_process_for_db)}")
 
         conn = get_db_connection()
@@ -154,6 +155,15 @@ def create_order_from_cart(user_id: Optional[int],
         """ 
         
         with conn.cursor() as cur:
+            # Lock every ordered book row up front, in book_id order. decrease_book_stock re-checks
+            # stock under these locks, so concurrent orders can't oversell, and taking the locks in
+            # one consistent order keeps two overlapping orders from deadlocking each other.
+            order_items_to_process_for_db.sort(key=lambda item: item['book_id'])
+            cur.execute(
+                "SELECT book_id FROM books WHERE book_id = ANY(%s) ORDER BY book_id FOR UPDATE;",
+                ([item['book_id'] for item in order_items_to_process_for_db],)
+            )
+
             cur.execute(order_insert_query, (
                 user_id, order_date_db, calculated_total_amount, order_status,
                 shipping_details.get('shipping_address_line1'),
@@ -179,28 +189,34 @@ def create_order_from_cart(user_id: Optional[int],
 
             order_item_insert_query = """
                 INSERT INTO order_items (order_id, book_id, quantity, unit_price_at_purchase)
-                VALUES (%s, %s, %s, %s)
+                VALUES %s
                 RETURNING order_item_id;
             """
             created_order_item_models: List[OrderItem] = []
             
             for item_data in order_items_to_process_for_db:
                 decrease_book_stock(item_data['book_id'], item_data['quantity'], db_conn=conn) 
-                cur.execute(order_item_insert_query, (
-                    new_order_id, item_data['book_id'], 
-                    item_data['quantity'], item_data['unit_price_at_purchase']
-                ))
 
-                order_item_result_row = cur.fetchone()
+            # One multi-row INSERT for every item instead of a round trip per item.
+            # Multi-row VALUES inserts return their rows in VALUES order.
+            order_item_result_rows = execute_values(cur, order_item_insert_query, [
+                (new_order_id, item_data['book_id'], item_data['quantity'], item_data['unit_price_at_purchase'])
+                for item_data in order_items_to_process_for_db
+            ], fetch=True)
 
-                if not order_item_result_row or 'order_item_id' not in order_item_result_row:
-                    raise DatabaseError(f"Failed to create order item for book ID {item_data['book_id']} in order {new_order_id}")
-                
+            if len(order_item_result_rows) != len(order_items_to_process_for_db):
+                raise DatabaseError(f"Failed to create the order items for order {new_order_id}: "
+                                    f"{len(order_item_result_rows)} of {len(order_items_to_process_for_db)} inserted.")
+
+            for item_data, order_item_result_row in zip(order_items_to_process_for_db, order_item_result_rows):
                 item_instance_data = {**item_data, **order_item_result_row, 'order_id': new_order_id}
                 created_order_item_models.append(OrderItem.from_row(item_instance_data))
             
             conn.commit()
             logger.info(f"Order {new_order_id} fully committed for {log_user_context}.")
+            # Only now: invalidating inside the open transaction would let a concurrent cart view
+            # re-cache the old committed stock.
+            invalidate_cached_books([item_data['book_id'] for item_data in order_items_to_process_for_db])
 
             # Construct Order object using data confirmed from DB and inputs
             final_order = Order(
@@ -239,9 +255,8 @@ def create_order_from_cart(user_id: Optional[int],
     
     finally:
         if conn:
-            conn.autocommit = True 
-            conn.close()
-            logger.debug(f"Database connection closed for order creation attempt by {log_user_context}.")
+            release_db_connection(conn) # Also resets autocommit for the next borrower
+            logger.debug(f"Database connection returned to the pool for order creation attempt by {log_user_context}.")
 
 
 def get_orders_by_user(user_id: int) -> List[Order]:
@@ -294,7 +309,7 @@ def get_orders_by_user(user_id: int) -> List[Order]:
         raise DatabaseError("Could not retrieve your order history due to a database problem.", original_exception=e)
     
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
 
 
 def get_order_details(order_id: int, user_id_for_auth: Optional[int] = None, 
@@ -393,4 +408,4 @@ def get_order_details(order_id: int, user_id_for_auth: Optional[int] = None,
         raise DatabaseError("Could not retrieve the details for this order.", original_exception=e)
     
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: release_db_connection(conn)
\ No newline at end of file
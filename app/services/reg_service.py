@@ -3,7 +3,7 @@
 import re
 from app.models.user import User                                            # Import the User model type hinting and retrun type
 from app.logger import get_logger                                           # Use the application's configured logger
-from app.models.db import get_db_connection                                 # Import the database connection utility
+from app.models.db import get_db_connection, release_db_connection          # Import the database connection utility
 from typing import Dict, Any, List, Optional                                # Type hints for function parameters & return types
 from werkzeug.security import generate_password_hash                        # For password hashing
 from app.services.exceptions import ValidationError, DatabaseError, AppException    # Custome exceptions & error handling
@@ -11,15 +11,35 @@ from app.services.exceptions import ValidationError, DatabaseError, AppException
 logger = get_logger(__name__)
 
 # --- Validation Constants ---
-EMAIL_REGEX = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
-PASSWORD_REGEX = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-])[A-Za-z\d!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-]{8,128}$"
-NAME_REGEX = r"^[A-Za-z\s'\-.,]{1,70}$"
-PHONE_DIGITS_REGEX = r"^\d{10,15}$"
-ZIP_CODE_REGEX = r"^\d{5}(?:[-\s]\d{4})?$"
-STATE_REGEX = r"^[A-Za-z\s.,'-]{2,50}$"
-ADDRESS_REGEX = r"^[A-Za-z0-9\s.,#'\-\/\(\)]{1,100}$"
+# Patterns are compiled once at import; validation then calls `.match()` directly.
+EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+PASSWORD_REGEX = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-])[A-Za-z\d!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-]{8,128}$")
+NAME_REGEX = re.compile(r"^[A-Za-z\s'\-.,]{1,70}$")
+PHONE_DIGITS_REGEX = re.compile(r"^\d{10,15}$")
+NON_DIGIT_REGEX = re.compile(r"[^0-9]")
+ZIP_CODE_REGEX = re.compile(r"^\d{5}(?:[-\s]\d{4})?$")
+STATE_REGEX = re.compile(r"^[A-Za-z\s.,'-]{2,50}$")
+ADDRESS_REGEX = re.compile(r"^[A-Za-z0-9\s.,#'\-\/\(\)]{1,100}$")
 ALLOWED_ROLES = {'customer', 'admin', 'employee'}
 
+# --- Registration Schema ---
+# Declared once so validation is a single pass over fixed tables instead of per-field branches.
+REQUIRED_REGISTRATION_FIELDS = ('first_name', 'last_name', 'email', 'password', 'confirm_password', 'role')
+
+# field_key -> (compiled pattern, error message); applied to the always-required name fields.
+NAME_FIELD_RULES = {
+    'first_name': (NAME_REGEX, "First name: 1-70 characters, letters, spaces, and '-,."),
+    'last_name': (NAME_REGEX, "Last name: 1-70 characters, letters, spaces, and '-,."),
+}
+
+# field_key -> (display name, compiled pattern, error message); required once any address part is given.
+ADDRESS_FIELD_RULES = {
+    'address_line1': ("Address Line 1", ADDRESS_REGEX, "Invalid Address Line 1 (max 100 chars)."),
+    'city': ("City", NAME_REGEX, "Invalid city name."),
+    'state': ("State", STATE_REGEX, "Invalid state (e.g., NY or California, max 50 chars)."),
+    'zip_code': ("ZIP Code", ZIP_CODE_REGEX, "Invalid ZIP code (e.g., 12345 or 12345-1234).")
+}
+
 def validate_registration_data(form_data: Dict[str, Any]) -> List[str]:
     """
     Validates user registration data against predefined rules and checks for email uniqueness.
@@ -42,9 +62,7 @@ def validate_registration_data(form_data: Dict[str, Any]) -> List[str]:
     logger.debug(f"Service: Validating registration data for potential user: {email_for_log}")
     errors: List[str] = []
     
-    required_fields = ['first_name', 'last_name', 'email', 'password', 'confirm_password', 'role']
-
-    for field in required_fields:
+    for field in REQUIRED_REGISTRATION_FIELDS:
         if not form_data.get(field,"").strip():
             errors.append(f"{field.replace('_', ' ').title()} is required.")
     
@@ -54,15 +72,13 @@ def validate_registration_data(form_data: Dict[str, Any]) -> List[str]:
         return errors
 
     # Field-specific Validations
-    if not re.match(NAME_REGEX, form_data['first_name']):
-        errors.append("First name: 1-70 characters, letters, spaces, and '-,.")
-
-    if not re.match(NAME_REGEX, form_data['last_name']):
-        errors.append("Last name: 1-70 characters, letters, spaces, and '-,.")
+    for field_key, (pattern, msg) in NAME_FIELD_RULES.items():
+        if not pattern.match(form_data[field_key]):
+            errors.append(msg)
 
     email = form_data.get('email', '') # Assumed already lowercased by route
 
-    if not re.match(EMAIL_REGEX, email):
+    if not EMAIL_REGEX.match(email):
         errors.append("Invalid email address format (e.g., user@example.com).")
         
     else:
@@ -74,15 +90,15 @@ def validate_registration_data(form_data: Dict[str, Any]) -> List[str]:
             errors.append("Could not verify email uniqueness at this time. Please try again.")
 
     if form_data.get('phone_number',"").strip():
-        phone_digits = re.sub(r"[^0-9]", "", form_data['phone_number']) 
+        phone_digits = NON_DIGIT_REGEX.sub("", form_data['phone_number']) 
 
-        if not re.match(PHONE_DIGITS_REGEX, phone_digits):
+        if not PHONE_DIGITS_REGEX.match(phone_digits):
             errors.append("Phone number: Please enter 10 to 15 digits.")
 
     password = form_data.get('password', '')
     confirm_password = form_data.get('confirm_password', '')
 
-    if password and not re.match(PASSWORD_REGEX, password):
+    if password and not PASSWORD_REGEX.match(password):
         errors.append("Password: Min 8 chars, with uppercase, lowercase, number, and special character.")
 
     elif password != confirm_password:
@@ -92,27 +108,19 @@ def validate_registration_data(form_data: Dict[str, Any]) -> List[str]:
         errors.append(f"Invalid role. Please choose from: {', '.join(ALLOWED_ROLES)}.")
 
     # Address fields (conditionally required or format-checked if provided)
-    main_address_fields_provided = any(form_data.get(f,"").strip() for f in ['address_line1', 'city', 'state', 'zip_code'])
+    main_address_fields_provided = any(form_data.get(f,"").strip() for f in ADDRESS_FIELD_RULES)
 
     if main_address_fields_provided:
-        # You might enforce these if main_address_fields_provided is true, or based on role
-        address_fields_to_check = {
-            'address_line1': ("Address Line 1", ADDRESS_REGEX, "Invalid Address Line 1 (max 100 chars)."),
-            'city': ("City", NAME_REGEX, "Invalid city name."),
-            'state': ("State", STATE_REGEX, "Invalid state (e.g., NY or California, max 50 chars)."),
-            'zip_code': ("ZIP Code", ZIP_CODE_REGEX, "Invalid ZIP code (e.g., 12345 or 12345-1234).")
-        }
-
-        for field_key, (field_name, regex, msg) in address_fields_to_check.items():
+        for field_key, (field_name, pattern, msg) in ADDRESS_FIELD_RULES.items():
             value = form_data.get(field_key,"").strip()
 
             if not value: # If any main address part is given, these become required
                 errors.append(f"{field_name} is required when providing an address.")
 
-            elif not re.match(regex, value):
+            elif not pattern.match(value):
                 errors.append(msg)
         
-        if form_data.get('address_line2',"").strip() and not re.match(ADDRESS_REGEX, form_data['address_line2']):
+        if form_data.get('address_line2',"").strip() and not ADDRESS_REGEX.match(form_data['address_line2']):
             errors.append("Invalid Address Line 2 (max 100 chars).")
             
     if errors:
@@ -215,9 +223,8 @@ def register_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
     
     finally:
         if conn:
-            conn.autocommit = True # Reset for connection pooling if applicable
-            conn.close()
-            logger.debug(f"Database connection closed for registration attempt of '{email_to_register}'.")
+            release_db_connection(conn) # Also resets autocommit for the next borrower
+            logger.debug(f"Database connection returned to the pool for registration attempt of '{email_to_register}'.")
 
 
 def get_user_by_email(email: str) -> Optional[User]:
@@ -267,5 +274,5 @@ def get_user_by_email(email: str) -> Optional[User]:
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for get_user_by_email (email: '{email}').")
\ No newline at end of file
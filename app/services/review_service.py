@@ -3,7 +3,7 @@
 from datetime import datetime
 from app.logger import get_logger # Custom application logger
 from typing import List, Dict, Any, Optional # For type hinting
-from app.models.db import get_db_connection # For database connections
+from app.models.db import get_db_connection, release_db_connection # For database connections
 from psycopg2.extras import RealDictCursor # To get rows as dictionaries
 from app.utils import sanitize_html_text # For sanitizing review comments
 from app.services.exceptions import (         # Customer exceptions for error handling
@@ -76,7 +76,7 @@ def get_reviews_by_user_id(user_id: int) -> List[Dict[str, Any]]:
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for get_reviews_by_user_id (user_id: {user_id}).")
 
 
@@ -147,7 +147,7 @@ def add_review(book_id: int, user_id: int, rating: int, raw_comment: str) -> Dic
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for add_review (book_id: {book_id}, user_id: {user_id}).")
 
 
@@ -229,7 +229,7 @@ def update_review(review_id: int, rating: int, raw_comment: str, current_user_id
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for update_review (review_id: {review_id}).")
 
 
@@ -308,7 +308,7 @@ def delete_review_if_owner(review_id: int, current_user_id: int) -> bool:
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for delete_review_if_owner (review_id: {review_id}).")
 
 
@@ -387,7 +387,7 @@ def get_reviews_by_book(book_id: int, current_user_id_for_ownership: Optional[in
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for get_reviews_by_book (book_id: {book_id}).")
 
 
@@ -447,5 +447,5 @@ def get_user_review_for_book(book_id: int, user_id: int) -> Optional[Dict[str, A
     
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Database connection closed for get_user_review_for_book (book_id: {book_id}, user_id: {user_id}).")
\ No newline at end of file
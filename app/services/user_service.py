@@ -3,21 +3,22 @@
 import re
 from flask_login import current_user
 from typing import List, Optional, Dict, Any # For type hinting
-from app.models.db import get_db_connection # For database connections
+from app.models.db import get_db_connection, release_db_connection # For database connections
 from app.models.user import User # User model class
 from app.services.exceptions import DatabaseError, NotFoundError, ValidationError, AppException # Custom exceptions
 from app.logger import get_logger # Custom application logger
 from werkzeug.security import generate_password_hash # For admin creating users
 
-# Validation Constants (as you have them in your user_service.py)
-PASSWORD_REGEX = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-])[A-Za-z\d!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-]{8,128}$"
-EMAIL_REGEX = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+# Validation Constants (compiled once at import time)
+PASSWORD_REGEX = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-])[A-Za-z\d!@#$%^&*()_+={}\[\]:;\"'<>,.?/~`\-]{8,128}$")
+EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
 ALLOWED_ROLES = {'customer', 'admin', 'employee'} 
-PHONE_DIGITS_REGEX = r"^\d{10,15}$"
-NAME_REGEX = r"^[A-Za-z\s'\-.,]{1,70}$"
-ZIP_CODE_REGEX = r"^\d{5}(?:[-\s]\d{4})?$" 
-STATE_REGEX = r"^[A-Za-z\s.,'-]{2}$"
-ADDRESS_REGEX = r"^[A-Za-z0-9\s.,#'\-\/\(\)]{1,100}$"
+PHONE_DIGITS_REGEX = re.compile(r"^\d{10,15}$")
+NAME_REGEX = re.compile(r"^[A-Za-z\s'\-.,]{1,70}$")
+ZIP_CODE_REGEX = re.compile(r"^\d{5}(?:[-\s]\d{4})?$")
+STATE_REGEX = re.compile(r"^[A-Za-z\s.,'-]{2}$")
+ADDRESS_REGEX = re.compile(r"^[A-Za-z0-9\s.,#'\-\/\(\)]{1,100}$")
+NON_DIGIT_REGEX = re.compile(r"[^0-9]")
 
 logger = get_logger(__name__) # Logger instance for this module   
 
@@ -110,7 +111,6 @@ def admin_get_all_users(
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            print("Full QUERY: ", full_query)
             cur.execute(full_query, tuple(params_for_where_clause) if params_for_where_clause else None)
             user_rows = cur.fetchall()
 
@@ -127,7 +127,7 @@ def admin_get_all_users(
         raise DatabaseError("Could not retrieve user list due to a database problem.", original_exception=e)
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug("Service (Admin): Database connection closed for admin_get_all_users.")
 
 def admin_get_user_by_id(user_id: int) -> Optional[User]:
@@ -171,7 +171,7 @@ def admin_get_user_by_id(user_id: int) -> Optional[User]:
         raise DatabaseError(f"Could not retrieve user details for ID {user_id} due to a server error.", original_exception=e)
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug(f"Service (Admin): Database connection closed for admin_get_user_by_id (user_id: {user_id}).")
 
 def _admin_set_user_active_status(user_id: int, admin_user_id: int, is_active_status: bool) -> bool:
@@ -235,7 +235,7 @@ def _admin_set_user_active_status(user_id: int, admin_user_id: int, is_active_st
         logger.error(f"Service (Admin): Database error trying to {action} user ID {user_id}: {e}", exc_info=True)
         raise DatabaseError(f"Could not {action} user account due to a database problem.", original_exception=e)
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
 
 def admin_disable_user(user_id_to_disable: int, current_admin_id: int) -> bool:
     """
@@ -313,43 +313,43 @@ def admin_create_user(user_data: Dict[str, Any], performing_admin_id: int) -> Us
     errors_dict: Dict[str, str] = {}
     # Required fields validation
     if not first_name: errors_dict['first_name'] = "First name is required."
-    elif not re.match(NAME_REGEX, first_name): errors_dict['first_name'] = "Invalid first name (1-70 chars, letters, spaces, '-,.)."
+    elif not NAME_REGEX.match(first_name): errors_dict['first_name'] = "Invalid first name (1-70 chars, letters, spaces, '-,.)."
     
     if not last_name: errors_dict['last_name'] = "Last name is required."
-    elif not re.match(NAME_REGEX, last_name): errors_dict['last_name'] = "Invalid last name (1-70 chars, letters, spaces, '-,.)."
+    elif not NAME_REGEX.match(last_name): errors_dict['last_name'] = "Invalid last name (1-70 chars, letters, spaces, '-,.)."
 
     if not email: errors_dict['email'] = "Email is required."
-    elif not re.match(EMAIL_REGEX, email): errors_dict['email'] = "Invalid email format (e.g., user@example.com)."
+    elif not EMAIL_REGEX.match(email): errors_dict['email'] = "Invalid email format (e.g., user@example.com)."
     
     if not role: errors_dict['role'] = "Role is required."
     elif role not in ALLOWED_ROLES: errors_dict['role'] = f"Invalid role. Allowed: {', '.join(ALLOWED_ROLES)}."
     
     if not password: errors_dict['password'] = "An initial password is required."
-    elif not re.match(PASSWORD_REGEX, password):
+    elif not PASSWORD_REGEX.match(password):
         errors_dict['password'] = "Password: Min 8 chars, with uppercase, lowercase, number, & special char."
 
     # Optional fields validation (only if provided)
     if phone_number:
-        phone_digits = re.sub(r"[^0-9]", "", phone_number)
-        if not re.match(PHONE_DIGITS_REGEX, phone_digits):
+        phone_digits = NON_DIGIT_REGEX.sub("", phone_number)
+        if not PHONE_DIGITS_REGEX.match(phone_digits):
             errors_dict['phone_number'] = "Phone number: Please enter 10 to 15 digits."
     
     main_address_fields_provided = any([address_line1, city, state, zip_code])
     if main_address_fields_provided:
         if not address_line1: errors_dict['address_line1'] = "Address Line 1 is required if providing partial address."
-        elif not re.match(ADDRESS_REGEX, address_line1): errors_dict['address_line1'] = "Invalid Address Line 1 (max 100 chars)."
+        elif not ADDRESS_REGEX.match(address_line1): errors_dict['address_line1'] = "Invalid Address Line 1 (max 100 chars)."
         
-        if address_line2 and not re.match(ADDRESS_REGEX, address_line2): # Optional, but validate if present
+        if address_line2 and not ADDRESS_REGEX.match(address_line2): # Optional, but validate if present
              errors_dict['address_line2'] = "Invalid Address Line 2 (max 100 chars)."
 
         if not city: errors_dict['city'] = "City is required if providing partial address."
-        elif not re.match(NAME_REGEX, city): errors_dict['city'] = "Invalid city name." # Using NAME_REGEX for city
+        elif not NAME_REGEX.match(city): errors_dict['city'] = "Invalid city name." # Using NAME_REGEX for city
         
         if not state: errors_dict['state'] = "State is required if providing partial address."
-        elif not re.match(STATE_REGEX, state): errors_dict['state'] = "Invalid state format (e.g., NY or California)."
+        elif not STATE_REGEX.match(state): errors_dict['state'] = "Invalid state format (e.g., NY or California)."
         
         if not zip_code: errors_dict['zip_code'] = "ZIP Code is required if providing partial address."
-        elif not re.match(ZIP_CODE_REGEX, zip_code): errors_dict['zip_code'] = "Invalid ZIP code (e.g., 12345 or 12345-1234)."
+        elif not ZIP_CODE_REGEX.match(zip_code): errors_dict['zip_code'] = "Invalid ZIP code (e.g., 12345 or 12345-1234)."
 
     if errors_dict:
         logger.warning(f"Admin create user validation failed for email '{email}': {errors_dict}")
@@ -370,7 +370,7 @@ def admin_create_user(user_data: Dict[str, Any], performing_admin_id: int) -> Us
         logger.error(f"DB error checking email uniqueness for '{email}' during admin create: {e_uniq}", exc_info=True)
         raise DatabaseError("Could not verify email uniqueness due to a database issue.", original_exception=e_uniq)
     finally:
-        if conn_check_email: conn_check_email.close()
+        if conn_check_email: release_db_connection(conn_check_email)
     
     try:
         hashed_password = generate_password_hash(password)
@@ -408,7 +408,7 @@ def admin_create_user(user_data: Dict[str, Any], performing_admin_id: int) -> Us
         logger.error(f"Service (Admin: {admin_email_log}): DB error creating user '{email}': {e}", exc_info=True)
         raise DatabaseError("User creation failed due to a database error.", original_exception=e)
     finally:
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
 
 def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any], performing_admin_id: int) -> User:
     """
@@ -447,19 +447,19 @@ def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any],
     if 'first_name' in update_data:
         val = update_data['first_name']
         if not val: validation_errors_dict['first_name'] = "First name cannot be empty."
-        elif not re.match(NAME_REGEX, val): validation_errors_dict['first_name'] = "Invalid first name format (1-70 chars, letters, spaces, '-,.)."
+        elif not NAME_REGEX.match(val): validation_errors_dict['first_name'] = "Invalid first name format (1-70 chars, letters, spaces, '-,.)."
         else: fields_to_update_in_db['first_name'] = val.title()
     
     if 'last_name' in update_data:
         val = update_data['last_name']
         if not val: validation_errors_dict['last_name'] = "Last name cannot be empty."
-        elif not re.match(NAME_REGEX, val): validation_errors_dict['last_name'] = "Invalid last name format (1-70 chars, letters, spaces, '-,.)."
+        elif not NAME_REGEX.match(val): validation_errors_dict['last_name'] = "Invalid last name format (1-70 chars, letters, spaces, '-,.)."
         else: fields_to_update_in_db['last_name'] = val.title()
 
     if 'email' in update_data:
         email = update_data['email'].lower() # Already stripped by sanitize_form_data
         if not email: validation_errors_dict['email'] = "Email cannot be empty."
-        elif not re.match(EMAIL_REGEX, email): validation_errors_dict['email'] = "Invalid email format."
+        elif not EMAIL_REGEX.match(email): validation_errors_dict['email'] = "Invalid email format."
         elif email != user_to_update.email: 
             conn_check_email = None; existing_user_with_new_email = False
             try:
@@ -471,7 +471,7 @@ def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any],
                  logger.error(f"DB error checking email uniqueness for '{email}' in admin update: {e_uniq}", exc_info=True)
                  validation_errors_dict['email'] = "Could not verify email uniqueness (DB error)."
             finally:
-                if conn_check_email: conn_check_email.close()
+                if conn_check_email: release_db_connection(conn_check_email)
             if existing_user_with_new_email:
                 validation_errors_dict['email'] = "This email address is already in use."
             elif 'email' not in validation_errors_dict: fields_to_update_in_db['email'] = email
@@ -479,8 +479,8 @@ def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any],
     if 'phone_number' in update_data:
         phone = update_data.get('phone_number', '') # Should be stripped by sanitize_form_data
         if phone:
-            phone_digits = re.sub(r"[^0-9]", "", phone)
-            if not re.match(PHONE_DIGITS_REGEX, phone_digits): 
+            phone_digits = NON_DIGIT_REGEX.sub("", phone)
+            if not PHONE_DIGITS_REGEX.match(phone_digits): 
                 validation_errors_dict['phone_number'] = "Invalid phone (10-15 digits)."
             else: fields_to_update_in_db['phone_number'] = phone
         else: fields_to_update_in_db['phone_number'] = None
@@ -494,7 +494,7 @@ def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any],
                 if key == 'address_line2' and not value: # address_line2 is optional, can be empty
                     fields_to_update_in_db[key] = None
                     continue
-                if not re.match(addr_keys_map[key], value): # Use addr_keys_map[key] for regex
+                if not addr_keys_map[key].match(value): # Use addr_keys_map[key] for regex
                     validation_errors_dict[key] = f"Invalid format for {key.replace('_', ' ')}."
                 else: 
                     fields_to_update_in_db[key] = value.title() if key == 'city' else (value.upper() if key == 'state' else value)
@@ -555,4 +555,4 @@ def admin_update_user_details(user_id_to_edit: int, update_data: Dict[str, Any],
         logger.error(f"Service (Admin: {admin_email_log}): DB error updating user ID {user_id_to_edit}: {e}", exc_info=True)
         raise DatabaseError(f"Could not update user details for ID {user_id_to_edit}.", original_exception=e)
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: release_db_connection(conn)
\ No newline at end of file
@@ -5,7 +5,7 @@ from typing import Dict, List                                           # Added
 from flask import current_app                                           # For accessing app.logger and mail instance
 from flask_mail import Message                                          # For creating email messages
 from app.logger import get_logger                                       # Your custom logger
-from app.models.db import get_db_connection                             # For database interaction
+from app.models.db import get_db_connection, release_db_connection      # For database interaction
 from app.services.exceptions import DatabaseError                       # For error handling
 from markupsafe import escape as markupsafe_escape 
 
@@ -130,5 +130,5 @@ def get_admin_emails_dict() -> Dict[int, str]:
         )
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
             logger.debug("Database connection closed after fetching admin emails.")
\ No newline at end of file
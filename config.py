@@ -43,6 +43,17 @@ class Config:
                          'WARNING', 'ERROR', 'CRITICAL'). Controls verbosity of logs.
         ITEMS_PER_PAGE (int): Default number of items to display per page for features
                               that use pagination (e.g., book listings, order history).
+        BOOK_CACHE_TTL_SECONDS (int): How long cart lookups may reuse a cached book row
+                                      (price/stock) before re-reading it. 0 disables it.
+        CATALOG_CACHE_TTL_SECONDS (int): How long the home/customer catalog pages may reuse a
+                                         cached book listing. 0 disables it.
+        GENRE_CACHE_TTL_SECONDS (int): How long the catalog filter dropdowns may reuse the cached
+                                       genre list. 0 disables it.
+        USER_SNAPSHOT_TTL_SECONDS (int): How long `load_user` may rebuild the logged-in user from the
+                                         session snapshot before re-reading role/is_active from the
+                                         users table. 0 disables the snapshot.
+        DB_POOL_MIN (int): Idle database connections each worker process keeps open for reuse.
+        DB_POOL_MAX (int): Maximum database connections each worker process may hold at once.
     """
     # --- Security Sensitive Configurations ---
     # Loaded from environment variables, with a default for development (must be changed for production).
@@ -52,6 +63,12 @@ class Config:
     # --- Application Behavior Configurations ---
     LOG_LEVEL: str = os.environ.get('LOG_LEVEL', 'INFO').upper()
     ITEMS_PER_PAGE: int = 10 
+    BOOK_CACHE_TTL_SECONDS: int = int(os.environ.get('BOOK_CACHE_TTL_SECONDS', 30)) # 0 disables the book row cache
+    CATALOG_CACHE_TTL_SECONDS: int = int(os.environ.get('CATALOG_CACHE_TTL_SECONDS', 60)) # 0 disables the listing cache
+    GENRE_CACHE_TTL_SECONDS: int = int(os.environ.get('GENRE_CACHE_TTL_SECONDS', 300)) # 0 disables the genre list cache
+    USER_SNAPSHOT_TTL_SECONDS: int = int(os.environ.get('USER_SNAPSHOT_TTL_SECONDS', 60)) # 0 disables the session user snapshot
+    DB_POOL_MIN: int = int(os.environ.get('DB_POOL_MIN', 1))
+    DB_POOL_MAX: int = int(os.environ.get('DB_POOL_MAX', 10))
 
     # --- Initial Sanity Checks (performed when this module is imported) ---
     # These checks provide immediate feedback in the console if critical environment variables are missing.
@@ -148,10 +165,12 @@ class ProductionConfig(Config):
         DEBUG (bool): Disables Flask's debug mode for production.
         FLASK_ENV (str): Explicitly sets the environment type for Flask.
         LOG_LEVEL (str): Sets a less verbose logging level (INFO) for production.
+        TEMPLATES_AUTO_RELOAD (bool): Disables Jinja's per-render template change checks.
     """
     DEBUG: bool = False
     FLASK_ENV: str = 'production'
     LOG_LEVEL: str = os.environ.get('LOG_LEVEL_PROD', 'INFO').upper()
+    TEMPLATES_AUTO_RELOAD: bool = False # Never stat template files for changes in production
     
     # Example: Production-specific security settings for session cookies.
     # These should be enabled if your application is served over HTTPS in production.
@@ -188,6 +207,10 @@ class TestingConfig(Config):
     DATABASE_URL: str | None = os.environ.get('TEST_DATABASE_URL') or Config.DATABASE_URL # Fallback to main DB_URL
     SECRET_KEY: str = 'a_dedicated_secret_key_for_testing_only_not_for_prod_use'
     LOG_LEVEL: str = 'DEBUG' 
+    BOOK_CACHE_TTL_SECONDS: int = 0 # Tests should always read fresh rows
+    CATALOG_CACHE_TTL_SECONDS: int = 0
+    GENRE_CACHE_TTL_SECONDS: int = 0
+    USER_SNAPSHOT_TTL_SECONDS: int = 0
     
     # Example: If using Flask-WTF for forms, CSRF protection is often disabled for programmatic tests.
     # WTF_CSRF_ENABLED: bool = False 
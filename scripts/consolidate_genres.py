@@ -3,7 +3,7 @@ consolidate_genres.py
 Script to consolidate niche genres into 5 core buckets.
 """
 from app import create_app
-from app.models.db import get_db_connection
+from app.models.db import get_db_connection, release_db_connection
 
 def consolidate_genres():
     print("Initializing Flask App Context for genre consolidation...")
@@ -32,8 +32,8 @@ def consolidate_genres():
             print(f"FAILED: Error during genre consolidation. Transaction rolled back.\nError: {e}")
             raise
         finally:
-            conn.close()
-            print("Database connection closed.")
+            release_db_connection(conn) # Pooled connection: hand it back, never close() it
+            print("Database connection released.")
 
 if __name__ == "__main__":
     consolidate_genres()
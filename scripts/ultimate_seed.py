@@ -21,9 +21,9 @@ import random
 import urllib.request
 import urllib.parse
 from decimal import Decimal, ROUND_DOWN
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_batch, execute_values
 from app import create_app
-from app.models.db import get_db_connection
+from app.models.db import get_db_connection, release_db_connection
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -175,14 +175,18 @@ def ultimate_seed():
 
                 if to_insert:
                     print(f"Step 4b: Inserting {len(to_insert)} new books to reach target of {TARGET_TOTAL_BOOKS}...")
+                    # One multi-row INSERT per page instead of one statement per book
                     insert_sql = """
                         INSERT INTO books
                             (title, author, genre, price, stock_quantity, description, image_url)
-                        VALUES
-                            (%(title)s, %(author)s, %(genre)s, %(price)s,
-                             %(stock_quantity)s, %(description)s, %(image_url)s);
+                        VALUES %s;
                     """
-                    execute_batch(cur, insert_sql, to_insert)
+                    execute_values(
+                        cur, insert_sql, to_insert,
+                        template="(%(title)s, %(author)s, %(genre)s, %(price)s, "
+                                 "%(stock_quantity)s, %(description)s, %(image_url)s)",
+                        page_size=1000
+                    )
 
             conn.commit()
             final_count = num_surviving - deleted_count + len(to_insert)
@@ -199,8 +203,8 @@ def ultimate_seed():
             print(f"\n=== FAILED: Transaction rolled back. ===\nError: {e}")
             raise
         finally:
-            conn.close()
-            print("Database connection closed.")
+            release_db_connection(conn) # Pooled connection: hand it back, never close() it
+            print("Database connection released.")
 
 
 if __name__ == "__main__":